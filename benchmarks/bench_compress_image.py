@@ -0,0 +1,153 @@
+"""Compare the legacy and current cover-art encoders on generated images.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compress_image [--json]
+
+Reports, per source image, how many JPEG encodes each implementation needs,
+the CPU time spent and the size of the result.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import time
+from typing import Callable, Dict, List
+
+from PIL import Image
+
+from utils.yt_downloader import compress_image
+
+MAX_SIZE = 200_000
+
+
+def legacy_compress_image(image_path, max_size: int = 204_800) -> bytes:
+    """compress_image as it was before the quality search rewrite, kept for comparison."""
+    img = Image.open(io.BytesIO(image_path))
+    try:
+        if img.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        output = io.BytesIO()
+        quality = 95
+        while True:
+            output.seek(0)
+            output.truncate(0)
+            img.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+            size = output.tell()
+            if size <= max_size or quality <= 20:
+                break
+            quality -= 5
+
+        if output.tell() > max_size:
+            width, height = img.size
+            while output.tell() > max_size and (width > 200 or height > 200):
+                width = int(width * 0.9)
+                height = int(height * 0.9)
+                resized = img.resize((width, height), Image.LANCZOS)
+                output.seek(0)
+                output.truncate(0)
+                resized.save(output, 'JPEG', quality=max(20, quality - 5), optimize=True, progressive=True)
+                if output.tell() <= max_size:
+                    break
+                img = resized
+
+        return output.getvalue()
+    finally:
+        img.close()
+
+
+def _make_image(width: int, height: int, mode: str, noise: float) -> Image.Image:
+    """Gradient with a configurable share of noise; noise is what makes JPEGs large."""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    base = Image.merge('RGB', (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+    if noise:
+        base = Image.blend(base, Image.effect_noise((width, height), 64).convert('RGB'), noise)
+    if mode == 'RGBA':
+        base.putalpha(Image.linear_gradient('L').resize((width, height)))
+    elif mode != 'RGB':
+        base = base.convert(mode)
+    return base
+
+
+def build_corpus() -> Dict[str, bytes]:
+    specs = [
+        ('jpeg_120x90_tiny', 120, 90, 'RGB', 0.2, 'JPEG'),
+        ('jpeg_480x360_smooth', 480, 360, 'RGB', 0.0, 'JPEG'),
+        ('jpeg_1280x720_noisy', 1280, 720, 'RGB', 0.5, 'JPEG'),
+        ('jpeg_1920x1080_noisy', 1920, 1080, 'RGB', 0.5, 'JPEG'),
+        ('jpeg_3000x3000_noisy', 3000, 3000, 'RGB', 0.6, 'JPEG'),
+        ('png_1200x1200_rgba', 1200, 1200, 'RGBA', 0.3, 'PNG'),
+        ('webp_1280x720_noisy', 1280, 720, 'RGB', 0.5, 'WEBP'),
+        ('jpeg_1000x1000_gray', 1000, 1000, 'L', 0.5, 'JPEG'),
+        ('jpeg_1500x1500_cmyk', 1500, 1500, 'CMYK', 0.5, 'JPEG'),
+        ('png_800x800_palette', 800, 800, 'P', 0.3, 'PNG'),
+    ]
+    corpus = {}
+    for name, width, height, mode, noise, fmt in specs:
+        buffer = io.BytesIO()
+        _make_image(width, height, mode, noise).save(buffer, fmt, quality=95)
+        corpus[name] = buffer.getvalue()
+    return corpus
+
+
+def _measure(func: Callable[[bytes, int], bytes], data: bytes, repeat: int) -> Dict[str, float]:
+    encodes = 0
+    original_save = Image.Image.save
+
+    def counting_save(self, fp, format=None, **params):
+        nonlocal encodes
+        if (format or '').upper() == 'JPEG':
+            encodes += 1
+        return original_save(self, fp, format, **params)
+
+    Image.Image.save = counting_save
+    try:
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        for _ in range(repeat):
+            result = func(data, MAX_SIZE)
+        cpu = (time.process_time() - start_cpu) / repeat
+        wall = (time.perf_counter() - start_wall) / repeat
+    finally:
+        Image.Image.save = original_save
+    return {
+        'encodes': encodes / repeat,
+        'cpu_ms': cpu * 1000,
+        'wall_ms': wall * 1000,
+        'output_bytes': len(result),
+    }
+
+
+def run(repeat: int) -> List[Dict]:
+    results = []
+    for name, data in build_corpus().items():
+        for label, func in (('legacy', legacy_compress_image), ('current', compress_image)):
+            row = {'image': name, 'input_bytes': len(data), 'impl': label}
+            row.update(_measure(func, data, repeat))
+            results.append(row)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'image':<24}{'impl':<9}{'encodes':>8}{'cpu ms':>10}{'wall ms':>10}{'out bytes':>11}")
+    for row in results:
+        print(f"{row['image']:<24}{row['impl']:<9}{row['encodes']:>8.1f}{row['cpu_ms']:>10.1f}{row['wall_ms']:>10.1f}{row['output_bytes']:>11}")
+
+
+if __name__ == '__main__':
+    main()
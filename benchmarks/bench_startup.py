@@ -0,0 +1,163 @@
+"""Measure how long the bot takes to start: import time and time to the first handled update.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--repeat N] [--json]
+
+Every sample is a fresh interpreter. "first update" starts the bot with
+run_polling against the load test's fake Bot API server
+(benchmarks/fake_telegram.py) on localhost via TELEGRAM_BASE_URL, which
+hands out one /start message, and measures from process launch until
+the bot's first handler sees it. The bot runs in a temporary directory, so
+its databases and caches start empty and nothing in the checkout is touched.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from benchmarks.fake_telegram import make_server
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('yt_dlp', 'PIL', 'mutagen')
+_IMPORT_SNIPPET = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import bot\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"print(json.dumps({{'import_ms': elapsed * 1000, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def _start_update() -> Dict:
+    return {
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': 1, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'bench'},
+            'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
+
+
+def _child_env(extra: Dict[str, str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault('TELEGRAM_BOT_TOKEN', '123456:benchmark')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+    env.update(extra)
+    return env
+
+
+def _run_child(args: List[str], workdir: str, extra_env: Dict[str, str]) -> Dict:
+    launched = time.time()
+    output = subprocess.run(
+        [sys.executable, *args], cwd=workdir, env=_child_env(extra_env),
+        capture_output=True, text=True, timeout=120, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['launched'] = launched
+    return result
+
+
+def child_main() -> None:
+    """Inside the measured process: start polling and stop at the first update."""
+    start = time.perf_counter()
+    import bot
+    import_ms = (time.perf_counter() - start) * 1000
+
+    from telegram import Update
+    from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+    application = bot.build_application()
+
+    async def first_update(update: Update, context) -> None:
+        print(json.dumps({
+            'first_update_at': time.time(),
+            'import_ms': import_ms,
+            'heavy': [name for name in HEAVY_MODULES if name in sys.modules],
+        }), flush=True)
+        context.application.stop_running()
+        raise ApplicationHandlerStop
+
+    application.add_handler(TypeHandler(Update, first_update), group=-1)
+    application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+
+def _summary(name: str, values: List[float], **extra) -> Dict:
+    row = {
+        'metric': name,
+        'median_ms': statistics.median(values),
+        'min_ms': min(values),
+        'max_ms': max(values),
+    }
+    row.update(extra)
+    return row
+
+
+def run(repeat: int) -> List[Dict]:
+    server = make_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    interpreter, imports, first_updates = [], [], []
+    heavy: List[str] = []
+    try:
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as workdir:
+                start = time.perf_counter()
+                subprocess.run([sys.executable, '-c', 'pass'], check=True)
+                interpreter.append((time.perf_counter() - start) * 1000)
+
+                result = _run_child(['-c', _IMPORT_SNIPPET], workdir, {})
+                imports.append(result['import_ms'])
+
+                server.push_updates([_start_update()])
+                result = _run_child(
+                    ['-m', 'benchmarks.bench_startup', '--child'], workdir,
+                    {'TELEGRAM_BASE_URL': base_url, 'SCRATCH_DIR': os.path.join(workdir, 'scratch')},
+                )
+                first_updates.append((result['first_update_at'] - result['launched']) * 1000)
+                heavy = result['heavy']
+    finally:
+        server.shutdown()
+    return [
+        _summary('interpreter', interpreter),
+        _summary('import bot', imports),
+        _summary('first update', first_updates, heavy_modules_loaded=heavy),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main()
+        return
+    results = run(max(1, args.repeat))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'metric':<14}{'median ms':>11}{'min ms':>10}{'max ms':>10}")
+    for row in results:
+        print(f"{row['metric']:<14}{row['median_ms']:>11.1f}{row['min_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    loaded = results[-1]['heavy_modules_loaded']
+    print(f"heavy modules loaded when the first update arrived: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Compare building a YoutubeDL per call with checking one out of YoutubeDLPool.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ydl_pool [--calls N] [--cookies N] [--json]
+
+Each call does the per-request setup the bot needs before yt-dlp touches the
+network: a YoutubeDL with the download options (cookie file included) and the
+YouTube extractor instance. No network requests are made. The bot's options
+turn on yt-dlp's verbose header, which goes to stderr (2>/dev/null hides it).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import yt_dlp
+
+from utils.ydl_pool import YoutubeDLPool
+from utils.yt_downloader import create_ydl_opts
+from utils.ytdlp_session import DOWNLOAD_PROFILE
+
+
+def _write_cookie_file(path: str, count: int) -> None:
+    expires = int(time.time()) + 365 * 24 * 3600
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write('# Netscape HTTP Cookie File\n')
+        for index in range(count):
+            fh.write(f".youtube.com\tTRUE\t/\tTRUE\t{expires}\tCOOKIE_{index}\t{'x' * 40}\n")
+
+
+def _fresh(opts: Dict, hook: Callable[[Dict], None]) -> None:
+    ydl = yt_dlp.YoutubeDL(dict(opts, progress_hooks=[hook]))
+    try:
+        ydl.get_info_extractor('Youtube')
+    finally:
+        ydl.close()
+
+
+def _pooled(pool: YoutubeDLPool) -> Callable[[Dict, Callable[[Dict], None]], None]:
+    def call(opts: Dict, hook: Callable[[Dict], None]) -> None:
+        with pool.checkout(DOWNLOAD_PROFILE, opts, hook) as ydl:
+            ydl.get_info_extractor('Youtube')
+    return call
+
+
+def _measure(func: Callable[[Dict, Callable[[Dict], None]], None], opts_list: List[Dict]) -> Dict[str, float]:
+    def hook(data: Dict) -> None:
+        pass
+
+    timings = []
+    start_cpu = time.process_time()
+    for opts in opts_list:
+        start = time.perf_counter()
+        func(opts, hook)
+        timings.append(time.perf_counter() - start)
+    cpu = time.process_time() - start_cpu
+    timings.sort()
+    return {
+        'calls': len(timings),
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        'cpu_ms_per_call': cpu / len(timings) * 1000,
+    }
+
+
+def run(calls: int, cookies: int) -> List[Dict]:
+    with tempfile.TemporaryDirectory() as workdir:
+        cookie_path = os.path.join(workdir, 'cookies.txt')
+        _write_cookie_file(cookie_path, cookies)
+        # Every job gets its own output directory, as in the bot.
+        opts_list = [
+            create_ydl_opts(os.path.join(workdir, f'job-{index}'), cookie_path, None, write_thumbnail=False)
+            for index in range(calls)
+        ]
+        # Warm the extractor imports so neither side pays them.
+        _fresh(opts_list[0], lambda data: None)
+
+        pool = YoutubeDLPool(max_idle_per_key=4, max_uses=calls + 1)
+        results = []
+        for label, func in (('per-call', _fresh), ('pooled', _pooled(pool))):
+            row = {'impl': label, 'cookies': cookies}
+            row.update(_measure(func, opts_list))
+            results.append(row)
+        results[-1].update(pool.stats())
+        pool.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--cookies', type=int, default=50, help='cookies in the generated cookie file')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = run(max(1, args.calls), args.cookies)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'impl':<10}{'calls':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'cpu ms':>10}")
+    for row in results:
+        print(f"{row['impl']:<10}{row['calls']:>7}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['cpu_ms_per_call']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""A local stand-in for the Telegram Bot API and the media hosts, for load tests.
+
+Answers every Bot API method the bot uses with plausible objects, accepts
+uploads without storing them and serves fixture media under /media/. Updates
+pushed with ``_Server.push_updates`` are handed out by getUpdates. The load
+test runs it in its own process (see ``serve``) so that it does not compete
+with the bot under test for the interpreter; the startup benchmark runs it on
+a thread (see ``make_server``).
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'loadtest', 'username': 'loadtest_bot'}
+# Methods reported to the load test as they happen; everything else is only counted.
+REPORTED_METHODS = frozenset({'sendAudio'})
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set by make_server() on a subclass.
+    api_latency = 0.0
+    media: Dict[str, bytes] = {}
+    media_bandwidth = 0
+    events = None
+    counts: Counter = Counter()
+    bytes_received = 0
+    updates: List[Dict] = []
+    updates_ready = threading.Condition()
+    _ids = itertools.count(1000)
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _reply(self, result) -> None:
+        self._send(200, json.dumps({'ok': True, 'result': result}).encode(), 'application/json')
+
+    def _fields(self, body: bytes) -> Dict[str, str]:
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+            return {
+                part.get_param('name', header='content-disposition'): part.get_content()
+                for part in message.iter_parts()
+                if part.get_filename() is None
+            }
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def _message(self, method: str, fields: Dict[str, str]) -> Dict:
+        chat_id = int(fields.get('chat_id') or 0)
+        message_id = int(fields.get('message_id') or next(self._ids))
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'supergroup'},
+            'from': BOT_USER,
+        }
+        if 'text' in fields:
+            message['text'] = fields['text']
+        if method == 'sendAudio':
+            file_id = fields.get('audio') if isinstance(fields.get('audio'), str) else None
+            serial = next(self._ids)
+            message['audio'] = {'file_id': file_id or f"loadtest-audio-{serial}", 'file_unique_id': f"u{serial}", 'duration': 1}
+        elif method == 'sendAnimation':
+            serial = next(self._ids)
+            message['animation'] = {'file_id': f"loadtest-anim-{serial}", 'file_unique_id': f"a{serial}", 'width': 1, 'height': 1, 'duration': 1}
+        return message
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        method = self.path.rsplit('/', 1)[-1]
+        with self._lock:
+            self.counts[method] += 1
+            type(self).bytes_received += len(body)
+        if self.api_latency:
+            time.sleep(self.api_latency)
+        fields = self._fields(body)
+
+        if method == 'getMe':
+            self._reply(BOT_USER)
+        elif method == 'getChatMember':
+            user_id = int(fields.get('user_id') or 0)
+            self._reply({'status': 'member', 'user': {'id': user_id, 'is_bot': False, 'first_name': 'user'}})
+        elif method == 'getUpdates':
+            # A short long poll: wait briefly for pushed updates, hand them all out.
+            with self.updates_ready:
+                self.updates_ready.wait_for(lambda: self.updates, timeout=0.5)
+                pending = list(self.updates)
+                self.updates.clear()
+            self._reply(pending)
+        elif method.startswith(('send', 'edit', 'copyMessage', 'forwardMessage')):
+            self._reply(self._message(method, fields))
+            if method in REPORTED_METHODS and self.events is not None:
+                self.events.put((method, int(fields.get('chat_id') or 0), time.time()))
+        else:
+            self._reply(True)
+
+    def do_GET(self) -> None:
+        path = self.path.split('?', 1)[0]
+        if path == '/_stats':
+            with self._lock:
+                stats = {'requests': dict(self.counts), 'bytes_received': self.bytes_received}
+            self._send(200, json.dumps(stats).encode(), 'application/json')
+            return
+        data = self.media.get(path.rsplit('/', 1)[-1]) if path.startswith('/media/') else None
+        if data is None:
+            self._send(404, b'not found', 'text/plain')
+            return
+        content_type = 'audio/mpeg' if path.endswith('.mp3') else 'image/jpeg'
+        if not self.media_bandwidth or self.command == 'HEAD':
+            self._send(200, data, content_type)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        # Throttled in 64 KiB chunks to mimic a remote host.
+        chunk = 64 * 1024
+        for offset in range(0, len(data), chunk):
+            self.wfile.write(data[offset:offset + chunk])
+            time.sleep(chunk / self.media_bandwidth)
+
+    do_HEAD = do_GET
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The bot opens many connections at once under load.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address) -> None:
+        # A client that timed out and hung up is part of the load, not a server fault.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def push_updates(self, updates: List[Dict]) -> None:
+        """Queue updates for the next getUpdates call."""
+        handler = self.RequestHandlerClass
+        with handler.updates_ready:
+            handler.updates.extend(updates)
+            handler.updates_ready.notify_all()
+
+
+def make_server(
+    events=None,
+    media: Optional[Dict[str, bytes]] = None,
+    api_latency: float = 0.0,
+    media_bandwidth: int = 0,
+    port: int = 0,
+) -> _Server:
+    """Bind a fake server on localhost with its own counters and update queue; the caller runs it."""
+    handler = type('FakeTelegram', (FakeTelegramHandler,), {
+        'api_latency': api_latency,
+        'media': media or {},
+        'media_bandwidth': media_bandwidth,
+        'events': events,
+        'counts': Counter(),
+        'bytes_received': 0,
+        'updates': [],
+        'updates_ready': threading.Condition(),
+    })
+    return _Server(('127.0.0.1', port), handler)
+
+
+def serve(port_queue, events, media: Dict[str, bytes], api_latency: float = 0.0, media_bandwidth: int = 0, port: int = 0) -> None:
+    """Run the fake server until the process is terminated; the bound port is put on port_queue."""
+    server = make_server(events, media, api_latency, media_bandwidth, port)
+    port_queue.put(server.server_address[1])
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
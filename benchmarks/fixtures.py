@@ -0,0 +1,126 @@
+"""Offline inputs for the benchmarks: generated MP3 files, cover art and yt-dlp style info dicts."""
+from __future__ import annotations
+
+import io
+import json
+import random
+from typing import Dict, Iterable, List
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no CRC, no padding: 144 * 128000 / 44100 bytes per frame.
+_MP3_FRAME_HEADER = b'\xff\xfb\x90\x00'
+_MP3_FRAME_BYTES = 417
+_MP3_FRAMES_PER_SECOND = 44100 / 1152
+
+
+def write_mp3(path: str, seconds: float) -> int:
+    """Write an untagged MP3 of silent frames lasting about seconds; return its size in bytes."""
+    frame = _MP3_FRAME_HEADER + bytes(_MP3_FRAME_BYTES - len(_MP3_FRAME_HEADER))
+    frames = max(1, int(seconds * _MP3_FRAMES_PER_SECOND))
+    with open(path, 'wb') as fh:
+        fh.write(frame * frames)
+    return frames * _MP3_FRAME_BYTES
+
+
+def make_cover_jpeg(size: int = 800) -> bytes:
+    """A noisy square JPEG, about as heavy as real cover art of that size."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise((size, size), 64).convert('RGB').save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def _thumbnails(rng: random.Random, video_id: str, count: int) -> List[Dict]:
+    thumbs = []
+    for index in range(count):
+        width = rng.choice((120, 168, 196, 246, 320, 336, 480, 544, 640, 720, 1280, 1920))
+        thumb = {
+            'url': f"https://i.ytimg.com/vi/{video_id}/{index}.jpg?sqp=-oaymwE{index:04d}",
+            'preference': index - count,
+            'id': str(index),
+        }
+        # yt-dlp leaves the size out for thumbnails it only guessed, like the real extractor does for some.
+        if index % 4:
+            thumb.update({'width': width, 'height': width * 9 // 16, 'resolution': f"{width}x{width * 9 // 16}"})
+        thumbs.append(thumb)
+    return thumbs
+
+
+def _formats(rng: random.Random, video_id: str, count: int) -> List[Dict]:
+    formats = []
+    for index in range(count):
+        audio_only = index % 3 == 0
+        formats.append({
+            'format_id': str(100 + index),
+            'format_note': rng.choice(('low', 'medium', 'high', '360p', '720p', '1080p')),
+            'ext': rng.choice(('m4a', 'webm', 'mp4')),
+            'acodec': rng.choice(('opus', 'mp4a.40.2')) if audio_only or index % 2 else 'none',
+            'vcodec': 'none' if audio_only else rng.choice(('avc1.64001F', 'vp09.00.40.08', 'av01.0.08M.08')),
+            'abr': rng.uniform(48, 160) if audio_only else None,
+            'tbr': rng.uniform(50, 5000),
+            'filesize': rng.randint(500_000, 90_000_000),
+            'url': f"https://rr3---sn-example.googlevideo.com/videoplayback?id={video_id}&itag={100 + index}&" + 'x' * 600,
+            'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*', 'Accept-Language': 'en-us,en;q=0.5'},
+            'fragments': [{'url': f"sq/{n}", 'duration': 5.0} for n in range(rng.randint(0, 40))],
+            'protocol': rng.choice(('https', 'm3u8_native', 'http_dash_segments')),
+        })
+    return formats
+
+
+def make_info(
+    seed: int = 0,
+    thumbnails: int = 40,
+    formats: int = 120,
+    artists: int = 3,
+    track: bool = True,
+    description_chars: int = 5000,
+) -> Dict:
+    """A single-video info dict shaped like a YouTube Music extraction, with sizes close to real ones."""
+    rng = random.Random(seed)
+    video_id = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_') for _ in range(11))
+    names = [f"Artist {seed}-{n}" for n in range(artists)]
+    info = {
+        'id': video_id,
+        'title': f"{names[0] if names else 'Somebody'} - Song {seed} (Official Video)",
+        'uploader': f"{names[0] if names else 'Somebody'} - Topic",
+        'channel': f"{names[0] if names else 'Somebody'}VEVO",
+        'duration': rng.randint(90, 600),
+        'description': ''.join(rng.choice('abcdefghij klmnop\n') for _ in range(description_chars)),
+        'tags': [f"tag{n}" for n in range(60)],
+        'categories': ['Music'],
+        'thumbnails': _thumbnails(rng, video_id, thumbnails),
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        'formats': _formats(rng, video_id, formats),
+        'automatic_captions': {
+            f"lang{n}": [{'ext': ext, 'url': f"https://www.youtube.com/api/timedtext?v={video_id}&lang={n}&fmt={ext}"} for ext in ('json3', 'srv1', 'vtt')]
+            for n in range(150)
+        },
+        'album': f"Album {seed}",
+        'release_year': 2000 + seed % 25,
+        'webpage_url': f"https://music.youtube.com/watch?v={video_id}",
+        'extractor': 'youtube',
+    }
+    if track:
+        info['track'] = f"Song {seed}"
+        info['artists'] = [{'name': name} for name in names]
+    return info
+
+
+def make_playlist_info(entries: int = 25, seed: int = 0) -> Dict:
+    """A playlist info dict; its entries are full single-video dicts as after a playlist download."""
+    return {
+        'id': f"PL{seed:032d}",
+        'title': f"Playlist {seed}",
+        'uploader': 'Playlist Owner',
+        '_type': 'playlist',
+        'entries': [make_info(seed=seed * 1000 + n, formats=40) for n in range(entries)],
+    }
+
+
+def load_info_json(paths: Iterable[str]) -> Dict[str, Dict]:
+    """Read info dicts written by ``yt-dlp --write-info-json`` to benchmark against real extractions."""
+    infos = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as fh:
+            infos[path] = json.load(fh)
+    return infos
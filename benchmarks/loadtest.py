@@ -0,0 +1,558 @@
+"""Load-test one bot process: synthetic updates against a fake Bot API and a stub extractor.
+
+Run from the repository root:
+
+    python -m benchmarks.loadtest [--rate 5,10,20] [--stage-duration 30] [--users 1000]
+                                  [--mix start=1,search=4,select=2,download=2]
+                                  [--extract-latency 0.5] [--search-latency 0.3]
+                                  [--api-latency 0.02] [--json] [--output FILE]
+
+The application is the one ``bot.build_application()`` returns: the same
+handlers, send queue and download pipeline. Updates are put on its update
+queue at each --rate in turn (one stage per rate, open loop, Poisson
+arrivals by default), from --users synthetic private chats. Each update is
+one of:
+- start: /start;
+- search: a free-text query;
+- select: a pick from an earlier search's results;
+- download: a YouTube link.
+
+Bot API calls go to a fake server running in a separate process
+(benchmarks.fake_telegram). It also serves a generated MP3 and cover
+image. yt-dlp resolves links and searches through the stub extractor in
+benchmarks/loadtest_plugins, which waits --extract-latency or
+--search-latency seconds. After that, the real yt-dlp download,
+scratch-space, cover-art, tagging and upload steps run.
+
+Reported per stage and every --report-interval seconds:
+- handler latency (p50/p95/p99), from enqueueing an update until its
+  handlers finish;
+- download latency, from the link or pick until the fake API receives
+  sendAudio;
+- event-loop lag;
+- throughput;
+- resident memory and CPU use.
+
+Per-user rate limits and Telegram flood limits are off unless
+--rate-limits or --telegram-limits is given, so the process itself is what
+saturates. Everything runs in a temporary directory.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from benchmarks.fake_telegram import BOT_USER, serve
+from benchmarks.fixtures import make_cover_jpeg, write_mp3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadtest_plugins')
+KINDS = ('start', 'search', 'select', 'download')
+# Runs after every handler group the bot registers.
+_LAST_GROUP = 1_000_000
+SCHEMA_VERSION = 1
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"unknown update kind {kind!r}, expected one of {', '.join(KINDS)}")
+        mix[kind] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('the mix needs at least one positive weight')
+    return mix
+
+
+def parse_rates(spec: str) -> List[float]:
+    rates = [float(rate) for rate in spec.split(',') if rate.strip()]
+    if not rates or any(rate <= 0 for rate in rates):
+        raise argparse.ArgumentTypeError('rates must be positive numbers')
+    return rates
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max in milliseconds of values given in seconds."""
+    ordered = sorted(values)
+    row = {f"p{q}_ms": (percentile(ordered, q) * 1000 if ordered else None) for q in (50, 95, 99)}
+    row['max_ms'] = ordered[-1] * 1000 if ordered else None
+    row['count'] = len(ordered)
+    return row
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current, but the best portable figure.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class UpdateFactory:
+    """Builds Bot API update payloads for synthetic users."""
+
+    def __init__(self, users: int, queries: int, tracks: int, search_results: int, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.users = users
+        self.queries = queries
+        self.tracks = tracks
+        self.search_results = search_results
+        self._ids = itertools.count(1)
+        # Users whose search finished and left results to pick from.
+        self.searched: List[int] = []
+        self._searched_set = set()
+
+    def _user(self, user_id: int) -> Dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}", 'language_code': 'en'}
+
+    def _message(self, update_id: int, user_id: int, text: str) -> Dict:
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': f"user{user_id}"},
+            'from': self._user(user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'update_id': update_id, 'message': message}
+
+    def _callback(self, update_id: int, user_id: int, data: str) -> Dict:
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id),
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': f"user{user_id}"},
+                'from': BOT_USER,
+                'text': 'choose',
+            },
+        }}
+
+    def mark_searched(self, user_id: int) -> None:
+        if user_id not in self._searched_set:
+            self._searched_set.add(user_id)
+            self.searched.append(user_id)
+
+    def make(self, kind: str) -> Tuple[str, int, Dict]:
+        """Return (kind, chat_id, payload); a select without a finished search becomes a search."""
+        update_id = next(self._ids)
+        if kind == 'select' and self.searched:
+            user_id = self.rng.choice(self.searched)
+            index = self.rng.randrange(self.search_results)
+            return kind, user_id, self._callback(update_id, user_id, f"searchsel_{user_id}_{index}")
+        user_id = self.rng.randint(1, self.users)
+        if kind == 'start':
+            return kind, user_id, self._message(update_id, user_id, '/start')
+        if kind == 'download':
+            return kind, user_id, self._message(update_id, user_id, f"https://www.youtube.com/watch?v=lt{self.rng.randrange(self.tracks):09d}")
+        return 'search', user_id, self._message(update_id, user_id, f"load query {self.rng.randrange(self.queries)}")
+
+
+class Recorder:
+    """Timestamps for every update, download and loop tick, cut into windows and stages afterwards.
+
+    A sendAudio is matched to the oldest download request still pending for
+    its chat. Requests that never produce one (rejected, failed, expired
+    search results) stay pending, so a later delivery to the same chat can be
+    attributed to them and read long.
+    """
+
+    def __init__(self, factory: UpdateFactory) -> None:
+        self.factory = factory
+        self.enqueued: Dict[int, Tuple[str, int, float]] = {}
+        self.sent = 0
+        # (finished_at, kind, latency); perf_counter seconds throughout.
+        self.handled: List[Tuple[float, str, float]] = []
+        self.errors: Counter = Counter()
+        self.pending_downloads: Dict[int, Deque[float]] = defaultdict(deque)
+        # (requested_at, delivered_at, latency)
+        self.downloads: List[Tuple[float, float, float]] = []
+        self.loop_lag: List[Tuple[float, float]] = []
+        # time.time() minus perf_counter(), to place the fake server's wall-clock events.
+        self.clock_offset = time.time() - time.perf_counter()
+
+    def enqueue(self, update_id: int, kind: str, chat_id: int) -> None:
+        now = time.perf_counter()
+        self.enqueued[update_id] = (kind, chat_id, now)
+        self.sent += 1
+        if kind in ('download', 'select'):
+            self.pending_downloads[chat_id].append(now)
+
+    async def finished(self, update, context) -> None:
+        entry = self.enqueued.pop(update.update_id, None)
+        if entry is None:
+            return
+        kind, chat_id, started = entry
+        now = time.perf_counter()
+        self.handled.append((now, kind, now - started))
+        if kind == 'search' and context.user_data.get(f'search_results_{chat_id}'):
+            self.factory.mark_searched(chat_id)
+
+    async def on_error(self, update, context) -> None:
+        self.errors[type(context.error).__name__] += 1
+
+    def delivered(self, chat_id: int, wall_time: float) -> None:
+        pending = self.pending_downloads.get(chat_id)
+        if not pending:
+            return
+        started = pending.popleft()
+        at = wall_time - self.clock_offset
+        self.downloads.append((started, at, at - started))
+
+    def in_flight(self) -> int:
+        return len(self.enqueued)
+
+    def downloads_pending(self) -> int:
+        return sum(len(pending) for pending in self.pending_downloads.values())
+
+
+def download_tasks(application) -> int:
+    """Download tasks the bot is still running, whether or not they hold a slot yet."""
+    return sum(
+        1
+        for user_tasks in application.bot_data.get('active_downloads', {}).values()
+        for info in user_tasks.values()
+        if info.get('task') and not info['task'].done()
+    )
+
+
+async def drain_events(events, recorder: Recorder) -> None:
+    """Move sendAudio notifications from the fake server into the recorder."""
+    while True:
+        while True:
+            try:
+                _, chat_id, wall_time = events.get_nowait()
+            except Exception:
+                break
+            recorder.delivered(chat_id, wall_time)
+        await asyncio.sleep(0.05)
+
+
+async def watch_loop_lag(recorder: Recorder, interval: float = 0.05) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        recorder.loop_lag.append((time.perf_counter(), max(0.0, loop.time() - expected)))
+
+
+def _window(recorder: Recorder, start: float, end: float, downloads_by_request: bool = False) -> Dict:
+    """Figures for one time window; downloads count where they were delivered, or where requested."""
+    handled = [latency for at, _, latency in recorder.handled if start <= at < end]
+    downloads = [
+        latency
+        for requested, delivered, latency in recorder.downloads
+        if start <= (requested if downloads_by_request else delivered) < end
+    ]
+    lag = [value for at, value in recorder.loop_lag if start <= at < end]
+    seconds = max(end - start, 1e-9)
+    return {
+        'handled': len(handled),
+        'throughput_per_s': len(handled) / seconds,
+        'handler_latency': summarize(handled),
+        'downloads_delivered': len(downloads),
+        'download_latency': summarize(downloads),
+        'loop_lag': summarize(lag),
+    }
+
+
+async def report_progress(application, recorder: Recorder, interval: float, timeline: List[Dict], state: Dict, out) -> None:
+    from handlers import downloader
+
+    started = time.perf_counter()
+    last, last_cpu = started, time.process_time()
+    while True:
+        await asyncio.sleep(interval)
+        now, cpu = time.perf_counter(), time.process_time()
+        row = _window(recorder, last, now)
+        scheduler = downloader.download_scheduler.stats()
+        row.update({
+            't_s': round(now - started, 3),
+            'rate': state.get('rate'),
+            'sent': recorder.sent,
+            'in_flight': recorder.in_flight(),
+            'download_tasks': download_tasks(application),
+            'active_downloads': scheduler['active_downloads'],
+            'queued_downloads': scheduler['queued'],
+            'rss_mb': rss_bytes() / 2**20,
+            'cpu_percent': 100 * (cpu - last_cpu) / (now - last),
+        })
+        timeline.append(row)
+        latency = row['handler_latency']
+        print(
+            f"t={row['t_s']:>6.0f}s rate={row['rate'] or 0:>6.1f}/s done={row['throughput_per_s']:>6.1f}/s "
+            f"p50={latency['p50_ms'] or 0:>7.1f}ms p99={latency['p99_ms'] or 0:>8.1f}ms "
+            f"lag_max={row['loop_lag']['max_ms'] or 0:>6.1f}ms in_flight={row['in_flight']:>4} "
+            f"downloads={row['active_downloads']}+{row['queued_downloads']} delivered={row['downloads_delivered']:>3} "
+            f"rss={row['rss_mb']:>6.1f}MB cpu={row['cpu_percent']:>5.1f}%",
+            file=out, flush=True,
+        )
+        last, last_cpu = now, cpu
+
+
+async def drive(application, factory: UpdateFactory, recorder: Recorder, rate: float, duration: float, mix: Dict[str, float], arrival: str) -> float:
+    """Offer updates at rate for duration seconds; return the achieved offered rate."""
+    from telegram import Update
+
+    loop = asyncio.get_running_loop()
+    kinds, weights = zip(*[(kind, weight) for kind, weight in mix.items() if weight > 0])
+    start = loop.time()
+    end = start + duration
+    next_at = start
+    sent = 0
+    while True:
+        next_at += factory.rng.expovariate(rate) if arrival == 'poisson' else 1 / rate
+        if next_at >= end:
+            break
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, chat_id, payload = factory.make(factory.rng.choices(kinds, weights)[0])
+        update = Update.de_json(payload, application.bot)
+        recorder.enqueue(update.update_id, kind, chat_id)
+        application.update_queue.put_nowait(update)
+        sent += 1
+    await asyncio.sleep(max(0.0, end - loop.time()))
+    return sent / duration
+
+
+def _stage_summary(recorder: Recorder, rate: float, offered: float, start: float, end: float) -> Dict:
+    row = {'rate': rate, 'offered_per_s': offered, 'duration_s': end - start}
+    # A download belongs to the stage that requested it, even if it finished during a later one.
+    row.update(_window(recorder, start, end, downloads_by_request=True))
+    row['handler_latency_by_kind'] = {
+        kind: summarize([latency for at, handled_kind, latency in recorder.handled if handled_kind == kind and start <= at < end])
+        for kind in KINDS
+    }
+    return row
+
+
+def _configure_environment(args, workdir: str, base_url: str) -> None:
+    """Point the bot at the fake services; config reads all of this at import time."""
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:loadtest')
+    os.environ.update({
+        'TELEGRAM_BASE_URL': base_url,
+        'SCRATCH_DIR': os.path.join(workdir, 'scratch'),
+        'METRICS_PORT': str(args.metrics_port),
+        'YTDLP_BACKEND': args.backend,
+        'DOWNLOAD_BACKEND': 'inline',
+        'LOADTEST_MEDIA_URL': f"{base_url}/media",
+        'LOADTEST_EXTRACT_LATENCY': str(args.extract_latency),
+        'LOADTEST_SEARCH_LATENCY': str(args.search_latency),
+        'LOADTEST_LATENCY_JITTER': str(args.jitter),
+        'LOADTEST_SEARCH_RESULTS': str(args.search_results),
+        'LOADTEST_TRACK_SECONDS': str(args.track_seconds),
+    })
+    if not args.rate_limits:
+        os.environ.update({'RATE_LIMIT_START': '', 'RATE_LIMIT_SEARCH': '', 'RATE_LIMIT_DOWNLOAD': ''})
+    if not args.telegram_limits:
+        os.environ.update({'SEND_LIMIT_GLOBAL': '', 'SEND_LIMIT_PRIVATE': '', 'SEND_LIMIT_GROUP': ''})
+    # The stub extractor is a yt-dlp plugin; worker processes of the process backend need it too.
+    sys.path.insert(0, PLUGIN_DIR)
+    os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_DIR, REPO_ROOT, os.environ.get('PYTHONPATH')]))
+
+
+def _fetch_json(url: str) -> Dict:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+async def run_load(args, base_url: str, events, out) -> Dict:
+    import bot
+    from handlers import downloader
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    factory = UpdateFactory(args.users, args.queries, args.tracks, args.search_results, args.seed)
+    recorder = Recorder(factory)
+    application = bot.build_application()
+    application.add_handler(TypeHandler(Update, recorder.finished), group=_LAST_GROUP)
+    application.add_error_handler(recorder.on_error)
+
+    timeline: List[Dict] = []
+    stage_bounds: List[Tuple[float, float, float, float]] = []
+    state: Dict = {}
+    async with application:
+        await bot.on_post_init(application)
+        await application.start()
+        helpers = [
+            asyncio.create_task(drain_events(events, recorder)),
+            asyncio.create_task(watch_loop_lag(recorder)),
+            asyncio.create_task(report_progress(application, recorder, args.report_interval, timeline, state, out)),
+        ]
+        try:
+            for rate in args.rate:
+                state['rate'] = rate
+                start = time.perf_counter()
+                offered = await drive(application, factory, recorder, rate, args.stage_duration, args.mix, args.arrival)
+                stage_bounds.append((rate, offered, start, time.perf_counter()))
+
+            # Let handlers and background downloads started during the stages finish.
+            state['rate'] = 0.0
+            drain_started = time.perf_counter()
+            deadline = drain_started + args.drain_timeout
+            while (recorder.in_flight() or download_tasks(application)) and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            # The last sendAudio notifications may still be on their way from the fake server.
+            await asyncio.sleep(0.2)
+            drain = {
+                'seconds': time.perf_counter() - drain_started,
+                'unfinished_updates': recorder.in_flight(),
+                'unfinished_downloads': download_tasks(application),
+                'undelivered_downloads': recorder.downloads_pending(),
+            }
+        finally:
+            for task in helpers:
+                task.cancel()
+            await asyncio.gather(*helpers, return_exceptions=True)
+            await application.stop()
+    await bot.on_post_shutdown(application)
+
+    return {
+        # Summarised after the drain, so downloads still running when their stage ended are included.
+        'stages': [_stage_summary(recorder, *bounds) for bounds in stage_bounds],
+        'overall': _window(recorder, 0.0, time.perf_counter()),
+        'drain': drain,
+        'handler_errors': dict(recorder.errors),
+        'download_outcomes': {
+            outcome: downloader.downloads.value(outcome=outcome)
+            for outcome in ('delivered', 'partial', 'cached', 'failed', 'rejected', 'cancelled', 'unsupported')
+        },
+        'api': await asyncio.to_thread(_fetch_json, f"{base_url}/_stats"),
+        'peak_rss_mb': max((row['rss_mb'] for row in timeline), default=rss_bytes() / 2**20),
+        'timeline': timeline,
+    }
+
+
+def _print_report(report: Dict) -> None:
+    print()
+    print(f"{'rate/s':>8}{'offered':>9}{'done/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'dl p50 s':>10}{'dl p99 s':>10}{'lag p99':>9}{'lag max':>9}")
+    for stage in report['stages']:
+        handler, download, lag = stage['handler_latency'], stage['download_latency'], stage['loop_lag']
+
+        def ms(value):
+            return f"{value:.1f}" if value is not None else '-'
+
+        def s(value):
+            return f"{value / 1000:.2f}" if value is not None else '-'
+
+        print(
+            f"{stage['rate']:>8.1f}{stage['offered_per_s']:>9.1f}{stage['throughput_per_s']:>8.1f}"
+            f"{ms(handler['p50_ms']):>9}{ms(handler['p95_ms']):>9}{ms(handler['p99_ms']):>9}"
+            f"{s(download['p50_ms']):>10}{s(download['p99_ms']):>10}{ms(lag['p99_ms']):>9}{ms(lag['max_ms']):>9}"
+        )
+    drain = report['drain']
+    print(f"\npeak rss {report['peak_rss_mb']:.1f} MB; drained in {drain['seconds']:.1f}s with "
+          f"{drain['unfinished_updates']} unfinished updates and {drain['unfinished_downloads']} unfinished downloads; "
+          f"{drain['undelivered_downloads']} download requests never reached sendAudio")
+    print(f"download outcomes: {report['download_outcomes']}")
+    if report['handler_errors']:
+        print(f"handler errors: {report['handler_errors']}")
+    print(f"fake Bot API requests: {report['api']['requests']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=parse_rates, default=[5.0, 10.0, 20.0], help='updates per second, one stage per comma-separated value (default: 5,10,20)')
+    parser.add_argument('--stage-duration', type=float, default=30.0, help='seconds each rate is held (default: %(default)s)')
+    parser.add_argument('--arrival', choices=('poisson', 'constant'), default='poisson')
+    parser.add_argument('--users', type=int, default=1000, help='distinct synthetic users (default: %(default)s)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('start=1,search=4,select=2,download=2'), help='relative weights of start, search, select and download updates')
+    parser.add_argument('--queries', type=int, default=500, help='distinct search queries; fewer means more search cache hits (default: %(default)s)')
+    parser.add_argument('--tracks', type=int, default=200, help='distinct tracks linked; fewer means more file_id cache hits (default: %(default)s)')
+    parser.add_argument('--search-results', type=int, default=10, help='results per stub search (default: %(default)s)')
+    parser.add_argument('--extract-latency', type=float, default=0.5, help='seconds the stub extractor takes per track (default: %(default)s)')
+    parser.add_argument('--search-latency', type=float, default=0.3, help='seconds the stub search takes (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.5, help='uniform spread of the stub latencies as a fraction (default: %(default)s)')
+    parser.add_argument('--api-latency', type=float, default=0.02, help='seconds the fake Bot API takes per call (default: %(default)s)')
+    parser.add_argument('--media-bandwidth', type=int, default=0, help='bytes per second per media download, 0 for unthrottled (default: %(default)s)')
+    parser.add_argument('--track-seconds', type=float, default=180.0, help='length of the served MP3 (default: %(default)s)')
+    parser.add_argument('--backend', choices=('thread', 'process'), default='thread', help='YTDLP_BACKEND for the bot (default: %(default)s)')
+    parser.add_argument('--rate-limits', action='store_true', help='keep the per-user RATE_LIMIT_* settings')
+    parser.add_argument('--telegram-limits', action='store_true', help='keep the SEND_LIMIT_* flood limits')
+    parser.add_argument('--metrics-port', type=int, default=0, help='serve the bot\'s /metrics on this port during the run')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='seconds between progress lines (default: %(default)s)')
+    parser.add_argument('--drain-timeout', type=float, default=120.0, help='seconds to wait for work still running after the last stage (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--log-level', default='WARNING', help='log level of the bot under test (default: %(default)s)')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    args = parser.parse_args()
+
+    # Before the bot's modules configure logging at INFO.
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING), format='%(asctime)s - %(levelname)s - %(message)s')
+    out = sys.stderr if args.json else sys.stdout
+    output = os.path.abspath(args.output) if args.output else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        track_path = os.path.join(workdir, 'track.mp3')
+        write_mp3(track_path, args.track_seconds)
+        with open(track_path, 'rb') as fh:
+            media = {'track.mp3': fh.read(), 'cover.jpg': make_cover_jpeg()}
+
+        context = multiprocessing.get_context('spawn')
+        port_queue, events = context.Queue(), context.Queue()
+        server = context.Process(target=serve, args=(port_queue, events, media, args.api_latency, args.media_bandwidth), daemon=True)
+        server.start()
+        base_url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+
+        previous_cwd = os.getcwd()
+        _configure_environment(args, workdir, base_url)
+        # The bot keeps its databases and caches relative to the working directory.
+        os.chdir(workdir)
+        try:
+            from benchmarks.suite import environment
+
+            report = {
+                'schema': SCHEMA_VERSION,
+                'environment': environment(),
+                'config': {key: value for key, value in vars(args).items() if key not in ('json', 'output')},
+            }
+            report.update(asyncio.run(run_load(args, base_url, events, out)))
+        finally:
+            os.chdir(previous_cwd)
+            server.terminate()
+            server.join(timeout=5)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""yt-dlp extractor plugin that stands in for YouTube during load tests.
+
+Only active when benchmarks/loadtest_plugins is on sys.path (benchmarks.loadtest
+puts it there). Plugin extractors are consulted before the built-in ones, so
+watch URLs, youtu.be links and YouTube Music searches resolve here. The track
+is served from LOADTEST_MEDIA_URL after LOADTEST_EXTRACT_LATENCY seconds. A
+search takes LOADTEST_SEARCH_LATENCY seconds and returns
+LOADTEST_SEARCH_RESULTS entries. LOADTEST_LATENCY_JITTER spreads both
+latencies uniformly by that fraction.
+"""
+import hashlib
+import os
+import random
+import time
+import urllib.parse
+
+from yt_dlp.extractor.common import InfoExtractor, SearchInfoExtractor
+
+
+def _setting(name, default):
+    return float(os.environ.get(name, default))
+
+
+def _wait(name, default):
+    latency = _setting(name, default)
+    jitter = _setting('LOADTEST_LATENCY_JITTER', '0')
+    if latency > 0:
+        time.sleep(latency * random.uniform(1 - jitter, 1 + jitter))
+
+
+def _track(video_id):
+    media_url = os.environ.get('LOADTEST_MEDIA_URL', 'http://127.0.0.1:8081/media').rstrip('/')
+    number = int(hashlib.md5(video_id.encode()).hexdigest()[:6], 16) % 1000
+    return {
+        'id': video_id,
+        'title': f"Load Artist {number} - Load Song {video_id}",
+        'track': f"Load Song {video_id}",
+        'artists': [f"Load Artist {number}"],
+        'album': f"Load Album {number % 50}",
+        'duration': int(_setting('LOADTEST_TRACK_SECONDS', '180')),
+        'webpage_url': f"https://music.youtube.com/watch?v={video_id}",
+        'thumbnails': [
+            {'url': f"{media_url}/cover.jpg?id={video_id}", 'width': 800, 'height': 800},
+            {'url': f"{media_url}/cover.jpg?small={video_id}", 'width': 120, 'height': 120},
+        ],
+        'formats': [{
+            'format_id': 'mp3',
+            'url': f"{media_url}/track.mp3?id={video_id}",
+            'ext': 'mp3',
+            'acodec': 'mp3',
+            'vcodec': 'none',
+            'abr': 128,
+            'protocol': 'http',
+        }],
+    }
+
+
+def _results(query, count):
+    for index in range(count):
+        video_id = 'lt' + hashlib.md5(f"{query}:{index}".encode()).hexdigest()[:9]
+        entry = _track(video_id)
+        entry.pop('formats')
+        entry.update({'_type': 'url', 'url': entry['webpage_url'], 'ie_key': 'LoadTestTrack'})
+        yield entry
+
+
+class LoadTestTrackIE(InfoExtractor):
+    IE_NAME = 'loadtest:track'
+    _VALID_URL = r'https?://(?:(?:www|m|music)\.)?(?:youtube\.com/watch\?(?:.*&)?v=|youtu\.be/)(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        _wait('LOADTEST_EXTRACT_LATENCY', '0.5')
+        return _track(video_id)
+
+
+class LoadTestMusicSearchIE(InfoExtractor):
+    IE_NAME = 'loadtest:musicsearch'
+    _VALID_URL = r'https?://music\.youtube\.com/search\?(?:.*&)?q=(?P<id>[^&]+)'
+
+    def _real_extract(self, url):
+        query = urllib.parse.unquote_plus(self._match_id(url))
+        _wait('LOADTEST_SEARCH_LATENCY', '0.3')
+        count = int(_setting('LOADTEST_SEARCH_RESULTS', '10'))
+        return self.playlist_result(_results(query, count), query, query)
+
+
+class LoadTestSearchIE(SearchInfoExtractor):
+    IE_NAME = 'loadtest:search'
+    _SEARCH_KEY = 'ytsearch'
+
+    def _search_results(self, query):
+        _wait('LOADTEST_SEARCH_LATENCY', '0.3')
+        yield from _results(query, int(_setting('LOADTEST_SEARCH_RESULTS', '10')))
@@ -0,0 +1,325 @@
+"""Offline micro-benchmark suite for the hot helpers, with JSON output for comparing commits.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [-k FILTER] [--repeat N] [--json] [--output FILE]
+                               [--compare BASELINE.json] [--threshold 0.15]
+                               [--info-json PATH ...]
+
+Needs no network. It covers compress_image on generated images of several
+sizes and modes, _embed_metadata and _prepare_downloaded_files on generated
+MP3 files, _extract_title_and_artist and pull_thumbnail on large yt-dlp
+style info dicts, and format_duration and is_url. Info dicts saved with
+``yt-dlp --write-info-json`` can be added with --info-json.
+
+Typical use: save a baseline on one commit with ``--output base.json``, then
+run ``--compare base.json`` on another. Cases whose median got slower by
+more than --threshold are reported, and the exit status is 1.
+Everything runs in a temporary directory, so nothing in the checkout is
+touched.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fixtures import load_info_json, make_cover_jpeg, make_info, make_playlist_info, write_mp3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_VERSION = 1
+
+
+@dataclass
+class Case:
+    name: str
+    group: str
+    func: Callable[[], object]
+    # Runs before every timed call and is not timed itself, e.g. to restore a file the call modifies.
+    setup: Optional[Callable[[], None]] = None
+    extra: Dict[str, object] = field(default_factory=dict)
+
+
+def _image_cases() -> List[Case]:
+    from benchmarks.bench_compress_image import MAX_SIZE, build_corpus
+    from utils.yt_downloader import compress_image
+
+    return [
+        Case(f"compress_image[{name}]", 'compress_image', lambda data=data: compress_image(data, max_size=MAX_SIZE), extra={'input_bytes': len(data)})
+        for name, data in build_corpus().items()
+    ]
+
+
+def _tagging_cases(workdir: str) -> List[Case]:
+    from utils.yt_downloader import _embed_metadata, _prepare_downloaded_files
+
+    fixtures = os.path.join(workdir, 'fixtures')
+    os.makedirs(fixtures, exist_ok=True)
+    short_mp3 = os.path.join(fixtures, 'short.mp3')
+    long_mp3 = os.path.join(fixtures, 'long.mp3')
+    write_mp3(short_mp3, 30)
+    write_mp3(long_mp3, 240)
+    cover = make_cover_jpeg()
+    info = make_info(seed=1)
+    playlist = make_playlist_info(entries=10, seed=2)
+
+    def embed_case(name: str, source: str, jpeg: Optional[bytes]) -> Case:
+        target = os.path.join(workdir, f"{name}.mp3")
+        return Case(
+            f"_embed_metadata[{name}]",
+            'tagging',
+            lambda: _embed_metadata(target, 'Song', 'Artist', info, jpeg),
+            setup=lambda: shutil.copyfile(source, target),
+            extra={'input_bytes': os.path.getsize(source)},
+        )
+
+    def prepare_case(name: str, tracks: int, thumbnail: bool, case_info: Dict) -> Case:
+        job_dir = os.path.join(workdir, f"job_{name}")
+
+        def setup() -> None:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            os.makedirs(job_dir)
+            for index in range(tracks):
+                shutil.copyfile(short_mp3, os.path.join(job_dir, f"track{index}.mp3"))
+            if thumbnail:
+                with open(os.path.join(job_dir, 'track0.jpg'), 'wb') as fh:
+                    fh.write(cover)
+
+        # Without a local thumbnail the cover comes prepared from the cover-art pipeline.
+        jpeg = None if thumbnail else cover
+        return Case(
+            f"_prepare_downloaded_files[{name}]",
+            'tagging',
+            lambda: _prepare_downloaded_files(job_dir, case_info, 'Artist', 'Song', jpeg_data=jpeg),
+            setup=setup,
+            extra={'tracks': tracks},
+        )
+
+    return [
+        embed_case('30s_no_cover', short_mp3, None),
+        embed_case('4min_cover', long_mp3, cover),
+        prepare_case('single_cover', 1, False, info),
+        prepare_case('single_local_thumbnail', 1, True, info),
+        prepare_case('playlist_10', 10, False, playlist),
+    ]
+
+
+def _info_cases(info_json: List[str]) -> List[Case]:
+    from utils.yt_downloader import _extract_title_and_artist, pull_thumbnail
+
+    infos = {
+        'track': make_info(seed=3),
+        'no_track_title_split': make_info(seed=4, track=False, artists=0),
+        'many_thumbnails': make_info(seed=5, thumbnails=1000),
+    }
+    for path, info in load_info_json(info_json).items():
+        infos[f"recorded:{os.path.basename(path)}"] = info
+    # The uploader of a Topic channel is an artist; drop it so the title split path is taken.
+    infos['no_track_title_split'].pop('uploader')
+    infos['no_track_title_split'].pop('channel')
+    playlist = make_playlist_info(entries=200, seed=6)
+
+    def each_entry(func: Callable[[Dict], object]) -> Callable[[], None]:
+        def run() -> None:
+            for entry in playlist['entries']:
+                func(entry)
+        return run
+
+    cases = []
+    for name, info in infos.items():
+        cases.append(Case(f"_extract_title_and_artist[{name}]", 'info', lambda info=info: _extract_title_and_artist(info)))
+        cases.append(Case(f"pull_thumbnail[{name}]", 'info', lambda info=info: pull_thumbnail(info)))
+    cases.append(Case('_extract_title_and_artist[playlist_200]', 'info', each_entry(_extract_title_and_artist), extra={'calls_per_op': 200}))
+    cases.append(Case('pull_thumbnail[playlist_200]', 'info', each_entry(pull_thumbnail), extra={'calls_per_op': 200}))
+    return cases
+
+
+def _handler_cases() -> List[Case]:
+    # config refuses to load without a token; these helpers never talk to Telegram.
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:benchmark')
+    from handlers.downloader import format_duration, is_url
+
+    durations = [None, 0, 59, 61, 3599, 3600, 86399, '215', '3:35', '1:02:03', '', 'live', 12.7]
+    texts = [
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVM',
+        'https://youtu.be/dQw4w9WgXcQ',
+        'https://soundcloud.com/artist/track',
+        'https://example.com/not/supported',
+        'never gonna give you up',
+        '  HTTPS://YOUTUBE.COM/watch?v=abc  ',
+        'x' * 500,
+    ]
+    return [
+        Case('format_duration[mixed_13]', 'handlers', lambda: [format_duration(value) for value in durations], extra={'calls_per_op': len(durations)}),
+        Case('is_url[mixed_8]', 'handlers', lambda: [is_url(text) for text in texts], extra={'calls_per_op': len(texts)}),
+    ]
+
+
+def _timed_call(case: Case) -> float:
+    if case.setup is not None:
+        case.setup()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        case.func()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(case: Case, repeat: int, min_time: float) -> Dict:
+    """Time case; each of the repeat samples is the mean over enough calls to last about min_time."""
+    if case.setup is None:
+        timer = timeit.Timer(case.func)
+        number = 1
+        # timeit's autorange, but with a configurable target instead of its fixed 0.2 s.
+        while timer.timeit(number) < min_time and number < 10_000_000:
+            number *= 10
+        samples = [total / number for total in timer.repeat(repeat, number)]
+    else:
+        # The first call pays for lazy imports, so calibrate on the second.
+        _timed_call(case)
+        first = _timed_call(case)
+        number = max(1, min(1000, int(min_time / first) if first else 1000))
+        samples = [sum(_timed_call(case) for _ in range(number)) / number for _ in range(repeat)]
+    row = {
+        'name': case.name,
+        'group': case.group,
+        'calls': number,
+        'repeat': repeat,
+        'median_ms': statistics.median(samples) * 1000,
+        'min_ms': min(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+        'stdev_ms': (statistics.stdev(samples) if len(samples) > 1 else 0.0) * 1000,
+    }
+    row.update(case.extra)
+    return row
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, object]:
+    import mutagen
+    import PIL
+
+    status = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'pillow': PIL.__version__,
+        'mutagen': mutagen.version_string,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def collect_cases(workdir: str, info_json: List[str]) -> List[Case]:
+    return [*_image_cases(), *_tagging_cases(workdir), *_info_cases(info_json), *_handler_cases()]
+
+
+def run(filters: List[str], repeat: int, min_time: float, info_json: List[str]) -> Dict:
+    info_json = [os.path.abspath(path) for path in info_json]
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Importing the handlers creates caches relative to the working directory.
+        os.chdir(workdir)
+        try:
+            cases = [case for case in collect_cases(workdir, info_json) if not filters or any(f in case.name or f == case.group for f in filters)]
+            results = []
+            for case in cases:
+                results.append(measure(case, repeat, min_time))
+                print(f"  {case.name}: {results[-1]['median_ms']:.4f} ms", file=sys.stderr, flush=True)
+        finally:
+            os.chdir(previous_cwd)
+    return {'schema': SCHEMA_VERSION, 'environment': environment(), 'results': results}
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """Match results by name; a ratio above 1 + threshold is a regression, below 1 - threshold an improvement."""
+    before = {row['name']: row for row in baseline.get('results', [])}
+    rows = []
+    for row in current['results']:
+        old = before.get(row['name'])
+        if old is None or not old['median_ms']:
+            continue
+        ratio = row['median_ms'] / old['median_ms']
+        verdict = 'slower' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else ''
+        rows.append({'name': row['name'], 'baseline_ms': old['median_ms'], 'current_ms': row['median_ms'], 'ratio': ratio, 'verdict': verdict})
+    return rows
+
+
+def _print_results(results: List[Dict]) -> None:
+    width = max(len(row['name']) for row in results) + 2
+    print(f"{'case':<{width}}{'median ms':>12}{'min ms':>12}{'stdev ms':>12}{'calls':>9}")
+    for row in results:
+        print(f"{row['name']:<{width}}{row['median_ms']:>12.4f}{row['min_ms']:>12.4f}{row['stdev_ms']:>12.4f}{row['calls']:>9}")
+
+
+def _print_comparison(rows: List[Dict], out) -> None:
+    if not rows:
+        print('No cases in common with the baseline.', file=out)
+        return
+    width = max(len(row['name']) for row in rows) + 2
+    print(f"{'case':<{width}}{'baseline ms':>13}{'current ms':>13}{'ratio':>8}", file=out)
+    for row in rows:
+        print(f"{row['name']:<{width}}{row['baseline_ms']:>13.4f}{row['current_ms']:>13.4f}{row['ratio']:>8.2f}  {row['verdict']}", file=out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='filters', action='append', default=[], help='only run cases whose name contains this or whose group is this (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5, help='samples per case (default: %(default)s)')
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds each sample should last (default: %(default)s)')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative change reported as a regression (default: %(default)s)')
+    parser.add_argument('--info-json', nargs='*', default=[], help='yt-dlp .info.json files to add to the info cases')
+    args = parser.parse_args()
+
+    report = run(args.filters, max(2, args.repeat), args.min_time, args.info_json)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_results(report['results'])
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        rows = compare(baseline, report, args.threshold)
+        # With --json stdout stays a single JSON document.
+        _print_comparison(rows, sys.stderr if args.json else sys.stdout)
+        regressions = [row for row in rows if row['verdict'] == 'slower']
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}.", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,118 @@
 """Entry point for the Telegram bot."""
 from __future__ import annotations
 
+import asyncio
+from typing import Optional
+
+from telegram import Update
 from telegram.ext import Application, ApplicationBuilder
 
-from config import BOT_COMMANDS, TOKEN
+from config import (
+    BOT_COMMANDS,
+    BOT_MODE,
+    CONCURRENT_UPDATES,
+    DOWNLOAD_BACKEND,
+    METRICS_HOST,
+    METRICS_PORT,
+    METRICS_SAMPLE_INTERVAL,
+    TELEGRAM_BASE_URL,
+    TOKEN,
+    WEBHOOK_CERT,
+    WEBHOOK_KEY,
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
+)
 from handlers import downloader, start
 from utils.logger import get_logger, setup_logging
+from utils.metrics import REGISTRY, MetricsServer
+from utils.yt_downloader import preload_dependencies
 
 logger = get_logger(__name__)
+_preload_task: Optional[asyncio.Task] = None
+metrics_server = MetricsServer(REGISTRY, METRICS_HOST, METRICS_PORT, sample_interval=METRICS_SAMPLE_INTERVAL)
 
 
 async def on_post_init(application: Application) -> None:
     """Configure bot commands once the application is ready."""
+    global _preload_task
+    # yt-dlp, Pillow and mutagen load in a thread while the first updates are already being handled.
+    _preload_task = asyncio.create_task(asyncio.to_thread(preload_dependencies))
     await application.bot.set_my_commands(BOT_COMMANDS)
+    await downloader.scratch_space.start()
+    # With DOWNLOAD_BACKEND=queue the workers download; warm processes here would sit idle.
+    if downloader.ytdlp_pool is not None and DOWNLOAD_BACKEND == 'inline':
+        await downloader.ytdlp_pool.start()
+    await metrics_server.start()
 
 
-def main() -> None:
-    setup_logging()
-    application = ApplicationBuilder().token(TOKEN).post_init(on_post_init).build()
+async def on_post_shutdown(application: Application) -> None:
+    """Flush persistent state before the process exits."""
+    await metrics_server.close()
+    start.close_user_langs()
+    start.media_assets.close()
+    start.rate_limiter.close()
+    await downloader.cover_art.close()
+    await downloader.scratch_space.close()
+    downloader.job_queue.close()
+    downloader.ydl_pool.close()
+    if downloader.ytdlp_pool is not None:
+        await downloader.ytdlp_pool.close()
+    downloader.search_executor.shutdown()
+
+
+def build_application() -> Application:
+    builder = ApplicationBuilder().token(TOKEN)
+    if TELEGRAM_BASE_URL:
+        builder = builder.base_url(f"{TELEGRAM_BASE_URL}/bot").base_file_url(f"{TELEGRAM_BASE_URL}/file/bot")
+    application = (
+        builder
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .rate_limiter(downloader.send_queue)
+        .post_init(on_post_init)
+        .post_shutdown(on_post_shutdown)
+        .build()
+    )
     start.register(application)
     downloader.register(application)
+    return application
+
+
+def run_webhook(application: Application) -> None:
+    """Serve updates over HTTP; several instances can share one WEBHOOK_URL behind a load balancer."""
+    if not WEBHOOK_SECRET_TOKEN:
+        logger.warning("WEBHOOK_SECRET_TOKEN is not set; the webhook accepts updates from anyone who knows its URL.")
+    logger.info("Starting bot webhook on %s:%s/%s.", WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH)
+    application.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=WEBHOOK_URL,
+        secret_token=WEBHOOK_SECRET_TOKEN or None,
+        # Without a certificate the server speaks plain HTTP behind a TLS-terminating proxy.
+        cert=WEBHOOK_CERT or None,
+        key=WEBHOOK_KEY or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=Update.ALL_TYPES,
+    )
+
+
+def main() -> None:
+    setup_logging()
+    application = build_application()
 
-    logger.info("Starting bot polling.")
     try:
-        application.run_polling()
+        if BOT_MODE == 'webhook':
+            run_webhook(application)
+        else:
+            logger.info("Starting bot polling.")
+            # chat_member updates are only delivered when requested explicitly.
+            application.run_polling(allowed_updates=Update.ALL_TYPES)
     except Exception as exc:
-        logger.critical("Bot polling failed: %s", exc, exc_info=True)
+        logger.critical("Bot %s failed: %s", BOT_MODE, exc, exc_info=True)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 from telegram import BotCommand, InlineKeyboardButton, ReplyKeyboardMarkup
@@ -10,15 +11,43 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TOKEN:
     raise ValueError("Cant found TELEGRAM_BOT_TOKEN in environment variables.")
 
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', '').rstrip('/')  # Bot API server root, e.g. a local telegram-bot-api; empty uses api.telegram.org
+
+# Update delivery: 'polling' (default) or 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')  # Address the webhook server binds to
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')  # URL path the server accepts updates on
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public HTTPS URL registered with Telegram, including WEBHOOK_PATH
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')  # Checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_CERT = os.getenv('WEBHOOK_CERT', '')  # TLS certificate; leave empty when TLS is terminated upstream
+WEBHOOK_KEY = os.getenv('WEBHOOK_KEY', '')  # TLS private key for WEBHOOK_CERT
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))  # Parallel connections Telegram may open (1-100)
+if BOT_MODE not in ('polling', 'webhook'):
+    raise ValueError(f"Unknown BOT_MODE {BOT_MODE!r}, expected 'polling' or 'webhook'.")
+if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+    raise ValueError("WEBHOOK_URL must be set when BOT_MODE is 'webhook'.")
+
 # Paths and variables
 cookies_path = os.getenv('COOKIES_PATH', 'youtube.com_cookies.txt')
 ffmpeg_path_from_env = os.getenv('FFMPEG_PATH')
 ffmpeg_path = ffmpeg_path_from_env if ffmpeg_path_from_env else '/usr/bin/ffmpeg'   # Default path for ffmpeg
 FFMPEG_IS_AVAILABLE = os.path.exists(ffmpeg_path) and os.access(ffmpeg_path, os.X_OK)   # Check if ffmpeg is available
 REQUIRED_CHANNELS = ["@ytdlpdeveloper"]  # Channel to which users must be subscribed
+SUBSCRIPTION_CACHE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', '600'))  # Seconds a confirmed subscription is trusted
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', '30'))  # Seconds a missing subscription is remembered
+SUBSCRIPTION_FAIL_OPEN = os.getenv('SUBSCRIPTION_FAIL_OPEN', 'false').lower() in ('1', 'true', 'yes')  # Let users through when the API check fails
 TELEGRAM_FILE_SIZE_LIMIT_BYTES = 50 * 1024 * 1024  # 50 MB in bytes
 TELEGRAM_FILE_SIZE_LIMIT_TEXT = "50 МБ"  # Text representation of the file size limit 
-USER_LANGS_FILE = "user_languages.json"  # File to store user language preferences
+USER_LANGS_FILE = "user_languages.json"  # Legacy language file, imported into USER_PREFS_DB on first start
+USER_PREFS_DB = os.getenv('USER_PREFS_DB', 'user_prefs.sqlite3')  # SQLite database with user preferences
+USER_PREFS_FLUSH_INTERVAL = float(os.getenv('USER_PREFS_FLUSH_INTERVAL', '1'))  # Seconds preference writes are batched
+# Per-user rate limits as "N/S" (N requests per S seconds); empty or 0 disables a limit
+RATE_LIMIT_START = os.getenv('RATE_LIMIT_START', '3/15')  # /start
+RATE_LIMIT_SEARCH = os.getenv('RATE_LIMIT_SEARCH', '20/60')  # Searches; a miss costs a yt-dlp extraction
+RATE_LIMIT_DOWNLOAD = os.getenv('RATE_LIMIT_DOWNLOAD', '30/600')  # Download requests (links and picked search results)
+RATE_LIMIT_MAX_USERS = int(os.getenv('RATE_LIMIT_MAX_USERS', '100000'))  # Users tracked per limit before the least recent are dropped
+RATE_LIMIT_STATE_PATH = os.getenv('RATE_LIMIT_STATE_PATH', 'rate_limits.sqlite3')  # Limits kept across restarts; empty disables
 # Keyboard for language selection
 LANG_KEYBOARD = ReplyKeyboardMarkup(
     [
@@ -47,7 +76,57 @@ LANG_CODES = {
 LANG_INLINE_BUTTONS = [InlineKeyboardButton(name, callback_data=f"lang_{code}") for name, code in LANG_CODES.items()]
 
 SEARCH_RESULTS_LIMIT = 10  # Search results limit
+# Updates handled in parallel. 1 keeps the sequential processing the bot has always had; searches and
+# downloads already leave the event loop, so raise it (e.g. to 64) only once every handler is known to be
+# safe to run concurrently for the same user.
+CONCURRENT_UPDATES = max(1, int(os.getenv('CONCURRENT_UPDATES', '1')))
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', '4'))  # Threads running yt-dlp searches
+SEARCH_MAX_QUEUE = int(os.getenv('SEARCH_MAX_QUEUE', '32'))  # Searches allowed to wait for a worker
+SEARCH_TIMEOUT = float(os.getenv('SEARCH_TIMEOUT', '20'))  # Seconds before a search is abandoned
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000'))  # Distinct queries kept in memory
+SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # Approximate memory budget; 0 = count bound only
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', '1800'))  # Seconds a non-empty result stays fresh
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv('SEARCH_CACHE_NEGATIVE_TTL', '120'))  # Seconds an empty result is cached
+SEARCH_CACHE_STALE_TTL = float(os.getenv('SEARCH_CACHE_STALE_TTL', '3600'))  # Extra seconds stale results are served while refreshing
 MAX_CONCURRENT_DOWNLOADS_PER_USER = int(os.getenv('MAX_CONCURRENT_DOWNLOADS_PER_USER', '3'))
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv('MAX_CONCURRENT_DOWNLOADS', '8'))  # Network downloads across all users
+MAX_CONCURRENT_TRANSCODES = int(os.getenv('MAX_CONCURRENT_TRANSCODES', str(os.cpu_count() or 2)))  # Parallel ffmpeg encodes
+COVER_ART_CACHE_DIR = os.getenv('COVER_ART_CACHE_DIR', 'cover_cache')  # Processed cover JPEGs; empty disables the disk cache
+COVER_ART_MEMORY_BYTES = int(os.getenv('COVER_ART_MEMORY_BYTES', str(32 * 1024 * 1024)))  # In-memory cover cache budget
+COVER_ART_WORKERS = int(os.getenv('COVER_ART_WORKERS', '2'))  # Threads encoding cover art
+YTDLP_BACKEND = os.getenv('YTDLP_BACKEND', 'thread').lower()  # 'thread' or 'process' (warm worker processes, one job each)
+YTDLP_PROCESS_WORKERS = int(os.getenv('YTDLP_PROCESS_WORKERS', str(os.cpu_count() or 2)))  # Worker processes for YTDLP_BACKEND=process, started only where downloads run (inline bot or worker.py)
+YDL_POOL_MAX_IDLE = int(os.getenv('YDL_POOL_MAX_IDLE', '8'))  # Warm YoutubeDL instances kept per option profile
+YDL_POOL_MAX_USES = int(os.getenv('YDL_POOL_MAX_USES', '200'))  # Jobs served before an instance is recycled
+YDL_POOL_MAX_AGE = float(os.getenv('YDL_POOL_MAX_AGE', '3600'))  # Seconds before an instance is recycled
+STREAM_TRANSCODE = os.getenv('STREAM_TRANSCODE', 'true').lower() in ('1', 'true', 'yes')  # Pipe downloads into ffmpeg while they arrive
+STATUS_UPDATE_INTERVAL = float(os.getenv('STATUS_UPDATE_INTERVAL', '3'))  # Minimum seconds between progress edits of one message
+SEND_LIMIT_GLOBAL = os.getenv('SEND_LIMIT_GLOBAL', '30/1')  # Outgoing messages across all chats, "N/S" like the RATE_LIMIT_* settings; per process unless SEND_LIMIT_SHARED_PATH applies
+SEND_LIMIT_PRIVATE = os.getenv('SEND_LIMIT_PRIVATE', '3/3')  # Per private chat: about one a second with short bursts
+SEND_LIMIT_GROUP = os.getenv('SEND_LIMIT_GROUP', '20/60')  # Per group or channel
+SEND_LIMIT_SHARED_PATH = os.getenv('SEND_LIMIT_SHARED_PATH', 'send_limits.sqlite3')  # With DOWNLOAD_BACKEND=queue, SQLite file through which the bot and its workers share the SEND_LIMIT_* budgets; empty makes them per process
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))  # RetryAfter retries before the error reaches the handler
+DOWNLOAD_BACKEND = os.getenv('DOWNLOAD_BACKEND', 'inline').lower()  # 'inline' downloads in the bot process, 'queue' hands jobs to worker.py
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', 'jobs.sqlite3')  # SQLite job queue shared by the bot and its workers
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))  # A job is reassigned if its worker stops renewing the lease
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '2'))  # Claims per job before it is given up on
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))  # Seconds an idle worker waits before polling again
+WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', '4'))  # Jobs one worker process runs at the same time
+DOWNLOAD_QUEUE_LIMIT = int(os.getenv('DOWNLOAD_QUEUE_LIMIT', '200'))  # Jobs allowed to wait for a download slot
+SCRATCH_DIR = os.getenv('SCRATCH_DIR', os.path.join(tempfile.gettempdir(), 'music_jacker'))  # On-disk job directories
+SCRATCH_TMPFS_DIR = os.getenv('SCRATCH_TMPFS_DIR', '')  # e.g. /dev/shm/music_jacker; empty keeps every job on disk
+SCRATCH_TMPFS_BYTES = int(os.getenv('SCRATCH_TMPFS_BYTES', str(512 * 1024 * 1024)))  # RAM budget before jobs spill to SCRATCH_DIR
+SCRATCH_QUOTA_BYTES = int(os.getenv('SCRATCH_QUOTA_BYTES', str(4 * 1024 * 1024 * 1024)))  # Total scratch reserved across jobs; 0 disables
+SCRATCH_JOB_RESERVE_BYTES = int(os.getenv('SCRATCH_JOB_RESERVE_BYTES', str(64 * 1024 * 1024)))  # Space reserved per job
+SCRATCH_STALE_AFTER = float(os.getenv('SCRATCH_STALE_AFTER', '10800'))  # Seconds after which any job directory is an orphan
+SCRATCH_SWEEP_INTERVAL = float(os.getenv('SCRATCH_SWEEP_INTERVAL', '600'))  # Seconds between janitor sweeps
+FILE_ID_CACHE_PATH = os.getenv('FILE_ID_CACHE_PATH', 'file_id_cache.sqlite3')  # SQLite file storing uploaded file_ids
+FILE_ID_CACHE_MAX_ENTRIES = int(os.getenv('FILE_ID_CACHE_MAX_ENTRIES', '200000'))  # 0 disables LRU eviction
+OUTPUT_PROFILE = os.getenv('OUTPUT_PROFILE', 'mp3_128')  # 'mp3_128' or 'native' (see utils/output_profiles.py); part of the file_id cache key
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # Address the Prometheus /metrics endpoint binds to
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))  # Port of the /metrics endpoint; 0 disables it
+METRICS_SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', '5'))  # Seconds between refreshes of gauges taken from component stats
+WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '0'))  # Default for worker.py --metrics-port. With DOWNLOAD_BACKEND=queue only workers record the download stage histograms, so 0 leaves them unexported
 # Dictionaries with localized texts
 LANGUAGES = {
     "ru": {
@@ -65,6 +144,8 @@ LANGUAGES = {
         "checking": "Проверяю ссылку...",
         "not_youtube": "Это не поддерживаемая ссылка. Отправьте корректную ссылку на YouTube или SoundCloud.",
         "downloading_audio": "Скачиваю аудио... Подождите.",
+        "queue_position": "Ожидаю в очереди, позиция {position}...",
+        "queue_full": "Бот сейчас перегружен. Попробуйте ещё раз через несколько минут.",
         "download_progress": "Скачиваю: {percent} на скорости {speed}, осталось ~{eta}",
         "too_big": f"Файл слишком большой (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Попробуйте другое видео или трек.",
         "done_audio": "Готово! Аудио отправлено.",
@@ -86,7 +167,9 @@ LANGUAGES = {
         "searching": "Ищу музыку...",
         "unsupported_url_in_search": "Ссылка не поддерживается. Пожалуйста, проверьте другую ссылку или попробуйте другой запрос. (Альтернативно, если у вас не получилось, вы можете загрузить трек от другого исполнителя или Remix)",
         "no_results": "Ничего не найдено. Попробуйте другой запрос.",
-        "start_rate_limited": "Вы использовали /start более 3 раз. Подождите {seconds} секунд и попробуйте снова.",
+        "search_busy": "Поиск сейчас перегружен. Попробуйте ещё раз через минуту.",
+        "start_rate_limited": "Вы слишком часто используете /start. Подождите {seconds} сек. и попробуйте снова.",
+        "rate_limited": "Слишком много запросов. Подождите {seconds} сек. и попробуйте снова.",
     "choose_track": "Выберите трек для скачивания в MP3 (128 kbps):",
     "downloading_selected_track": "Скачиваю выбранный трек в MP3 (128 kbps)...",
         "copyright_pre": "⚠️ Внимание! Загружаемый вами материал может быть защищён авторским правом. Используйте только для личных целей. Если вы являетесь правообладателем и считаете, что ваши права нарушены, напишите на copyrightytdlpbot@gmail.com для удаления контента.",
@@ -108,6 +191,8 @@ LANGUAGES = {
         "checking": "Checking link...",
         "not_youtube": "This is not a supported link. Please send a valid YouTube or SoundCloud link.",
         "downloading_audio": "Downloading audio... Please wait.",
+        "queue_position": "Waiting in queue, position {position}...",
+        "queue_full": "The bot is overloaded right now. Please try again in a few minutes.",
         "download_progress": "Downloading: {percent} at {speed}, ETA ~{eta}",
         "too_big": f"File is too large (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Try another video or track.",
         "done_audio": "Done! Audio sent.",
@@ -129,7 +214,9 @@ LANGUAGES = {
         "searching": "Searching for music...",
         "unsupported_url_in_search": "The link is not supported. Please check the link or try another query. (Alternatively, if it didn't work, you can download a track from another artist or Remix)",
         "no_results": "Nothing found. Try another query.",
-        "start_rate_limited": "You used /start more than 3 times. Please wait {seconds} seconds and try again.",
+        "search_busy": "Search is overloaded right now. Please try again in a moment.",
+        "start_rate_limited": "You are using /start too often. Please wait {seconds} seconds and try again.",
+        "rate_limited": "Too many requests. Please wait {seconds} seconds and try again.",
     "choose_track": "Select a track to download in MP3 (128 kbps):",
     "downloading_selected_track": "Downloading the selected track in MP3 (128 kbps)...",
         "copyright_pre": "⚠️ Warning! The material you are about to download may be protected by copyright. Use for personal purposes only. If you are a copyright holder and believe your rights are being violated, please contact copyrightytdlpbot@gmail.com for removal.",
@@ -151,6 +238,8 @@ LANGUAGES = {
         "checking": "Verificando enlace...",
         "not_youtube": "Este enlace no es compatible. Por favor, envía un enlace válido de YouTube o SoundCloud.",
         "downloading_audio": "Descargando audio... Por favor espera.",
+        "queue_position": "Esperando en la cola, posición {position}...",
+        "queue_full": "El bot está sobrecargado ahora mismo. Inténtalo de nuevo en unos minutos.",
         "download_progress": "Descargando: {percent} a {speed}, queda ~{eta}",
         "too_big": f"El archivo es demasiado grande (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Prueba con otro video o pista.",
         "done_audio": "¡Listo! Audio enviado.",
@@ -172,6 +261,9 @@ LANGUAGES = {
         "searching": "Buscando música...",
         "unsupported_url_in_search": "El enlace no es compatible. Por favor, compruebe el enlace o pruebe con otra consulta. (Alternativamente, si no funcionó, puede descargar una pista de otro artista o un Remix)",
         "no_results": "No se encontraron resultados. Intente con otra consulta.",
+        "search_busy": "La búsqueda está sobrecargada ahora mismo. Inténtalo de nuevo en un momento.",
+        "start_rate_limited": "Estás usando /start con demasiada frecuencia. Espera {seconds} segundos e inténtalo de nuevo.",
+        "rate_limited": "Demasiadas solicitudes. Espera {seconds} segundos e inténtalo de nuevo.",
     "choose_track": "Seleccione una pista para descargar en MP3 (128 kbps):",
     "downloading_selected_track": "Descargando la pista seleccionada en MP3 (128 kbps)...",
         "copyright_pre": "⚠️ ¡Atención! El material que está a punto de descargar puede estar protegido por derechos de autor. Úselo solo para fines personales. Si es titular de derechos y cree que se están violando sus derechos, escriba a copyrightytdlpbot@gmail.com para eliminar el contenido.",
@@ -193,6 +285,8 @@ LANGUAGES = {
         "checking": "Bağlantı kontrol ediliyor...",
         "not_youtube": "Bu desteklenmeyen bir bağlantı. Lütfen geçerli bir YouTube veya SoundCloud bağlantısı gönderin.",
         "downloading_audio": "Ses indiriliyor... Lütfen bekleyin.",
+        "queue_position": "Sırada bekleniyor, sıra {position}...",
+        "queue_full": "Bot şu anda çok yoğun. Lütfen birkaç dakika sonra tekrar deneyin.",
         "download_progress": "İndiriliyor: {percent} hızında {speed}, kalan ~{eta}",
         "too_big": f"Dosya çok büyük (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Başka bir video veya parça deneyin.",
         "done_audio": "Tamamlandı! Ses gönderildi.",
@@ -214,6 +308,9 @@ LANGUAGES = {
         "searching": "Musiqi axtarılır...",
         "unsupported_url_in_search": "Bağlantı desteklenmiyor. Lütfen bağlantıyı kontrol edin veya başka bir sorgu deneyin. (Alternatif olarak, işe yaramadıysa, başka bir sanatçıdan veya Remix bir parça indirebilirsiniz)",
         "no_results": "Hiçbir sonuç bulunamadı. Başka bir sorgu deneyin.",
+        "search_busy": "Arama şu anda çok yoğun. Lütfen birazdan tekrar deneyin.",
+        "start_rate_limited": "/start komutunu çok sık kullanıyorsunuz. Lütfen {seconds} saniye bekleyip tekrar deneyin.",
+        "rate_limited": "Çok fazla istek. Lütfen {seconds} saniye bekleyip tekrar deneyin.",
     "choose_track": "MP3 (128 kbps) olarak indirmek için bir parça seçin:",
     "downloading_selected_track": "Seçilen parça MP3 (128 kbps) olarak indiriliyor...",
         "copyright_pre": "⚠️ Dikkat! İndirmek üzere olduğunuz materyal telif hakkı ile korunabilir. Yalnızca kişisel kullanım için kullanın. Eğer telif hakkı sahibiyseniz ve haklarınızın ihlal edildiğini düşünüyorsanız, lütfen copyrightytdlpbot@gmail.com adresine yazın.",
@@ -235,6 +332,8 @@ LANGUAGES = {
         "checking": "جاري التحقق من الرابط...",
         "not_youtube": "هذا ليس رابطًا مدعومًا. يرجى إرسال رابط YouTube أو SoundCloud صالح.",
         "downloading_audio": "جاري تنزيل الصوت... يرجى الانتظار.",
+        "queue_position": "في قائمة الانتظار، الموقع {position}...",
+        "queue_full": "البوت مزدحم حاليًا. يرجى المحاولة مرة أخرى بعد بضع دقائق.",
         "download_progress": "جاري التنزيل: {percent} بسرعة {speed}، متبقي ~{eta}",
         "too_big": f"الملف كبير جدًا (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). جرب فيديو أو مسارًا آخر.",
         "done_audio": "تم! تم إرسال الصوت.",
@@ -256,6 +355,9 @@ LANGUAGES = {
         "searching": "جاري البحث عن الموسيقى...",
         "unsupported_url_in_search": "الرابط غير مدعوم. يرجى التحقق من الرابط أو تجربة استعلام آخر. (بدلاً من ذلك، إذا لم ينجح الأمر, يمكنك تنزيل مقطع صوتي من فنان آخر أو ريمكس)",
         "no_results": "لم يتم العثور على شيء. حاول استعلامًا آخر.",
+        "search_busy": "البحث مزدحم حاليًا. يرجى المحاولة مرة أخرى بعد قليل.",
+        "start_rate_limited": "أنت تستخدم /start كثيرًا. يرجى الانتظار {seconds} ثانية ثم المحاولة مرة أخرى.",
+        "rate_limited": "طلبات كثيرة جدًا. يرجى الانتظار {seconds} ثانية ثم المحاولة مرة أخرى.",
     "choose_track": "حدد مسارًا لتنزيله بصيغة MP3 (128 kbps):",
     "downloading_selected_track": "جاري تنزيل المسار المحدد بصيغة MP3 (128 kbps)...",
         "copyright_pre": "⚠️ تحذير! قد يكون المحتوى الذي توشك على تنزيله محميًا بحقوق النشر. استخدمه للأغراض الشخصية فقط. إذا كنت صاحب حقوق وتعتقد أن حقوقك منتهكة, يرجى التواصل عبر copyrightytdlpbot@gmail.com لحذف المحتوى.",
@@ -277,6 +379,8 @@ LANGUAGES = {
         "checking": "Link yoxlanılır...",
         "not_youtube": "Bu dəstəklənməyən bir bağlantıdır. Zəhmət olmasa, etibarlı bir YouTube və ya SoundCloud linki göndərin.",
         "downloading_audio": "Səs yüklənir... Zəhmət olmasa gözləyin.",
+        "queue_position": "Növbədə gözləyir, yer {position}...",
+        "queue_full": "Bot hazırda çox yüklənib. Bir neçə dəqiqədən sonra yenidən cəhd edin.",
         "download_progress": "Yüklənir: {percent} sürətlə {speed}, qalıb ~{eta}",
         "too_big": f"Fayl çox böyükdür (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Başqa bir video və ya trek sınayın.",
         "done_audio": "Hazırdır! Səs göndərildi.",
@@ -298,6 +402,9 @@ LANGUAGES = {
         "searching": "Musiqi axtarılır...",
         "unsupported_url_in_search": "Link dəstəklənmir. Zəhmət olmasa, linki yoxlayın və ya başqa bir sorğu sınayın. (Alternativ olaraq, əgər işləmədisə, başqa bir ifaçıdan və ya Remix bir trek yükləyə bilərsiniz)",
         "no_results": "Heç nə tapılmadı. Başqa bir sorğu sınayın.",
+        "search_busy": "Axtarış hazırda çox yüklənib. Bir azdan yenidən cəhd edin.",
+        "start_rate_limited": "/start əmrindən çox tez-tez istifadə edirsiniz. {seconds} saniyə gözləyib yenidən cəhd edin.",
+        "rate_limited": "Həddindən artıq çox sorğu. {seconds} saniyə gözləyib yenidən cəhd edin.",
     "choose_track": "MP3 (128 kbps) olaraq yükləmək üçün bir trek seçin:",
     "downloading_selected_track": "Seçilən trek MP3 (128 kbps) olaraq yüklənir...",
         "copyright_pre": "⚠️ Diqqət! Yüklədiyiniz material müəllif hüquqları ilə qoruna bilər. Yalnız şəxsi istifadə üçün istifadə edin. Əgər siz hüquq sahibiysanız və hüquqlarınızın pozulduğunu düşünürsənsə, zəhmət olmasa copyrightytdlpbot@gmail.com ünvanına yazın.",
@@ -319,6 +426,8 @@ LANGUAGES = {
         "checking": "Überprüfe den Link...",
         "not_youtube": "Dies ist kein unterstützter Link. Bitte sende einen gültigen YouTube- oder SoundCloud-Link.",
         "downloading_audio": "Lade Audio herunter... Bitte warten.",
+        "queue_position": "Warte in der Warteschlange, Position {position}...",
+        "queue_full": "Der Bot ist gerade überlastet. Bitte versuche es in ein paar Minuten noch einmal.",
         "download_progress": "Herunterladen: {percent} mit {speed}, verbleibend ~{eta}",
         "too_big": f"Die Datei ist zu groß (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Versuche ein anderes Video oder einen anderen Track.",
         "done_audio": "Fertig! Audio wurde gesendet.",
@@ -340,6 +449,9 @@ LANGUAGES = {
         "searching": "Suche nach Musik...",
         "unsupported_url_in_search": "Der Link wird nicht unterstützt. Bitte überprüfe den Link oder versuche eine andere Anfrage.",
         "no_results": "Keine Ergebnisse gefunden. Versuche eine andere Anfrage.",
+        "search_busy": "Die Suche ist gerade überlastet. Bitte versuche es gleich noch einmal.",
+        "start_rate_limited": "Du verwendest /start zu oft. Bitte warte {seconds} Sekunden und versuche es erneut.",
+        "rate_limited": "Zu viele Anfragen. Bitte warte {seconds} Sekunden und versuche es erneut.",
     "choose_track": "Wähle einen Track zum Herunterladen im MP3-Format (128 kbps):",
     "downloading_selected_track": "Lade den ausgewählten Track im MP3-Format (128 kbps) herunter...",
         "copyright_pre": "⚠️ Achtung! Das Material, das du herunterladen möchtest, könnte urheberrechtlich geschützt sein. Verwende es nur für persönliche Zwecke.",
@@ -361,6 +473,8 @@ LANGUAGES = {
         "checking": "リンクを確認しています...",
         "not_youtube": "サポートされていないリンクです。有効なYouTubeまたはSoundCloudのリンクを送信してください。",
         "downloading_audio": "音声をダウンロードしています... お待ちください。",
+        "queue_position": "キューで待機中です（{position} 番目）...",
+        "queue_full": "現在ボットが混み合っています。数分後にもう一度お試しください。",
         "download_progress": "ダウンロード中: {percent}、速度 {speed}、残り時間 ~{eta}",
         "too_big": f"ファイルが大きすぎます (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT})。別のビデオやトラックを試してください。",
         "done_audio": "完了！音声を送信しました。",
@@ -382,6 +496,9 @@ LANGUAGES = {
         "searching": "音楽を検索しています...",
         "unsupported_url_in_search": "そのリンクはサポートされていません。リンクを確認するか別のクエリを試してください。",
         "no_results": "結果が見つかりません。別のクエリを試してください。",
+        "search_busy": "現在検索が混み合っています。しばらくしてからもう一度お試しください。",
+        "start_rate_limited": "/start の使用が多すぎます。{seconds} 秒待ってからもう一度お試しください。",
+        "rate_limited": "リクエストが多すぎます。{seconds} 秒待ってからもう一度お試しください。",
         "choose_track": "MP3（128 kbps）でダウンロードするトラックを選択してください:",
         "downloading_selected_track": "選択したトラックをMP3（128 kbps）でダウンロードしています...",
         "copyright_pre": "⚠️ 注意！ダウンロードしようとしている素材は著作権で保護されている可能性があります。個人使用のみでご利用ください。権利者であり、権利侵害だと考える場合は copyrightytdlpbot@gmail.com までご連絡ください。",
@@ -403,6 +520,8 @@ LANGUAGES = {
         "checking": "링크 확인 중...",
         "not_youtube": "지원되지 않는 링크입니다. 유효한 YouTube 또는 SoundCloud 링크를 보내주세요.",
         "downloading_audio": "오디오를 다운로드 중입니다... 잠시만 기다려주세요.",
+        "queue_position": "대기열에서 기다리는 중입니다. 순서 {position}...",
+        "queue_full": "지금은 봇이 과부하 상태입니다. 몇 분 후 다시 시도하세요.",
         "download_progress": "다운로드 중: {percent} 속도 {speed}, 남은 시간 ~{eta}",
         "too_big": f"파일이 너무 큽니다 (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). 다른 비디오나 트랙을 시도해보세요.",
         "done_audio": "완료! 오디오를 전송했습니다.",
@@ -424,6 +543,9 @@ LANGUAGES = {
         "searching": "음악을 검색 중입니다...",
         "unsupported_url_in_search": "링크가 지원되지 않습니다. 링크를 확인하거나 다른 쿼리를 시도하세요.",
         "no_results": "결과가 없습니다. 다른 쿼리를 시도하세요.",
+        "search_busy": "지금은 검색 요청이 많습니다. 잠시 후 다시 시도하세요.",
+        "start_rate_limited": "/start를 너무 자주 사용하고 있습니다. {seconds}초 후 다시 시도하세요.",
+        "rate_limited": "요청이 너무 많습니다. {seconds}초 후 다시 시도하세요.",
         "choose_track": "MP3(128 kbps)로 다운로드할 트랙을 선택하세요:",
         "downloading_selected_track": "선택한 트랙을 MP3(128 kbps)로 다운로드 중입니다...",
         "copyright_pre": "⚠️ 경고! 다운로드하려는 자료는 저작권으로 보호될 수 있습니다. 개인적인 용도로만 사용하세요. 권리자이고 권리 침해라고 생각되면 copyrightytdlpbot@gmail.com 으로 연락해주세요.",
@@ -445,6 +567,8 @@ LANGUAGES = {
         "checking": "正在检查链接...",
         "not_youtube": "这不是受支持的链接。请发送有效的 YouTube 或 SoundCloud 链接。",
         "downloading_audio": "正在下载音频... 请稍候。",
+        "queue_position": "正在排队，第 {position} 位...",
+        "queue_full": "机器人当前繁忙，请几分钟后再试。",
         "download_progress": "下载中：{percent}，速度 {speed}，预计剩余 ~{eta}",
         "too_big": f"文件太大（>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}）。请尝试其他视频或曲目。",
         "done_audio": "完成！已发送音频。",
@@ -466,6 +590,9 @@ LANGUAGES = {
         "searching": "正在搜索音乐...",
         "unsupported_url_in_search": "该链接不受支持。请检查链接或尝试其他查询。",
         "no_results": "未找到任何结果。请尝试其他查询。",
+        "search_busy": "搜索当前繁忙，请稍后再试。",
+        "start_rate_limited": "您使用 /start 过于频繁，请等待 {seconds} 秒后再试。",
+        "rate_limited": "请求过多，请等待 {seconds} 秒后再试。",
         "choose_track": "选择要以 MP3（128 kbps）下载的曲目：",
         "downloading_selected_track": "正在以 MP3（128 kbps）下载所选曲目...",
         "copyright_pre": "⚠️ 注意！您即将下载的资料可能受版权保护。仅供个人使用。如果您是权利人并认为您的权利受到侵害，请联系 copyrightytdlpbot@gmail.com。",
@@ -487,6 +614,8 @@ LANGUAGES = {
         "checking": "Vérification du lien...",
         "not_youtube": "Ce n'est pas un lien pris en charge. Envoie un lien valide YouTube ou SoundCloud.",
         "downloading_audio": "Téléchargement de l'audio... Veuillez patienter.",
+        "queue_position": "En attente dans la file, position {position}...",
+        "queue_full": "Le bot est surchargé pour le moment. Réessaie dans quelques minutes.",
         "download_progress": "Téléchargement : {percent} à {speed}, reste ~{eta}",
         "too_big": f"Le fichier est trop volumineux (>{TELEGRAM_FILE_SIZE_LIMIT_TEXT}). Essaie une autre vidéo ou piste.",
         "done_audio": "Terminé ! Audio envoyé.",
@@ -508,6 +637,9 @@ LANGUAGES = {
         "searching": "Recherche de musique...",
         "unsupported_url_in_search": "Le lien n'est pas pris en charge. Vérifie le lien ou essaie une autre requête.",
         "no_results": "Aucun résultat trouvé. Essaie une autre requête.",
+        "search_busy": "La recherche est surchargée pour le moment. Réessaie dans un instant.",
+        "start_rate_limited": "Tu utilises /start trop souvent. Attends {seconds} secondes puis réessaie.",
+        "rate_limited": "Trop de requêtes. Attends {seconds} secondes puis réessaie.",
         "choose_track": "Sélectionne une piste à télécharger au format MP3 (128 kbps) :",
         "downloading_selected_track": "Téléchargement de la piste sélectionnée au format MP3 (128 kbps)...",
         "copyright_pre": "⚠️ Attention ! Le contenu que tu es sur le point de télécharger peut être protégé par des droits d'auteur. Utilise-le uniquement à des fins personnelles.",
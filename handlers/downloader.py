@@ -2,48 +2,235 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import os
-import shutil
-import tempfile
+import time
 import uuid
-from typing import Dict, List, Sequence
+from typing import Dict, List, Mapping, Optional, Sequence
 from urllib.parse import quote_plus
 
-import yt_dlp
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.error import BadRequest
+from telegram.ext import Application, CallbackQueryHandler, ChatMemberHandler, CommandHandler, ContextTypes, MessageHandler, filters
 
 from config import (
+    COVER_ART_CACHE_DIR,
+    COVER_ART_MEMORY_BYTES,
+    COVER_ART_WORKERS,
+    DOWNLOAD_BACKEND,
+    DOWNLOAD_QUEUE_LIMIT,
     FFMPEG_IS_AVAILABLE,
+    FILE_ID_CACHE_MAX_ENTRIES,
+    FILE_ID_CACHE_PATH,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUE_PATH,
     LANG_CODES,
-    LANGUAGES,
+    MAX_CONCURRENT_DOWNLOADS,
     MAX_CONCURRENT_DOWNLOADS_PER_USER,
+    MAX_CONCURRENT_TRANSCODES,
+    OUTPUT_PROFILE,
     REQUIRED_CHANNELS,
+    SCRATCH_DIR,
+    SCRATCH_JOB_RESERVE_BYTES,
+    SCRATCH_QUOTA_BYTES,
+    SCRATCH_STALE_AFTER,
+    SCRATCH_SWEEP_INTERVAL,
+    SCRATCH_TMPFS_BYTES,
+    SCRATCH_TMPFS_DIR,
+    SEARCH_CACHE_MAX_BYTES,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_NEGATIVE_TTL,
+    SEARCH_CACHE_STALE_TTL,
+    SEARCH_CACHE_TTL,
+    SEARCH_MAX_QUEUE,
     SEARCH_RESULTS_LIMIT,
+    SEARCH_TIMEOUT,
+    SEARCH_WORKERS,
+    SEND_LIMIT_GLOBAL,
+    SEND_LIMIT_GROUP,
+    SEND_LIMIT_PRIVATE,
+    SEND_LIMIT_SHARED_PATH,
+    SEND_MAX_RETRIES,
+    STATUS_UPDATE_INTERVAL,
+    STREAM_TRANSCODE,
+    SUBSCRIPTION_CACHE_TTL,
+    SUBSCRIPTION_FAIL_OPEN,
+    SUBSCRIPTION_NEGATIVE_TTL,
     TELEGRAM_FILE_SIZE_LIMIT_BYTES,
     TELEGRAM_FILE_SIZE_LIMIT_TEXT,
+    YDL_POOL_MAX_AGE,
+    YDL_POOL_MAX_IDLE,
+    YDL_POOL_MAX_USES,
+    YTDLP_BACKEND,
+    YTDLP_PROCESS_WORKERS,
     cookies_path,
     ffmpeg_path,
 )
-from handlers.start import get_user_lang
+from handlers.start import get_user_lang, get_user_texts, rate_limit_reply
+from utils.cover_art import CoverArtPipeline
+from utils.executor import BoundedExecutor, ExecutorBusy
+from utils.file_id_cache import FileIdCache
+from utils.inflight import InflightCoalescer, ProgressListener
+from utils.job_queue import QUEUED, SQLiteJobQueue
 from utils.logger import get_logger
-from utils.yt_downloader import DownloadResult, download_audio
+from utils.metrics import REGISTRY
+from utils.output_profiles import get_profile, mode_stats
+from utils.rate_limiter import RatePolicy
+from utils.scheduler import DownloadScheduler, SchedulerQueueFull
+from utils.scratch import ScratchSpace
+from utils.search_cache import SearchCache, normalize_query
+from utils.send_queue import SendQueue, SharedSendBudget
+from utils.status_updater import StatusUpdater
+from utils.subscription_cache import SubscriptionCache
+from utils.ydl_pool import YoutubeDLPool
+from utils.yt_downloader import DownloadResult, canonical_track_key, download_audio, stage_seconds
+from utils.ytdlp_process import YtDlpProcessPool
+from utils.ytdlp_session import SEARCH_PROFILE, thread_session
 
 logger = get_logger(__name__)
 
+file_id_cache = FileIdCache(FILE_ID_CACHE_PATH, max_entries=FILE_ID_CACHE_MAX_ENTRIES)
+job_queue = SQLiteJobQueue(JOB_QUEUE_PATH, max_attempts=JOB_MAX_ATTEMPTS)
+search_executor = BoundedExecutor('search', max_workers=SEARCH_WORKERS, max_queue=SEARCH_MAX_QUEUE)
+search_cache = SearchCache(
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+    ttl=SEARCH_CACHE_TTL,
+    negative_ttl=SEARCH_CACHE_NEGATIVE_TTL,
+    stale_ttl=SEARCH_CACHE_STALE_TTL,
+)
+_inflight_searches: Dict[str, asyncio.Task] = {}
+subscription_cache = SubscriptionCache(
+    REQUIRED_CHANNELS,
+    positive_ttl=SUBSCRIPTION_CACHE_TTL,
+    negative_ttl=SUBSCRIPTION_NEGATIVE_TTL,
+    fail_open=SUBSCRIPTION_FAIL_OPEN,
+)
+output_profile = get_profile(OUTPUT_PROFILE)
+cover_art = CoverArtPipeline(
+    COVER_ART_CACHE_DIR or None,
+    memory_bytes=COVER_ART_MEMORY_BYTES,
+    workers=COVER_ART_WORKERS,
+)
+scratch_space = ScratchSpace(
+    SCRATCH_DIR,
+    quota_bytes=SCRATCH_QUOTA_BYTES,
+    reserve_bytes=SCRATCH_JOB_RESERVE_BYTES,
+    tmpfs_dir=SCRATCH_TMPFS_DIR or None,
+    tmpfs_bytes=SCRATCH_TMPFS_BYTES,
+    stale_after=SCRATCH_STALE_AFTER,
+    sweep_interval=SCRATCH_SWEEP_INTERVAL,
+)
+ydl_pool = YoutubeDLPool(max_idle_per_key=YDL_POOL_MAX_IDLE, max_uses=YDL_POOL_MAX_USES, max_age=YDL_POOL_MAX_AGE)
+# With the process backend yt-dlp runs in warm worker processes instead of this process's threads.
+ytdlp_pool: Optional[YtDlpProcessPool] = (
+    YtDlpProcessPool(YTDLP_PROCESS_WORKERS, ydl_max_uses=YDL_POOL_MAX_USES, ydl_max_age=YDL_POOL_MAX_AGE)
+    if YTDLP_BACKEND == 'process'
+    else None
+)
+# Installed as the bot's rate limiter by bot.py and worker.py; every Bot API call goes through it.
+# In queue mode the bot and its workers post as the same bot, so they share one budget.
+send_queue = SendQueue(
+    global_policy=RatePolicy.parse('send_global', SEND_LIMIT_GLOBAL),
+    private_policy=RatePolicy.parse('send_private', SEND_LIMIT_PRIVATE),
+    group_policy=RatePolicy.parse('send_group', SEND_LIMIT_GROUP),
+    max_retries=SEND_MAX_RETRIES,
+    shared=SharedSendBudget(SEND_LIMIT_SHARED_PATH) if DOWNLOAD_BACKEND == 'queue' and SEND_LIMIT_SHARED_PATH else None,
+)
+download_scheduler = DownloadScheduler(
+    max_downloads=MAX_CONCURRENT_DOWNLOADS,
+    max_transcodes=MAX_CONCURRENT_TRANSCODES,
+    max_queue=DOWNLOAD_QUEUE_LIMIT,
+)
+
+search_seconds = REGISTRY.histogram('musicbot_search_seconds', 'search_youtube latency by where the results came from', ('source',))
+cache_lookups = REGISTRY.counter('musicbot_cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result'))
+errors = REGISTRY.counter('musicbot_errors_total', 'Errors by pipeline stage and exception type', ('stage', 'type'))
+downloads = REGISTRY.counter('musicbot_downloads_total', 'Download requests by outcome (partial: only some files of a playlist were sent)', ('outcome',))
+active_downloads = REGISTRY.gauge('musicbot_active_downloads', 'Downloads holding a network slot')
+queued_jobs = REGISTRY.gauge('musicbot_queued_jobs', 'Jobs waiting for a download slot or a worker', ('queue',))
+scratch_bytes = REGISTRY.gauge('musicbot_scratch_bytes', 'Scratch space reserved by running jobs and last measured on disk', ('kind',))
+
+
+def _collect_metrics() -> None:
+    scheduler = download_scheduler.stats()
+    active_downloads.set(scheduler['active_downloads'])
+    queued_jobs.set(scheduler['queued'], queue='scheduler')
+    scratch = scratch_space.stats()
+    scratch_bytes.set(scratch['reserved_bytes'], kind='reserved')
+    scratch_bytes.set(scratch['used_bytes'], kind='used')
+    components = {
+        'search_executor': search_executor,
+        'search_cache': search_cache,
+        'subscription_cache': subscription_cache,
+        'file_id_cache': file_id_cache,
+        'cover_art': cover_art,
+        'scratch': scratch_space,
+        'scheduler': download_scheduler,
+        'download_coalescer': download_coalescer,
+        'ydl_pool': ydl_pool,
+        'ytdlp_process_pool': ytdlp_pool,
+        'send_queue': send_queue,
+    }
+    for name, component in components.items():
+        if component is not None:
+            REGISTRY.record_stats(name, component.stats())
+    REGISTRY.record_stats('output_modes', mode_stats())
+
+
+def _collect_job_queue_metrics() -> None:
+    queued_jobs.set(job_queue.stats()[QUEUED], queue='job_queue')
+
+
+REGISTRY.add_collector(_collect_metrics)
+if DOWNLOAD_BACKEND == 'queue':
+    REGISTRY.add_collector(_collect_job_queue_metrics, blocking=True)
+
+
+async def send_cached_audio(bot, chat_id: int, track_key: str, profile: str = output_profile.name, count: bool = True) -> bool:
+    """Send a previously uploaded track by file_id. Return False when there is no usable entry.
+
+    count=False re-checks the cache for a request whose lookup was already
+    counted, so it does not show up twice in the hit/miss statistics.
+    """
+    if not count:
+        cached = await asyncio.to_thread(file_id_cache.peek, track_key, profile)
+    else:
+        cached = await asyncio.to_thread(file_id_cache.get, track_key, profile)
+        cache_lookups.inc(cache='file_id', result='hit' if cached else 'miss')
+        if (file_id_cache.hits + file_id_cache.misses) % 100 == 0:
+            logger.info("file_id cache stats: %s", file_id_cache.stats())
+    if not cached:
+        return False
+    try:
+        await bot.send_audio(chat_id=chat_id, audio=cached.file_id, title=cached.title or None, performer=cached.performer or None)
+    except BadRequest as exc:
+        logger.warning("Cached file_id for %s was rejected, invalidating: %s", track_key, exc)
+        errors.inc(stage='cached_send', type=type(exc).__name__)
+        await asyncio.to_thread(file_id_cache.invalidate, track_key, profile)
+        return False
+    except Exception as exc:
+        errors.inc(stage='cached_send', type=type(exc).__name__)
+        logger.error("Error sending cached audio %s to chat %s: %s", track_key, chat_id, exc)
+        return False
+    return True
+
 
 async def check_subscription(user_id: int, bot) -> bool:
     """Ensure user is subscribed to all required channels."""
-    for channel in REQUIRED_CHANNELS:
-        try:
-            member = await bot.get_chat_member(channel, user_id)
-        except Exception as exc:
-            logger.error("Error checking subscription for user %s in %s: %s", user_id, channel, exc)
-            return False
-        if member.status not in {"member", "administrator", "creator"}:
-            logger.info("User %s is not subscribed to %s", user_id, channel)
-            return False
-    return True
+    return await subscription_cache.is_subscribed(user_id, bot)
+
+
+async def chat_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Keep the subscription cache in sync with membership changes in required channels."""
+    member_update = update.chat_member
+    if not member_update:
+        return
+    chat = member_update.chat
+    new_member = member_update.new_chat_member
+    for channel in filter(None, (chat.username, str(chat.id))):
+        subscription_cache.apply_member_update(new_member.user.id, channel, new_member.status)
+    logger.debug("Chat member update in %s: user %s is now %s.", chat.id, new_member.user.id, new_member.status)
 
 
 def is_url(text: str) -> bool:
@@ -85,11 +272,28 @@ def format_duration(duration_seconds) -> str:
         return ""
 
 
-async def search_youtube(query: str):
-    """Perform YouTube search or return 'unsupported_url'."""
-    if is_url(query):
-        return 'unsupported_url'
+def _is_music_entry(entry: Dict) -> bool:
+    try:
+        if not isinstance(entry, dict):
+            return False
+        if entry.get('track') or entry.get('artists'):
+            return True
+        ie = str(entry.get('ie_key') or entry.get('extractor') or '').lower()
+        if 'music' in ie:
+            return True
+        url = entry.get('url') or entry.get('webpage_url') or ''
+        if 'music.youtube.com' in url:
+            return True
+        duration = entry.get('duration')
+        if isinstance(duration, (int, float)) and 0 < duration < 600 and not entry.get('is_live'):
+            return True
+    except Exception:
+        return False
+    return False
+
 
+def blocking_search_youtube(query: str) -> List[Dict]:
+    """Run the YouTube Music search (with ytsearch fallback) synchronously."""
     ydl_opts = {
         'quiet': True,
         'skip_download': True,
@@ -99,67 +303,292 @@ async def search_youtube(query: str):
         'noplaylist': True,
     }
 
+    safe_query = quote_plus(query)
+    music_search = f"https://music.youtube.com/search?q={safe_query}"
+    logger.info("Searching YouTube Music for query: %s", query)
+    with ydl_pool.checkout(SEARCH_PROFILE, ydl_opts) as ydl:
+        info = ydl.extract_info(music_search, download=False)
+
+    entries: Sequence[Dict] = []
+    if isinstance(info, dict):
+        if info.get('entries'):
+            entries = info['entries']
+        elif info.get('results'):
+            entries = info['results']
+    elif isinstance(info, list):
+        entries = info
+
+    music_entries = [item for item in entries if _is_music_entry(item)] if entries else []
+    if not music_entries:
+        logger.info("No music-specific entries found, falling back to ytsearch for query: %s", query)
+        yt_search_query = f"ytsearch{SEARCH_RESULTS_LIMIT}:{query}"
+        with ydl_pool.checkout(SEARCH_PROFILE, ydl_opts) as ydl:
+            info = ydl.extract_info(yt_search_query, download=False)
+        entries = info.get('entries', []) or []
+        music_entries = [item for item in entries if _is_music_entry(item)] or entries
+
+    return list(music_entries)[:SEARCH_RESULTS_LIMIT]
+
+
+async def _search_uncached(query: str):
+    """Run one search on the executor; return results, a sentinel string, or None on failure."""
     try:
-        safe_query = quote_plus(query)
-        music_search = f"https://music.youtube.com/search?q={safe_query}"
-        logger.info("Searching YouTube Music for query: %s", query)
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(music_search, download=False)
-
-        entries: Sequence[Dict] = []
-        if isinstance(info, dict):
-            if info.get('entries'):
-                entries = info['entries']
-            elif info.get('results'):
-                entries = info['results']
-        elif isinstance(info, list):
-            entries = info
-
-        def is_music_entry(entry: Dict) -> bool:
-            try:
-                if not isinstance(entry, dict):
-                    return False
-                if entry.get('track') or entry.get('artists'):
-                    return True
-                ie = str(entry.get('ie_key') or entry.get('extractor') or '').lower()
-                if 'music' in ie:
-                    return True
-                url = entry.get('url') or entry.get('webpage_url') or ''
-                if 'music.youtube.com' in url:
-                    return True
-                duration = entry.get('duration')
-                if isinstance(duration, (int, float)) and 0 < duration < 600 and not entry.get('is_live'):
-                    return True
-            except Exception:
-                return False
-            return False
+        results = await search_executor.run(blocking_search_youtube, query, timeout=SEARCH_TIMEOUT)
+    except ExecutorBusy:
+        errors.inc(stage='search', type='ExecutorBusy')
+        logger.warning("Search executor saturated (%s), rejecting query: %s", search_executor.stats(), query)
+        return 'busy'
+    except asyncio.TimeoutError:
+        errors.inc(stage='search', type='TimeoutError')
+        logger.error("YouTube search timed out after %ss for %s", SEARCH_TIMEOUT, query)
+        return None
+    except Exception as exc:
+        # yt-dlp is imported lazily; by the time a search has failed it is loaded.
+        from yt_dlp.utils import DownloadError
 
-        music_entries = [item for item in entries if is_music_entry(item)] if entries else []
-        if not music_entries:
-            logger.info("No music-specific entries found, falling back to ytsearch for query: %s", query)
-            yt_search_query = f"ytsearch{SEARCH_RESULTS_LIMIT}:{query}"
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(yt_search_query, download=False)
-            entries = info.get('entries', []) or []
-            music_entries = [item for item in entries if is_music_entry(item)] or entries
-
-        if not music_entries:
-            logger.info("No results found for query: %s", query)
-            return []
-
-        return list(music_entries)[:SEARCH_RESULTS_LIMIT]
-    except yt_dlp.utils.DownloadError as exc:
+        errors.inc(stage='search', type=type(exc).__name__)
+        if not isinstance(exc, DownloadError):
+            logger.critical("Unhandled error during YouTube search for %s", query, exc_info=True)
+            return None
         if 'Unsupported URL' in str(exc) or 'unsupported url' in str(exc).lower():
             logger.warning("Unsupported URL in search query: %s", query)
             return 'unsupported_url'
         logger.error("DownloadError during YouTube search for %s: %s", query, exc)
+        return None
+
+    if isinstance(results, list):
+        search_cache.put(normalize_query(query), results)
+    return results
+
+
+def _search_shared(query: str) -> asyncio.Task:
+    """Return the in-flight search for this normalized query, starting one if needed."""
+    key = normalize_query(query)
+    task = _inflight_searches.get(key)
+    if task is None:
+        task = asyncio.create_task(_search_uncached(query))
+        _inflight_searches[key] = task
+        task.add_done_callback(lambda _task: _inflight_searches.pop(key, None))
+    return task
+
+
+async def search_youtube(query: str):
+    """Perform YouTube search off the event loop; return results, 'unsupported_url' or 'busy'."""
+    if is_url(query):
+        return 'unsupported_url'
+
+    started = time.perf_counter()
+    cached, stale = search_cache.get(normalize_query(query))
+    cache_lookups.inc(cache='search', result='miss' if cached is None else 'stale' if stale else 'hit')
+    stats = search_cache.stats()
+    if (stats['hits'] + stats['stale_hits'] + stats['misses']) % 100 == 0:
+        logger.info("Search cache stats: %s", stats)
+    if cached is not None:
+        if stale:
+            _search_shared(query)
+        search_seconds.observe(time.perf_counter() - started, source='cache')
+        return cached
+
+    # Shield so that one caller giving up does not cancel the search for the others.
+    results = await asyncio.shield(_search_shared(query))
+    search_seconds.observe(time.perf_counter() - started, source='youtube')
+    if not results:
+        logger.info("No results found for query: %s", query)
         return []
+    return results
+
+
+def _cleanup_download(result: DownloadResult) -> None:
+    if result.temp_dir:
+        scratch_space.release(result.temp_dir)
+        logger.info("Cleaned up temporary directory %s.", result.temp_dir)
+
+
+download_coalescer: InflightCoalescer[DownloadResult] = InflightCoalescer(on_release=_cleanup_download)
+
+
+async def _run_shared_download(url: str, user_id: int, progress: ProgressListener) -> DownloadResult:
+    """Download job shared by every user waiting for the same track."""
+    job_id = uuid.uuid4().hex[:12]
+    scratch_path: Optional[str] = None
+
+    async def acquire_scratch() -> str:
+        nonlocal scratch_path
+        scratch = await scratch_space.acquire(job_id)
+        scratch_path = scratch.path
+        return scratch_path
+
+    async def report_queue_position(position: int) -> None:
+        progress({'status': 'queued', 'position': position})
+
+    ffmpeg = ffmpeg_path if FFMPEG_IS_AVAILABLE else None
+    try:
+        logger.info("Download job %s started for %s", job_id, url)
+        return await download_audio(
+            url,
+            acquire_scratch,
+            cookies_path,
+            ffmpeg,
+            progress,
+            download_slot=lambda: download_scheduler.download_slot(user_id, report_queue_position),
+            transcode_slot=download_scheduler.transcode_slot,
+            cover_art=cover_art,
+            stream=STREAM_TRANSCODE,
+            profile=output_profile,
+            session_factory=ytdlp_pool.session if ytdlp_pool is not None else functools.partial(thread_session, pool=ydl_pool),
+        )
+    except BaseException:
+        scratch_space.release(scratch_path)
+        raise
+
+
+def _cancel_keyboard(texts: Mapping[str, str], user_id: int, task_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(texts['cancel_button'], callback_data=f"cancel_{user_id}_{task_id}")]])
+
+
+async def process_download(
+    bot,
+    chat_id: int,
+    user_id: int,
+    url: str,
+    texts: Mapping[str, str],
+    status_message_id: int,
+    cancel_keyboard: Optional[InlineKeyboardMarkup],
+    progress_listener: Optional[ProgressListener] = None,
+) -> bool:
+    """Download url and deliver it to chat_id, reporting progress on the status message.
+
+    Used by handle_download in the bot process and by worker.py. Failures and
+    cancellation are reported to the user rather than raised; the return value
+    tells whether the track was delivered.
+    """
+    loop = asyncio.get_running_loop()
+    status_updater = StatusUpdater(
+        lambda text, markup: bot.edit_message_text(text, chat_id=chat_id, message_id=status_message_id, reply_markup=markup),
+        loop,
+        STATUS_UPDATE_INTERVAL,
+    )
+
+    async def update_status_message_async(text_to_update: str, show_cancel_button: bool = True) -> None:
+        # Intermediate states are coalesced and rate limited; a state without the cancel button is final.
+        if show_cancel_button:
+            status_updater.set(text_to_update, cancel_keyboard)
+        else:
+            await status_updater.finish(text_to_update)
+
+    def progress_hook(data: Dict) -> None:
+        if progress_listener is not None:
+            progress_listener(data)
+        if data.get('status') == 'downloading':
+            percent = data.get('_percent_str', 'N/A').strip()
+            speed = data.get('_speed_str', 'N/A').strip()
+            eta = data.get('_eta_str', 'N/A').strip()
+            progress_text = texts['download_progress'].format(percent=percent, speed=speed, eta=eta)
+        elif data.get('status') == 'queued':
+            progress_text = texts['queue_position'].format(position=data.get('position'))
+        else:
+            return
+        status_updater.set(progress_text, cancel_keyboard)
+
+    track_key = canonical_track_key(url)
+    started = time.perf_counter()
+
+    try:
+        if await send_cached_audio(bot, chat_id, track_key):
+            await bot.send_message(chat_id=chat_id, text=texts.get('copyright_post'))
+            await update_status_message_async(texts['done_audio'], show_cancel_button=False)
+            logger.info("Served %s to user %s from file_id cache.", track_key, user_id)
+            downloads.inc(outcome='cached')
+            return True
+
+        await asyncio.sleep(10)
+
+        async with download_coalescer.join(
+            f"{track_key}|{output_profile.name}",
+            lambda progress: _run_shared_download(url, user_id, progress),
+            listener=progress_hook,
+        ) as flight:
+            download_result: DownloadResult = flight.result
+            total_files = len(download_result.files)
+            delivered_files = 0
+            for index, (file_path, title) in enumerate(download_result.files, start=1):
+                await update_status_message_async(texts['sending_file'].format(index=index, total=total_files))
+                file_size = os.path.getsize(file_path)
+                if file_size > TELEGRAM_FILE_SIZE_LIMIT_BYTES:
+                    await bot.send_message(chat_id=chat_id, text=f"{texts['too_big']} ({os.path.basename(file_path)})")
+                    continue
+
+                try:
+                    # Waiters upload one at a time so everyone after the first reuses its file_id.
+                    async with flight.lock:
+                        if total_files == 1 and await send_cached_audio(bot, chat_id, track_key, count=False):
+                            sent = None
+                        else:
+                            with open(file_path, 'rb') as fp, stage_seconds.time(stage='upload'):
+                                sent = await bot.send_audio(
+                                    chat_id=chat_id,
+                                    audio=fp,
+                                    title=title,
+                                    performer=download_result.artist,
+                                    filename=os.path.basename(file_path),
+                                )
+                        if total_files == 1 and sent and sent.audio:
+                            await asyncio.to_thread(
+                                file_id_cache.put,
+                                track_key,
+                                output_profile.name,
+                                sent.audio.file_id,
+                                title=title,
+                                performer=download_result.artist,
+                                file_unique_id=sent.audio.file_unique_id,
+                            )
+                    delivered_files += 1
+                    await bot.send_message(chat_id=chat_id, text=texts.get('copyright_post'))
+                    logger.info("Successfully sent audio for %s to user %s (output modes so far: %s)", url, user_id, mode_stats())
+                except Exception as exc:
+                    errors.inc(stage='upload', type=type(exc).__name__)
+                    logger.error("Error sending audio file %s to user %s: %s", os.path.basename(file_path), user_id, exc)
+                    await bot.send_message(chat_id=chat_id, text=f"{texts['error']} (Error sending file {os.path.basename(file_path)})")
+
+        if not delivered_files:
+            # Every file was too big or failed to upload; each failure was already reported.
+            downloads.inc(outcome='failed')
+            await update_status_message_async(texts['error'], show_cancel_button=False)
+            return False
+        downloads.inc(outcome='delivered' if delivered_files == total_files else 'partial')
+        await update_status_message_async(texts['done_audio'], show_cancel_button=False)
+        return True
+
+    except FileNotFoundError:
+        errors.inc(stage='download', type='FileNotFoundError')
+        downloads.inc(outcome='failed')
+        await update_status_message_async(texts['error'] + ' (audio file not found)', show_cancel_button=False)
+    except SchedulerQueueFull:
+        downloads.inc(outcome='rejected')
+        await update_status_message_async(
+            texts['queue_full'],
+            show_cancel_button=False,
+        )
+    except asyncio.CancelledError:
+        logger.info("Download cancelled for user %s.", user_id)
+        downloads.inc(outcome='cancelled')
+        await update_status_message_async(texts['cancelled'], show_cancel_button=False)
     except Exception as exc:
-        logger.critical("Unhandled error during YouTube search for %s", query, exc_info=True)
-        return []
+        errors.inc(stage='download', type=type(exc).__name__)
+        if 'Unsupported URL' in str(exc) or 'unsupported url' in str(exc).lower():
+            downloads.inc(outcome='unsupported')
+            unsupported = texts.get('unsupported_url_in_search', 'The link is not supported. Please check the link or try another query.')
+            await update_status_message_async(unsupported, show_cancel_button=False)
+            return False
+        downloads.inc(outcome='failed')
+        logger.critical("Unhandled error in handle_download for user %s: %s", user_id, exc, exc_info=True)
+        await update_status_message_async(texts['error'] + str(exc), show_cancel_button=False)
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage='total')
+    return False
 
 
-async def handle_download(update_or_query, context: ContextTypes.DEFAULT_TYPE, url: str, texts: Dict[str, str], user_id: int) -> None:
+async def handle_download(update_or_query, context: ContextTypes.DEFAULT_TYPE, url: str, texts: Mapping[str, str], user_id: int) -> None:
     if not update_or_query.message:
         try:
             await context.bot.send_message(chat_id=user_id, text=texts['error'] + ' (internal error: chat not found)')
@@ -168,10 +597,7 @@ async def handle_download(update_or_query, context: ContextTypes.DEFAULT_TYPE, u
         return
 
     chat_id = update_or_query.message.chat_id
-    temp_dir = None
-    status_message = None
     active_downloads = context.bot_data.setdefault('active_downloads', {})
-    loop = asyncio.get_running_loop()
 
     task_id = None
     user_tasks = active_downloads.get(user_id, {})
@@ -184,93 +610,20 @@ async def handle_download(update_or_query, context: ContextTypes.DEFAULT_TYPE, u
         user_tasks = active_downloads.setdefault(user_id, {})
         user_tasks[task_id] = {'task': asyncio.current_task()}
 
-    cancel_keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(texts['cancel_button'], callback_data=f"cancel_{user_id}_{task_id}")]])
-
-    async def update_status_message_async(text_to_update: str, show_cancel_button: bool = True) -> None:
-        nonlocal status_message
-        if status_message:
-            try:
-                keyboard = cancel_keyboard if show_cancel_button else None
-                await status_message.edit_text(text_to_update, reply_markup=keyboard)
-            except Exception as exc:
-                logger.debug("Could not edit status message: %s", exc)
-
-    def progress_hook(data: Dict) -> None:
-        if data.get('status') == 'downloading':
-            percent = data.get('_percent_str', 'N/A').strip()
-            speed = data.get('_speed_str', 'N/A').strip()
-            eta = data.get('_eta_str', 'N/A').strip()
-            progress_text = texts['download_progress'].format(percent=percent, speed=speed, eta=eta)
-            asyncio.run_coroutine_threadsafe(update_status_message_async(progress_text), loop)
+    cancel_keyboard = _cancel_keyboard(texts, user_id, task_id)
 
     try:
         status_message = await context.bot.send_message(chat_id=chat_id, text=texts['downloading_audio'], reply_markup=cancel_keyboard)
         active_downloads.setdefault(user_id, {})[task_id]['status_message_id'] = status_message.message_id
-        await asyncio.sleep(10)
-        temp_dir = tempfile.mkdtemp()
-        active_downloads.setdefault(user_id, {})[task_id]['temp_dir'] = temp_dir
-
-        ffmpeg = ffmpeg_path if FFMPEG_IS_AVAILABLE else None
-        download_result: DownloadResult = await download_audio(url, temp_dir, cookies_path, ffmpeg, progress_hook)
-
-        total_files = len(download_result.files)
-        for index, (file_path, title) in enumerate(download_result.files, start=1):
-            await update_status_message_async(texts['sending_file'].format(index=index, total=total_files))
-            file_size = os.path.getsize(file_path)
-            if file_size > TELEGRAM_FILE_SIZE_LIMIT_BYTES:
-                await context.bot.send_message(chat_id=chat_id, text=f"{texts['too_big']} ({os.path.basename(file_path)})")
-                continue
-
-            try:
-                with open(file_path, 'rb') as fp:
-                    await context.bot.send_audio(
-                        chat_id=chat_id,
-                        audio=fp,
-                        title=title,
-                        performer=download_result.artist,
-                        filename=os.path.basename(file_path),
-                    )
-                await context.bot.send_message(chat_id=chat_id, text=texts.get('copyright_post'))
-                logger.info("Successfully sent audio for %s to user %s", url, user_id)
-            except Exception as exc:
-                logger.error("Error sending audio file %s to user %s: %s", os.path.basename(file_path), user_id, exc)
-                await context.bot.send_message(chat_id=chat_id, text=f"{texts['error']} (Error sending file {os.path.basename(file_path)})")
-
-        await update_status_message_async(texts['done_audio'], show_cancel_button=False)
-
-    except FileNotFoundError:
-        await update_status_message_async(texts['error'] + ' (audio file not found)', show_cancel_button=False)
+        await process_download(context.bot, chat_id, user_id, url, texts, status_message.message_id, cancel_keyboard)
     except asyncio.CancelledError:
         logger.info("Download cancelled for user %s.", user_id)
-        if status_message:
-            await update_status_message_async(texts['cancelled'], show_cancel_button=False)
-        else:
-            await context.bot.send_message(chat_id=chat_id, text=texts['cancelled'])
+        await context.bot.send_message(chat_id=chat_id, text=texts['cancelled'])
     except Exception as exc:
-        if 'Unsupported URL' in str(exc) or 'unsupported url' in str(exc).lower():
-            lang = get_user_lang(user_id)
-            lang_texts = LANGUAGES.get(lang, LANGUAGES['ru'])
-            unsupported = lang_texts.get('unsupported_url_in_search', 'The link is not supported. Please check the link or try another query.')
-            if status_message:
-                await update_status_message_async(unsupported, show_cancel_button=False)
-            else:
-                await context.bot.send_message(chat_id=chat_id, text=unsupported)
-            return
+        errors.inc(stage='handler', type=type(exc).__name__)
         logger.critical("Unhandled error in handle_download for user %s: %s", user_id, exc, exc_info=True)
-        if status_message:
-            await update_status_message_async(texts['error'] + str(exc), show_cancel_button=False)
-        else:
-            await context.bot.send_message(chat_id=chat_id, text=texts['error'] + str(exc))
+        await context.bot.send_message(chat_id=chat_id, text=texts['error'] + str(exc))
     finally:
-        try:
-            task_info = context.bot_data.get('active_downloads', {}).get(user_id, {}).get(task_id, {})
-            temp_path = task_info.get('temp_dir') or temp_dir
-            if temp_path and os.path.exists(temp_path):
-                shutil.rmtree(temp_path, ignore_errors=True)
-                logger.info("Cleaned up temporary directory %s for user %s (task %s).", temp_path, user_id, task_id)
-        except Exception as exc:
-            logger.debug("Error cleaning temp dir for user %s task %s: %s", user_id, task_id, exc)
-
         try:
             if user_id in context.bot_data.get('active_downloads', {}):
                 tasks = context.bot_data['active_downloads'][user_id]
@@ -284,23 +637,75 @@ async def handle_download(update_or_query, context: ContextTypes.DEFAULT_TYPE, u
             logger.debug("Error removing active download entry for user %s task %s: %s", user_id, task_id, exc)
 
 
+async def user_download_limit_reached(context: ContextTypes.DEFAULT_TYPE, user_id: int) -> bool:
+    """Whether user_id already has MAX_CONCURRENT_DOWNLOADS_PER_USER downloads running or queued.
+
+    Checked before the download rate limit, so a refused request does not use up a token.
+    """
+    if DOWNLOAD_BACKEND == 'queue':
+        active = await asyncio.to_thread(job_queue.active_count, user_id)
+    else:
+        active = len(context.bot_data.setdefault('active_downloads', {}).get(user_id, {}))
+    return active >= MAX_CONCURRENT_DOWNLOADS_PER_USER
+
+
+async def enqueue_download(update_or_query, context: ContextTypes.DEFAULT_TYPE, url: str, texts: Mapping[str, str], user_id: int) -> None:
+    """Hand a download to the worker processes (DOWNLOAD_BACKEND=queue)."""
+    if not update_or_query.message:
+        await context.bot.send_message(chat_id=user_id, text=texts['error'] + ' (internal error: chat not found)')
+        return
+    chat_id = update_or_query.message.chat_id
+    job_id = uuid.uuid4().hex
+    status_message = await context.bot.send_message(
+        chat_id=chat_id,
+        text=texts['downloading_audio'],
+        reply_markup=_cancel_keyboard(texts, user_id, job_id),
+    )
+    payload = {
+        'url': url,
+        'chat_id': chat_id,
+        'lang': get_user_lang(user_id),
+        'status_message_id': status_message.message_id,
+    }
+    try:
+        await asyncio.to_thread(job_queue.enqueue, user_id, payload, job_id)
+    except Exception as exc:
+        logger.error("Could not enqueue download for user %s: %s", user_id, exc)
+        await status_message.edit_text(texts['error'] + ' (queue unavailable)')
+        return
+    logger.info("Queued download job %s for user %s: %s", job_id, user_id, url)
+
+
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES[lang]
+    texts = get_user_texts(user_id)
     logger.info("User %s issued /search command.", user_id)
     await update.message.reply_text(texts['search_prompt'])
     context.user_data[f'awaiting_search_query_{user_id}'] = True
 
 
+async def search_or_reply_busy(message, texts: Dict[str, str], query: str):
+    """Run search_youtube, telling the user to retry and returning None when the search executor is full."""
+    results = await search_youtube(query)
+    if results == 'busy':
+        await message.reply_text(texts['search_busy'])
+        return None
+    return results
+
+
 async def handle_search_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES[lang]
+    texts = get_user_texts(user_id)
     query_text = update.message.text.strip()
     logger.info("User %s sent search query: %s", user_id, query_text)
 
-    results = await search_youtube(query_text)
+    limited = rate_limit_reply(user_id, 'search')
+    if limited:
+        await update.message.reply_text(limited)
+        return
+    results = await search_or_reply_busy(update.message, texts, query_text)
+    if results is None:
+        return
     if results == 'unsupported_url':
         await update.message.reply_text(texts['unsupported_url_in_search'])
         return
@@ -344,13 +749,11 @@ async def search_select_callback(update: Update, context: ContextTypes.DEFAULT_T
 
     if user_id != sel_user_id:
         logger.warning("User %s tried to use another user's search callback: %s", user_id, sel_user_id)
-        lang = get_user_lang(user_id)
-        texts = LANGUAGES.get(lang, LANGUAGES['ru'])
+        texts = get_user_texts(user_id)
         await query.edit_message_text(texts.get('already_cancelled_or_done', 'This button is not for you.'))
         return
 
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES[lang]
+    texts = get_user_texts(user_id)
 
     stored = context.user_data.get(f'search_results_{sel_user_id}')
     if not stored or not isinstance(stored, (list, tuple)):
@@ -371,14 +774,20 @@ async def search_select_callback(update: Update, context: ContextTypes.DEFAULT_T
     else:
         url = ''
 
+    if await user_download_limit_reached(context, user_id):
+        await query.edit_message_text(texts.get('download_in_progress') + f" (max {MAX_CONCURRENT_DOWNLOADS_PER_USER})", reply_markup=None)
+        return
+    limited = rate_limit_reply(user_id, 'download')
+    if limited:
+        await query.edit_message_text(limited, reply_markup=None)
+        return
     await query.edit_message_text(texts['downloading_selected_track'], reply_markup=None)
 
-    active_downloads = context.bot_data.setdefault('active_downloads', {})
-    user_tasks = active_downloads.setdefault(user_id, {})
-    if len(user_tasks) >= MAX_CONCURRENT_DOWNLOADS_PER_USER:
-        await query.edit_message_text(texts.get('download_in_progress') + f" (max {MAX_CONCURRENT_DOWNLOADS_PER_USER})")
+    if DOWNLOAD_BACKEND == 'queue':
+        await enqueue_download(query, context, url, texts, user_id)
         return
 
+    user_tasks = context.bot_data.setdefault('active_downloads', {}).setdefault(user_id, {})
     task_id = uuid.uuid4().hex
     task = asyncio.create_task(handle_download(query, context, url, texts, user_id))
     user_tasks[task_id] = {'task': task}
@@ -386,8 +795,7 @@ async def search_select_callback(update: Update, context: ContextTypes.DEFAULT_T
 
 async def smart_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES[lang]
+    texts = get_user_texts(user_id)
     text = update.message.text.strip()
     logger.info("User %s sent message: %s", user_id, text)
 
@@ -403,11 +811,18 @@ async def smart_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
         return
 
     if is_url(text):
-        await update.message.reply_text(texts['checking'])
-        user_tasks = active_downloads.setdefault(user_id, {})
-        if len(user_tasks) >= MAX_CONCURRENT_DOWNLOADS_PER_USER:
+        if await user_download_limit_reached(context, user_id):
             await update.message.reply_text(texts.get('download_in_progress') + f" (max {MAX_CONCURRENT_DOWNLOADS_PER_USER})")
             return
+        limited = rate_limit_reply(user_id, 'download')
+        if limited:
+            await update.message.reply_text(limited)
+            return
+        await update.message.reply_text(texts['checking'])
+        if DOWNLOAD_BACKEND == 'queue':
+            await enqueue_download(update, context, text, texts, user_id)
+            return
+        user_tasks = active_downloads.setdefault(user_id, {})
         task_id = uuid.uuid4().hex
         task = asyncio.create_task(handle_download(update, context, text, texts, user_id))
         user_tasks[task_id] = {'task': task}
@@ -418,8 +833,14 @@ async def smart_message_handler(update: Update, context: ContextTypes.DEFAULT_TY
         return
 
     logger.info("User %s auto-search for: %s", user_id, text)
+    limited = rate_limit_reply(user_id, 'search')
+    if limited:
+        await update.message.reply_text(limited)
+        return
     await update.message.reply_text(texts['searching'])
-    results = await search_youtube(text)
+    results = await search_or_reply_busy(update.message, texts, text)
+    if results is None:
+        return
     if results == 'unsupported_url' or not results:
         await update.message.reply_text(texts['no_results'])
         return
@@ -448,8 +869,7 @@ async def cancel_download_callback(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     user_id = query.from_user.id
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES[lang]
+    texts = get_user_texts(user_id)
     logger.info("User %s requested download cancellation.", user_id)
 
     active_downloads = context.bot_data.setdefault('active_downloads', {})
@@ -471,6 +891,21 @@ async def cancel_download_callback(update: Update, context: ContextTypes.DEFAULT
             pass
         return
 
+    if DOWNLOAD_BACKEND == 'queue':
+        previous = await asyncio.to_thread(job_queue.cancel, task_id, user_id)
+        try:
+            if previous is None:
+                await query.edit_message_text(texts['already_cancelled_or_done'])
+            elif previous == QUEUED:
+                # No worker has it yet, so nobody else will report the cancellation.
+                await query.edit_message_text(texts['cancelled'])
+            else:
+                await query.edit_message_text(texts['cancelling'])
+        except Exception as exc:
+            logger.debug("Could not edit message after cancelling job %s: %s", task_id, exc)
+        logger.info("Download job %s cancelled for user %s.", task_id, user_id)
+        return
+
     user_tasks = active_downloads.get(user_id, {})
     task_info = user_tasks.get(task_id)
     if not task_info or not task_info.get('task') or task_info['task'].done():
@@ -490,8 +925,7 @@ async def cancel_download_callback(update: Update, context: ContextTypes.DEFAULT
 
 async def copyright_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES[lang]
+    texts = get_user_texts(user_id)
     logger.info("User %s issued /copyright command.", user_id)
     await update.message.reply_text(texts['copyright_command'])
 
@@ -501,6 +935,7 @@ def register(application: Application) -> None:
     application.add_handler(CommandHandler('copyright', copyright_command))
     application.add_handler(CallbackQueryHandler(search_select_callback, pattern='^searchsel_'))
     application.add_handler(CallbackQueryHandler(cancel_download_callback, pattern='^cancel_'))
+    application.add_handler(ChatMemberHandler(chat_member_update, ChatMemberHandler.CHAT_MEMBER))
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^({'|'.join(LANG_CODES.keys())})$"),
         smart_message_handler,
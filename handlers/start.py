@@ -1,75 +1,118 @@
 """Handlers related to /start and language selection."""
 from __future__ import annotations
 
-import json
-import time
+import math
 import os
-from typing import Dict
+from typing import Dict, Mapping, Optional
 
-from telegram import InlineKeyboardMarkup, Update
+from telegram import Update
 from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
 
-from config import LANG_CODES, LANG_INLINE_BUTTONS, LANGUAGES, USER_LANGS_FILE, EXTRA_LINKS
+from config import (
+    EXTRA_LINKS,
+    FILE_ID_CACHE_PATH,
+    LANG_CODES,
+    LANG_INLINE_BUTTONS,
+    LANGUAGES,
+    RATE_LIMIT_DOWNLOAD,
+    RATE_LIMIT_MAX_USERS,
+    RATE_LIMIT_SEARCH,
+    RATE_LIMIT_START,
+    RATE_LIMIT_STATE_PATH,
+    USER_LANGS_FILE,
+    USER_PREFS_DB,
+    USER_PREFS_FLUSH_INTERVAL,
+)
+from utils.file_id_cache import FileIdCache
+from utils.localization import Localization
 from utils.logger import get_logger
+from utils.media_assets import MediaAssetRegistry
+from utils.rate_limiter import RateLimiter, RatePolicy
+from utils.user_store import SQLiteUserStore, UserPreferenceStore
 
 logger = get_logger(__name__)
 
+# Read-through cache of the preference store; '' marks users without a saved choice.
 user_langs: Dict[int, str] = {}
-# Track /start usage per user for simple rate-limiting
-start_usage: Dict[int, Dict[str, float]] = {}
+user_store: Optional[UserPreferenceStore] = None
+localization = Localization(LANGUAGES, EXTRA_LINKS, LANG_INLINE_BUTTONS)
+media_assets = MediaAssetRegistry(FileIdCache(FILE_ID_CACHE_PATH))
+START_ANIMATION = 'start_animation'
+# The project's GIF (updated filename first); the first existing path is used.
+START_ANIMATION_CANDIDATES = (
+    os.path.join(os.getcwd(), "musicjacker (2).gif"),
+    os.path.join(os.getcwd(), "musicjacker.gif"),
+    os.path.join(os.path.dirname(__file__), "..", "musicjacker (2).gif"),
+    os.path.join(os.path.dirname(__file__), "..", "musicjacker.gif"),
+)
+rate_limiter = RateLimiter(
+    {
+        'start': RatePolicy.parse('start', RATE_LIMIT_START),
+        'search': RatePolicy.parse('search', RATE_LIMIT_SEARCH),
+        'download': RatePolicy.parse('download', RATE_LIMIT_DOWNLOAD),
+    },
+    max_entries=RATE_LIMIT_MAX_USERS,
+    path=RATE_LIMIT_STATE_PATH or None,
+)
 
 
 def load_user_langs() -> None:
-    """Load saved user languages from disk if available."""
-    global user_langs
-    try:
-        with open(USER_LANGS_FILE, 'r', encoding='utf-8') as fh:
-            loaded = json.load(fh)
-            user_langs = {int(k): v for k, v in loaded.items()}
-    except FileNotFoundError:
-        user_langs = {}
-    except json.JSONDecodeError:
-        logger.warning("Failed to decode %s. Starting with empty language map.", USER_LANGS_FILE)
-        user_langs = {}
+    """Open the preference store, migrating the legacy JSON file on first run."""
+    global user_store
+    if user_store is not None:
+        return
+    store = SQLiteUserStore(USER_PREFS_DB, flush_interval=USER_PREFS_FLUSH_INTERVAL)
+    store.migrate_from_json(USER_LANGS_FILE)
+    user_store = store
 
 
-def save_user_langs() -> None:
-    """Persist user language preferences to disk."""
-    with open(USER_LANGS_FILE, 'w', encoding='utf-8') as fh:
-        json.dump(user_langs, fh)
+def save_user_lang(user_id: int, lang_code: str) -> None:
+    """Persist one user's language; the write is batched off the event loop."""
+    user_langs[user_id] = lang_code
+    if user_store is not None:
+        user_store.set(user_id, lang_code)
+
+
+def close_user_langs() -> None:
+    """Flush pending preference writes and close the store."""
+    global user_store
+    if user_store is not None:
+        user_store.close()
+        user_store = None
 
 
 def get_user_lang(user_id: int) -> str:
     """Return stored language for user or fallback to Russian."""
     lang = user_langs.get(user_id)
+    if lang is None and user_store is not None:
+        lang = user_store.get(user_id) or ''
+        user_langs[user_id] = lang
     if lang in LANGUAGES:
         return lang
     return 'ru'
 
 
-def _build_inline_keyboard() -> InlineKeyboardMarkup:
-    rows = []
-    row = []
-    for button in LANG_INLINE_BUTTONS:
-        row.append(button)
-        if len(row) == 2:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
-    return InlineKeyboardMarkup(rows)
+def get_user_texts(user_id: int) -> Mapping[str, str]:
+    """Return the shared, read-only message table for the user's language."""
+    return localization.texts(get_user_lang(user_id))
+
+
+def rate_limit_reply(user_id: int, policy: str) -> Optional[str]:
+    """Count one request of policy for user_id; return the message to send if it is over the limit."""
+    retry_after = rate_limiter.check(policy, user_id)
+    if not retry_after:
+        return None
+    logger.info("User %s hit the %s rate limit, retry in %.1fs.", user_id, policy, retry_after)
+    texts = get_user_texts(user_id)
+    text = texts['start_rate_limited'] if policy == 'start' else texts['rate_limited']
+    return text.format(seconds=math.ceil(retry_after))
 
 
 async def choose_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send inline buttons to let user pick a language."""
     logger.info("User %s requested language choice.", update.effective_user.id)
-    user_id = update.effective_user.id
-    lang = get_user_lang(user_id)
-    texts = LANGUAGES.get(lang, LANGUAGES['ru'])
-    await update.message.reply_text(
-        texts.get('choose_lang', LANGUAGES['ru']['choose_lang']),
-        reply_markup=_build_inline_keyboard(),
-    )
+    bundle = localization.bundle(get_user_lang(update.effective_user.id))
+    await update.message.reply_text(bundle.texts['choose_lang'], reply_markup=bundle.language_keyboard)
 
 
 async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -78,17 +121,13 @@ async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     lang_code = LANG_CODES.get(lang_name)
     user_id = update.effective_user.id
     if lang_code:
-        user_langs[user_id] = lang_code
-        save_user_langs()
+        save_user_lang(user_id, lang_code)
         logger.info("User %s set language to %s.", user_id, lang_code)
-        base = LANGUAGES[lang_code]['start']
-        extra = EXTRA_LINKS.get(lang_code, EXTRA_LINKS.get('en', ''))
-        await update.message.reply_text(f"{base}\n\n{extra}")
+        await update.message.reply_text(localization.bundle(lang_code).start_caption)
         return
 
     logger.warning("User %s sent invalid language selection: %s.", user_id, lang_name)
-    current_lang = get_user_lang(user_id)
-    texts = LANGUAGES.get(current_lang, LANGUAGES['ru'])
+    texts = get_user_texts(user_id)
     await update.message.reply_text(texts.get('choose_lang', 'Please choose a language from the keyboard.'))
 
 
@@ -103,26 +142,21 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         lang_code = query.data.split('_', 1)[1]
 
     if not lang_code or lang_code not in LANGUAGES:
-        current_lang = get_user_lang(user_id)
-        texts = LANGUAGES.get(current_lang, LANGUAGES['ru'])
+        texts = get_user_texts(user_id)
         try:
             await query.edit_message_text(texts.get('choose_lang', 'Please choose a language.'))
         except Exception:
             pass
         return
 
-    user_langs[user_id] = lang_code
-    save_user_langs()
+    save_user_lang(user_id, lang_code)
     logger.info("User %s set language (inline) to %s.", user_id, lang_code)
+    caption = localization.bundle(lang_code).start_caption
     try:
-        base = LANGUAGES[lang_code]['start']
-        extra = EXTRA_LINKS.get(lang_code, EXTRA_LINKS.get('en', ''))
-        await query.edit_message_text(f"{base}\n\n{extra}")
+        await query.edit_message_text(caption)
     except Exception:
         try:
-            base = LANGUAGES[lang_code]['start']
-            extra = EXTRA_LINKS.get(lang_code, EXTRA_LINKS.get('en', ''))
-            await context.bot.send_message(chat_id=user_id, text=f"{base}\n\n{extra}")
+            await context.bot.send_message(chat_id=user_id, text=caption)
         except Exception:
             pass
 
@@ -131,61 +165,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Entry point for /start command."""
     user_id = update.effective_user.id
     logger.info("User %s issued /start command.", user_id)
-    now = time.time()
-
-    info = start_usage.get(user_id, {"count": 0, "blocked_until": 0.0})
-
-    # Reset after block expiration
-    if info.get("blocked_until", 0) and info["blocked_until"] <= now:
-        info = {"count": 0, "blocked_until": 0.0}
-
-    # If currently blocked
-    if info.get("blocked_until", 0) > now:
-        wait = int(info["blocked_until"] - now)
-        lang = get_user_lang(user_id)
-        texts = LANGUAGES.get(lang, LANGUAGES["ru"])
-        msg = texts.get("start_rate_limited", "You used /start more than 3 times. Please wait {seconds} seconds.")
-        await update.message.reply_text(msg.format(seconds=wait))
-        start_usage[user_id] = info
-        return
-
-    # Increment count and possibly block
-    info["count"] = info.get("count", 0) + 1
-    if info["count"] > 3:
-        info["blocked_until"] = now + 15
-        start_usage[user_id] = info
-        lang = get_user_lang(user_id)
-        texts = LANGUAGES.get(lang, LANGUAGES["ru"])
-        msg = texts.get("start_rate_limited", "You used /start more than 3 times. Please wait {seconds} seconds.")
-        await update.message.reply_text(msg.format(seconds=15))
+    limited = rate_limit_reply(user_id, 'start')
+    if limited:
+        await update.message.reply_text(limited)
         return
 
-    start_usage[user_id] = info
-
-    # Try to send the GIF with the start caption (if file exists)
-    lang = get_user_lang(user_id)
-    base = LANGUAGES.get(lang, LANGUAGES["ru"]).get("start", "")
-    extra = EXTRA_LINKS.get(lang, EXTRA_LINKS.get("en", ""))
-    caption = f"{base}\n\n{extra}"
-
-    # look for the project's GIF (updated filename); fallback to common names
-    gif_path_candidates = [
-        os.path.join(os.getcwd(), "musicjacker (2).gif"),
-        os.path.join(os.getcwd(), "musicjacker.gif"),
-        os.path.join(os.path.dirname(__file__), "..", "musicjacker (2).gif"),
-        os.path.join(os.path.dirname(__file__), "..", "musicjacker.gif"),
-    ]
+    # Try to send the GIF with the start caption (uploaded once, then sent by file_id)
+    caption = localization.bundle(get_user_lang(user_id)).start_caption
     sent_gif = False
-    for path in gif_path_candidates:
-        try:
-            abs_path = os.path.abspath(path)
-            if os.path.exists(abs_path):
-                with open(abs_path, "rb") as fh:
-                    await update.message.reply_animation(animation=fh, caption=caption)
-                sent_gif = True
-                break
-        except Exception:
-            continue
+    try:
+        sent_gif = await media_assets.send(context.bot, update.effective_chat.id, START_ANIMATION, caption=caption) is not None
+    except Exception as exc:
+        logger.warning("Could not send the /start animation: %s", exc)
 
     # If GIF wasn't sent, fallback to sending text start
     if not sent_gif:
@@ -201,6 +192,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 def register(application: Application) -> None:
     """Register start and language handlers with the application."""
     load_user_langs()
+    rate_limiter.load()
+    media_assets.register(START_ANIMATION, 'animation', START_ANIMATION_CANDIDATES)
     application.add_handler(CommandHandler('start', start))
     application.add_handler(CommandHandler('language', choose_language))
     application.add_handler(CommandHandler('languages', choose_language))
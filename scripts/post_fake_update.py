@@ -0,0 +1,70 @@
+"""Post a synthetic Telegram Update to a locally running webhook server.
+
+Start the bot with BOT_MODE=webhook, then for example:
+
+    python scripts/post_fake_update.py --text /start --user-id 12345
+    python scripts/post_fake_update.py --url http://127.0.0.1:8443/telegram --secret "$WEBHOOK_SECRET_TOKEN" --text "never gonna give you up"
+
+Replies go to the given chat through the real Bot API, so use a chat id that
+has talked to the bot if you want to see them.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict
+
+import httpx
+
+
+def build_message_update(text: str, user_id: int, chat_id: int, language_code: str) -> Dict:
+    update_id = random.randint(1, 2**31 - 1)
+    message: Dict = {
+        'message_id': random.randint(1, 2**31 - 1),
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Test'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Test', 'language_code': language_code},
+        'text': text,
+    }
+    if text.startswith('/'):
+        command_length = len(text.split()[0])
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': command_length}]
+    return {'update_id': update_id, 'message': message}
+
+
+def main() -> int:
+    default_url = 'http://127.0.0.1:{port}/{path}'.format(
+        port=os.getenv('WEBHOOK_PORT', '8443'),
+        path=os.getenv('WEBHOOK_PATH', 'telegram'),
+    )
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=default_url, help='webhook endpoint (default: %(default)s)')
+    parser.add_argument('--secret', default=os.getenv('WEBHOOK_SECRET_TOKEN', ''), help='value for X-Telegram-Bot-Api-Secret-Token')
+    parser.add_argument('--text', default='/start', help='message text to send')
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--chat-id', type=int, default=None, help='defaults to --user-id (private chat)')
+    parser.add_argument('--language', default='en', help='language_code of the fake user')
+    parser.add_argument('--count', type=int, default=1, help='number of updates to post')
+    args = parser.parse_args()
+
+    headers = {'Content-Type': 'application/json'}
+    if args.secret:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = args.secret
+
+    failures = 0
+    with httpx.Client(timeout=10.0) as client:
+        for _ in range(max(1, args.count)):
+            update = build_message_update(args.text, args.user_id, args.chat_id or args.user_id, args.language)
+            response = client.post(args.url, content=json.dumps(update), headers=headers)
+            print(f"update {update['update_id']}: HTTP {response.status_code}")
+            if response.status_code != 200:
+                failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
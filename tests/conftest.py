@@ -0,0 +1,34 @@
+"""Helpers shared by the test modules."""
+import asyncio
+import os
+
+# config refuses to import without a token; handler modules import config.
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:test')
+
+
+async def settle() -> None:
+    """Let every task that is ready run until it blocks again."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class FakeClock:
+    """Monotonic and wall clocks advancing together, with unrelated origins like the real ones.
+
+    Patched over a module's ``time`` import, e.g.
+    ``monkeypatch.setattr(file_id_cache, 'time', clock)``.
+    """
+
+    def __init__(self, monotonic: float = 500.0, wall: float = 1_700_000_000.0) -> None:
+        self._monotonic = monotonic
+        self._wall = wall
+
+    def monotonic(self) -> float:
+        return self._monotonic
+
+    def time(self) -> float:
+        return self._wall
+
+    def advance(self, seconds: float) -> None:
+        self._monotonic += seconds
+        self._wall += seconds
@@ -0,0 +1,40 @@
+import io
+import random
+
+from PIL import Image
+
+from utils.yt_downloader import COVER_MAX_DIMENSION, compress_image, pull_thumbnail
+
+
+def noisy_png(width: int, height: int, alpha: bool = False) -> bytes:
+    rng = random.Random(0)
+    mode = 'RGBA' if alpha else 'RGB'
+    image = Image.frombytes(mode, (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * len(mode))))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_large_image_is_downscaled_and_fits_the_budget():
+    data = compress_image(noisy_png(1200, 900), max_size=60_000)
+    assert len(data) <= 60_000
+    result = Image.open(io.BytesIO(data))
+    assert result.format == 'JPEG'
+    assert max(result.size) <= COVER_MAX_DIMENSION
+
+
+def test_transparent_image_is_flattened_to_rgb():
+    result = Image.open(io.BytesIO(compress_image(noisy_png(64, 64, alpha=True))))
+    assert result.mode == 'RGB'
+
+
+def test_pull_thumbnail_prefers_the_smallest_large_enough():
+    thumbs = [
+        {'url': 'small', 'width': 120},
+        {'url': 'huge', 'width': 1920},
+        {'url': 'right', 'width': 1280},
+    ]
+    assert pull_thumbnail({'thumbnails': thumbs}, min_width=800) == 'right'
+    assert pull_thumbnail({'thumbnails': thumbs[:1]}, min_width=800) == 'small'
+    assert pull_thumbnail({'thumbnail': 'plain', 'thumbnails': [{'url': 'unsized'}]}) == 'plain'
+    assert pull_thumbnail({}) is None
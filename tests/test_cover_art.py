@@ -0,0 +1,121 @@
+import asyncio
+import os
+
+import pytest
+
+from tests.conftest import settle
+from utils import cover_art
+from utils.cover_art import CoverArtPipeline
+
+
+class Response:
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class Client:
+    """Stands in for the pooled httpx client; every GET waits for the gate."""
+
+    def __init__(self) -> None:
+        self.requests = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def get(self, url):
+        self.requests.append(url)
+        await self.gate.wait()
+        return Response(url.encode())
+
+    async def aclose(self) -> None:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(cover_art, 'compress_image', lambda data, max_size: b'jpeg:' + data)
+
+
+def make_pipeline(cache_dir=None) -> CoverArtPipeline:
+    pipeline = CoverArtPipeline(cache_dir, memory_bytes=1024, workers=2)
+    pipeline._client = Client()
+    return pipeline
+
+
+def info(url='https://i.ytimg.com/vi/abc/hq.jpg'):
+    return {'thumbnail': url}
+
+
+def test_cover_is_fetched_once_then_served_from_memory():
+    async def scenario():
+        pipeline = make_pipeline()
+        assert await pipeline.get(info()) == b'jpeg:https://i.ytimg.com/vi/abc/hq.jpg'
+        assert await pipeline.get(info()) == b'jpeg:https://i.ytimg.com/vi/abc/hq.jpg'
+        assert len(pipeline._client.requests) == 1
+        assert (pipeline.stats()['misses'], pipeline.stats()['memory_hits']) == (1, 1)
+        await pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_one_fetch():
+    async def scenario():
+        pipeline = make_pipeline()
+        pipeline._client.gate.clear()
+        waiters = [asyncio.create_task(pipeline.get(info())) for _ in range(4)]
+        await settle()
+        pipeline._client.gate.set()
+        assert len(set(await asyncio.gather(*waiters))) == 1
+        assert len(pipeline._client.requests) == 1
+        await pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_disk_cache_is_created_lazily_and_survives_a_restart(tmp_path):
+    cache_dir = str(tmp_path / 'covers')
+
+    async def scenario():
+        first = make_pipeline(cache_dir)
+        assert not os.path.exists(cache_dir)
+        await first.get(info())
+        await first.close()
+        assert len(os.listdir(cache_dir)) == 1
+
+        second = make_pipeline(cache_dir)
+        assert await second.get(info()) == b'jpeg:https://i.ytimg.com/vi/abc/hq.jpg'
+        assert second._client.requests == []
+        assert second.stats()['disk_hits'] == 1
+        await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_memory_cache_is_bounded_by_bytes():
+    async def scenario():
+        pipeline = make_pipeline()
+        pipeline.memory_bytes = 100
+        for n in range(5):
+            await pipeline.get(info(f'https://example.com/{n}-{"x" * 20}.jpg'))
+        assert pipeline.stats()['memory_bytes'] <= 100
+        assert pipeline.stats()['memory_entries'] < 5
+        await pipeline.close()
+
+    asyncio.run(scenario())
+
+
+def test_missing_thumbnail_or_failed_encode_gives_none(monkeypatch):
+    def broken(data, max_size):
+        raise OSError('not an image')
+
+    async def scenario():
+        pipeline = make_pipeline()
+        assert await pipeline.get({}) is None
+        monkeypatch.setattr(cover_art, 'compress_image', broken)
+        assert await pipeline.get(info()) is None
+        assert pipeline.stats()['failures'] == 1
+        await pipeline.close()
+
+    asyncio.run(scenario())
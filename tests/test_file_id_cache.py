@@ -0,0 +1,133 @@
+import asyncio
+import sqlite3
+
+import pytest
+from telegram.error import BadRequest
+
+from handlers import downloader
+from tests.conftest import FakeClock
+from utils import file_id_cache
+from utils.file_id_cache import FileIdCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(file_id_cache, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = FileIdCache(str(tmp_path / 'file_ids.sqlite3'))
+    yield c
+    c.close()
+
+
+def test_put_then_get_per_profile(cache):
+    assert cache.get('youtube:abc', 'mp3_192') is None
+    cache.put('youtube:abc', 'mp3_192', 'file-1', title='Song', performer='Band', file_unique_id='u1')
+
+    cached = cache.get('youtube:abc', 'mp3_192')
+    assert (cached.file_id, cached.title, cached.performer) == ('file-1', 'Song', 'Band')
+    assert cache.get('youtube:abc', 'opus') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['stores'] == 1
+
+
+def test_peek_leaves_the_counters_alone(cache):
+    cache.put('youtube:abc', 'mp3_192', 'file-1')
+    assert cache.peek('youtube:abc', 'mp3_192').file_id == 'file-1'
+    assert cache.peek('youtube:other', 'mp3_192') is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (0, 0)
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / 'file_ids.sqlite3')
+    first = FileIdCache(path)
+    first.put('youtube:abc', 'mp3_192', 'file-1')
+    first.close()
+    reopened = FileIdCache(path)
+    assert reopened.get('youtube:abc', 'mp3_192').file_id == 'file-1'
+    reopened.close()
+
+
+def test_put_replaces_and_invalidate_drops(cache):
+    cache.put('youtube:abc', 'mp3_192', 'file-1')
+    cache.put('youtube:abc', 'mp3_192', 'file-2')
+    assert cache.get('youtube:abc', 'mp3_192').file_id == 'file-2'
+
+    cache.invalidate('youtube:abc', 'mp3_192')
+    assert cache.get('youtube:abc', 'mp3_192') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    cache = FileIdCache(str(tmp_path / 'file_ids.sqlite3'), max_entries=50)
+    for n in range(99):
+        cache.put(f'track-{n}', 'mp3', f'file-{n}')
+        clock.advance(1)
+    # A lookup refreshes the oldest entry, so it outlives newer ones.
+    assert cache.get('track-0', 'mp3') is not None
+    clock.advance(1)
+    cache.put('track-99', 'mp3', 'file-99')  # the 100th store runs the eviction
+
+    assert cache.stats()['evictions'] == 50
+    assert cache.get('track-0', 'mp3') is not None
+    assert cache.get('track-1', 'mp3') is None
+    assert cache.get('track-50', 'mp3') is None
+    assert cache.get('track-51', 'mp3') is not None
+    cache.close()
+
+
+class FakeBot:
+    def __init__(self, error=None) -> None:
+        self.error = error
+        self.sent = []
+
+    async def send_audio(self, chat_id, audio, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.sent.append((chat_id, audio))
+
+
+def test_send_cached_audio_uses_the_stored_file_id(monkeypatch, cache):
+    monkeypatch.setattr(downloader, 'file_id_cache', cache)
+    cache.put('youtube:abc', 'mp3_192', 'file-1')
+    bot = FakeBot()
+
+    assert asyncio.run(downloader.send_cached_audio(bot, 7, 'youtube:abc', 'mp3_192'))
+    assert bot.sent == [(7, 'file-1')]
+    assert not asyncio.run(downloader.send_cached_audio(bot, 7, 'youtube:other', 'mp3_192'))
+
+
+def test_rejected_file_id_is_invalidated(monkeypatch, cache):
+    monkeypatch.setattr(downloader, 'file_id_cache', cache)
+    cache.put('youtube:abc', 'mp3_192', 'stale-file-id')
+    bot = FakeBot(BadRequest('Wrong file identifier/http url specified'))
+
+    assert not asyncio.run(downloader.send_cached_audio(bot, 7, 'youtube:abc', 'mp3_192'))
+    assert cache.stats()['invalidations'] == 1
+    assert cache.get('youtube:abc', 'mp3_192') is None
+
+
+def test_eviction_keeps_media_assets(tmp_path):
+    path = str(tmp_path / 'file_ids.sqlite3')
+    # Like the bot: the asset registry and the downloader share one database.
+    assets = FileIdCache(path)
+    tracks = FileIdCache(path, max_entries=10)
+    assets.put('asset:start_animation', '1:1', 'anim-file-id')
+
+    for n in range(200):
+        tracks.put(f'track-{n}', 'mp3', f'file-{n}')
+
+    assert assets.get('asset:start_animation', '1:1').file_id == 'anim-file-id'
+    assert tracks.get('track-199', 'mp3') is not None
+    assert tracks.get('track-0', 'mp3') is None
+    with sqlite3.connect(path) as conn:
+        remaining = conn.execute("SELECT COUNT(*) FROM file_ids WHERE track_key NOT LIKE 'asset:%'").fetchone()[0]
+    assert remaining == 10
+    assert tracks.evictions == 190
+    assets.close()
+    tracks.close()
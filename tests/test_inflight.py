@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import settle
+from utils.inflight import InflightCoalescer
+
+
+class SharedJob:
+    """Factory for a job that runs until told how to end, counting how often it was started."""
+
+    def __init__(self) -> None:
+        self.starts = 0
+        self.cancelled = False
+        self.outcome = None
+        self.done = None
+        self.progress = None
+
+    async def __call__(self, progress):
+        self.starts += 1
+        self.progress = progress
+        self.done = asyncio.get_running_loop().create_future()
+        try:
+            return await self.done
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def wait_for_result(coalescer, key, job, results, listener=None):
+    async with coalescer.join(key, job, listener=listener) as flight:
+        results.append(flight.result)
+
+
+def test_concurrent_waiters_share_one_job_and_its_progress():
+    async def scenario():
+        released = []
+        coalescer = InflightCoalescer(on_release=released.append)
+        job = SharedJob()
+        results, seen = [], []
+        tasks = [
+            asyncio.create_task(wait_for_result(coalescer, 'k', job, results, listener=seen.append))
+            for _ in range(3)
+        ]
+        await settle()
+        job.progress({'status': 'downloading'})
+        job.done.set_result('file')
+        await asyncio.gather(*tasks)
+        return job.starts, results, len(seen), released, coalescer.stats()
+
+    starts, results, seen, released, stats = asyncio.run(scenario())
+    assert starts == 1
+    assert results == ['file', 'file', 'file']
+    assert seen == 3
+    # Released exactly once, after the last waiter is done with the result.
+    assert released == ['file']
+    assert stats == {'in_flight': 0, 'started': 1, 'coalesced': 2}
+
+
+def test_cancelled_waiter_detaches_while_others_continue():
+    async def scenario():
+        coalescer = InflightCoalescer()
+        job = SharedJob()
+        results = []
+        leaving = asyncio.create_task(wait_for_result(coalescer, 'k', job, results))
+        staying = asyncio.create_task(wait_for_result(coalescer, 'k', job, results))
+        await settle()
+
+        leaving.cancel()
+        await settle()
+        assert leaving.cancelled()
+        assert not job.cancelled
+        assert coalescer._flights['k'].waiters == 1
+
+        job.done.set_result('file')
+        await staying
+        return job.starts, results
+
+    assert asyncio.run(scenario()) == (1, ['file'])
+
+
+def test_job_is_cancelled_when_every_waiter_leaves():
+    async def scenario():
+        coalescer = InflightCoalescer()
+        job = SharedJob()
+        tasks = [asyncio.create_task(wait_for_result(coalescer, 'k', job, [])) for _ in range(3)]
+        await settle()
+        for task in tasks:
+            task.cancel()
+        await settle()
+        assert job.cancelled
+        assert len(coalescer) == 0
+
+        # The next request starts a fresh job rather than joining the cancelled one.
+        fresh = SharedJob()
+        results = []
+        task = asyncio.create_task(wait_for_result(coalescer, 'k', fresh, results))
+        await settle()
+        fresh.done.set_result('again')
+        await task
+        return fresh.starts, results
+
+    assert asyncio.run(scenario()) == (1, ['again'])
+
+
+def test_job_exception_reaches_every_waiter():
+    async def scenario():
+        released = []
+        coalescer = InflightCoalescer(on_release=released.append)
+        job = SharedJob()
+        tasks = [asyncio.create_task(wait_for_result(coalescer, 'k', job, [])) for _ in range(3)]
+        await settle()
+        job.done.set_exception(RuntimeError('extract failed'))
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        return outcomes, len(coalescer), released
+
+    outcomes, in_flight, released = asyncio.run(scenario())
+    assert [type(outcome) for outcome in outcomes] == [RuntimeError] * 3
+    assert all(str(outcome) == 'extract failed' for outcome in outcomes)
+    # A failed job is neither reused nor handed to on_release.
+    assert in_flight == 0
+    assert released == []
+
+
+def test_failed_job_is_not_reused():
+    async def scenario():
+        coalescer = InflightCoalescer()
+        failing = SharedJob()
+        task = asyncio.create_task(wait_for_result(coalescer, 'k', failing, []))
+        await settle()
+        failing.done.set_exception(RuntimeError('boom'))
+        with pytest.raises(RuntimeError):
+            await task
+
+        retry = SharedJob()
+        results = []
+        task = asyncio.create_task(wait_for_result(coalescer, 'k', retry, results))
+        await settle()
+        retry.done.set_result('ok')
+        await task
+        return retry.starts, results
+
+    assert asyncio.run(scenario()) == (1, ['ok'])
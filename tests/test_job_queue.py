@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+
+from tests.conftest import FakeClock
+from utils import job_queue
+from utils.job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue, SQLiteJobQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(job_queue, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+@pytest.fixture
+def queue(db_path):
+    q = SQLiteJobQueue(db_path, max_attempts=2)
+    yield q
+    q.close()
+
+
+def test_claim_returns_jobs_oldest_first_and_marks_them_running(queue, clock):
+    first = queue.enqueue(1, {'url': 'a'})
+    clock.advance(1)
+    second = queue.enqueue(2, {'url': 'b'})
+
+    claimed = queue.claim('w1', 60)
+    assert claimed.id == first.id
+    assert claimed.payload == {'url': 'a'}
+    assert (claimed.status, claimed.worker_id, claimed.attempts) == (RUNNING, 'w1', 1)
+    assert queue.claim('w2', 60).id == second.id
+    assert queue.claim('w3', 60) is None
+    assert queue.stats()[RUNNING] == 2
+
+
+def test_two_claimers_racing_for_one_job_get_it_once(db_path):
+    SQLiteJobQueue(db_path).enqueue(1, {'url': 'a'})
+    queues = [SQLiteJobQueue(db_path) for _ in range(8)]
+    barrier = threading.Barrier(len(queues))
+    results = [None] * len(queues)
+
+    def claim(index: int) -> None:
+        barrier.wait()
+        results[index] = queues[index].claim(f"w{index}", 60)
+
+    threads = [threading.Thread(target=claim, args=(index,)) for index in range(len(queues))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for q in queues:
+        q.close()
+
+    assert len([job for job in results if job is not None]) == 1
+
+
+def test_heartbeat_extends_the_lease(queue, clock):
+    job = queue.enqueue(1, {})
+    queue.claim('w1', 30)
+    clock.advance(20)
+    assert queue.heartbeat(job.id, 'w1', 30, progress='50%') == RUNNING
+    clock.advance(20)
+    # Without the heartbeat the lease would have run out 10 s ago.
+    assert queue.claim('w2', 30) is None
+
+
+def test_expired_lease_is_reassigned_and_the_old_worker_told_to_stop(queue, clock):
+    job = queue.enqueue(1, {})
+    queue.claim('w1', 30)
+    clock.advance(31)
+
+    reclaimed = queue.claim('w2', 30)
+    assert reclaimed.id == job.id
+    assert (reclaimed.worker_id, reclaimed.attempts) == ('w2', 2)
+    # The first worker comes back mid-job: it must stop, and cannot finish the job.
+    assert queue.heartbeat(job.id, 'w1', 30) == CANCELLED
+    queue.complete(job.id, 'w1')
+    assert queue.stats()[RUNNING] == 1
+    queue.complete(job.id, 'w2')
+    assert queue.stats()[DONE] == 1
+
+
+def test_lease_expiry_after_the_last_attempt_fails_the_job(queue, clock):
+    queue.enqueue(1, {})
+    queue.claim('w1', 30)
+    clock.advance(31)
+    queue.claim('w2', 30)
+    clock.advance(31)
+
+    assert queue.claim('w3', 30) is None
+    assert queue.stats()[FAILED] == 1
+
+
+def test_fail_records_the_error(queue, clock, db_path):
+    job = queue.enqueue(1, {})
+    queue.claim('w1', 30)
+    queue.fail(job.id, 'w1', 'x' * 5000)
+
+    assert queue.stats()[FAILED] == 1
+    assert queue.heartbeat(job.id, 'w1', 30) == FAILED
+    row = queue._connect().execute('SELECT error FROM jobs WHERE id = ?', (job.id,)).fetchone()
+    assert len(row[0]) == 1000
+
+
+def test_cancel_queued_job_is_never_claimed(queue, clock):
+    job = queue.enqueue(1, {})
+    assert queue.cancel(job.id, user_id=2) is None
+    assert queue.cancel(job.id, user_id=1) == QUEUED
+    assert queue.cancel(job.id, user_id=1) is None
+    assert queue.claim('w1', 30) is None
+    assert queue.active_count(1) == 0
+
+
+def test_cancel_running_job_is_seen_on_heartbeat(queue, clock):
+    job = queue.enqueue(1, {})
+    queue.claim('w1', 30)
+    assert queue.active_count(1) == 1
+
+    assert queue.cancel(job.id, user_id=1) == RUNNING
+    assert queue.heartbeat(job.id, 'w1', 30) == CANCELLED
+    # Finishing afterwards does not resurrect it.
+    queue.complete(job.id, 'w1')
+    assert queue.stats()[CANCELLED] == 1
+    clock.advance(3600)
+    assert queue.claim('w2', 30) is None
+
+
+def test_job_queue_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
@@ -0,0 +1,34 @@
+import pytest
+from telegram import InlineKeyboardButton
+
+from utils.localization import Localization
+
+LANGUAGES = {
+    'ru': {'start': 'Привет', 'error': 'Ошибка'},
+    'en': {'start': 'Hello', 'error': 'Error', 'cancelled': 'Cancelled'},
+}
+BUTTONS = [InlineKeyboardButton(code, callback_data=f"lang_{code}") for code in ('ru', 'en', 'de')]
+
+
+def make_localization() -> Localization:
+    return Localization(LANGUAGES, {'en': 'links'}, BUTTONS)
+
+
+def test_missing_keys_come_from_english_and_unknown_languages_get_the_default():
+    localization = make_localization()
+
+    assert localization.texts('ru')['cancelled'] == 'Cancelled'
+    assert localization.texts('ru')['error'] == 'Ошибка'
+    assert localization.bundle('xx').code == 'ru'
+    assert localization.bundle('').code == 'ru'
+    assert localization.bundle('ru').start_caption == 'Привет\n\nlinks'
+
+
+def test_bundles_are_built_up_front_and_shared():
+    localization = make_localization()
+
+    assert localization.bundle('en') is localization.bundle('en')
+    assert localization.bundle('en').language_keyboard is localization.bundle('ru').language_keyboard
+    assert [len(row) for row in localization.bundle('en').language_keyboard.inline_keyboard] == [2, 1]
+    with pytest.raises(TypeError):
+        localization.texts('en')['error'] = 'changed'
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest
+
+from utils.file_id_cache import FileIdCache
+from utils.media_assets import MediaAssetRegistry
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.sent = []
+        self.rejected = set()
+        self.uploads = 0
+
+    async def send_animation(self, chat_id, animation, **kwargs):
+        await asyncio.sleep(0)
+        if isinstance(animation, str):
+            if animation in self.rejected:
+                raise BadRequest('Wrong file identifier')
+            self.sent.append(animation)
+            file_id = animation
+        else:
+            self.uploads += 1
+            file_id = f"uploaded-{self.uploads}"
+        return SimpleNamespace(animation=SimpleNamespace(file_id=file_id, file_unique_id=f"u-{file_id}"), document=None)
+
+
+def make_registry(tmp_path) -> MediaAssetRegistry:
+    (tmp_path / 'start.mp4').write_bytes(b'mp4')
+    registry = MediaAssetRegistry(FileIdCache(str(tmp_path / 'file_ids.sqlite3')))
+    registry.register('start', 'animation', [str(tmp_path / 'missing.mp4'), str(tmp_path / 'start.mp4')])
+    return registry
+
+
+def test_concurrent_first_sends_upload_once(tmp_path):
+    registry = make_registry(tmp_path)
+    bot = FakeBot()
+
+    async def scenario():
+        await asyncio.gather(*(registry.send(bot, chat_id, 'start') for chat_id in range(5)))
+
+    asyncio.run(scenario())
+    registry.close()
+
+    assert bot.uploads == 1
+    assert bot.sent == ['uploaded-1'] * 4
+    assert registry.stats() == {'assets': 1, 'uploads': 1, 'cached_sends': 4}
+
+
+def test_rejected_file_id_is_uploaded_again(tmp_path):
+    registry = make_registry(tmp_path)
+    bot = FakeBot()
+
+    async def scenario():
+        await registry.send(bot, 1, 'start')
+        bot.rejected.add('uploaded-1')
+        await registry.send(bot, 2, 'start')
+        await registry.send(bot, 3, 'start')
+
+    asyncio.run(scenario())
+    registry.close()
+
+    assert bot.uploads == 2
+    assert bot.sent == ['uploaded-2']
+    assert asyncio.run(registry.send(bot, 4, 'unknown')) is None
@@ -0,0 +1,89 @@
+import asyncio
+import socket
+import urllib.request
+
+import pytest
+
+from utils.metrics import CONTENT_TYPE, MetricsServer, Registry
+
+
+def test_render_counters_gauges_and_cumulative_histograms():
+    registry = Registry()
+    downloads = registry.counter('test_downloads_total', 'Downloads by outcome', ('outcome',))
+    active = registry.gauge('test_active', 'Active downloads')
+    seconds = registry.histogram('test_seconds', 'Stage time', ('stage',), buckets=(0.1, 1.0))
+
+    downloads.inc(outcome='delivered')
+    downloads.inc(2, outcome='failed')
+    active.inc()
+    active.inc()
+    active.dec()
+    seconds.observe(0.05, stage='download')
+    seconds.observe(0.5, stage='download')
+    seconds.observe(5, stage='download')
+
+    assert downloads.value(outcome='failed') == 2
+    assert active.value() == 1
+    assert seconds.count(stage='download') == 3
+    lines = registry.render().splitlines()
+    assert '# TYPE test_downloads_total counter' in lines
+    assert 'test_downloads_total{outcome="delivered"} 1' in lines
+    assert 'test_active 1' in lines
+    assert 'test_seconds_bucket{stage="download",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="download",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="download",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="download"} 5.55' in lines
+    assert 'test_seconds_count{stage="download"} 3' in lines
+
+
+def test_labels_must_match_and_names_register_once():
+    registry = Registry()
+    counter = registry.counter('test_total', 'Test', ('stage',))
+
+    with pytest.raises(ValueError):
+        counter.inc(kind='x')
+    with pytest.raises(ValueError):
+        counter.inc()
+    assert registry.counter('test_total', 'Test', ('stage',)) is counter
+    with pytest.raises(ValueError):
+        registry.gauge('test_total', 'Test', ('stage',))
+
+
+def test_collectors_copy_numeric_stats_and_survive_failures():
+    registry = Registry()
+
+    def failing():
+        raise RuntimeError('boom')
+
+    registry.add_collector(failing)
+    registry.add_collector(lambda: registry.record_stats('output_modes', {'passthrough': 3, 'transcode': 1, 'enabled': True}), blocking=True)
+    asyncio.run(registry.collect())
+
+    assert registry.component_stats.value(component='output_modes', stat='passthrough') == 3
+    assert registry.component_stats.value(component='output_modes', stat='transcode') == 1
+    assert 'stat="enabled"' not in registry.render()
+
+
+def test_server_serves_the_registry():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    registry = Registry()
+    registry.counter('test_total', 'Test').inc()
+
+    async def scenario():
+        server = MetricsServer(registry, '127.0.0.1', port, sample_interval=60)
+        await server.start()
+        try:
+            return await asyncio.to_thread(_fetch, f"http://127.0.0.1:{port}/metrics")
+        finally:
+            await server.close()
+
+    content_type, body = asyncio.run(scenario())
+    assert content_type == CONTENT_TYPE
+    assert 'test_total 1' in body.splitlines()
+
+
+def _fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.headers['Content-Type'], response.read().decode()
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from utils import yt_downloader
+from utils.output_profiles import PASSTHROUGH, PROFILES, REMUX, TRANSCODE, get_profile, mode_stats
+from utils.yt_downloader import _convert_source
+
+
+def test_get_profile_rejects_unknown_names():
+    assert get_profile('native') is PROFILES['native']
+    with pytest.raises(ValueError, match='mp3_128'):
+        get_profile('mp3-128')
+
+
+def test_mp3_profile_only_passes_mp3_through():
+    profile = PROFILES['mp3_128']
+    assert profile.plan({'acodec': 'mp3', 'ext': 'mp3'}) == (PASSTHROUGH, 'mp3')
+    assert profile.plan({'acodec': 'mp4a.40.2', 'ext': 'm4a'}) == (TRANSCODE, 'mp3')
+    assert profile.plan({'acodec': 'opus', 'ext': 'webm'}) == (TRANSCODE, 'mp3')
+    # An MP3 stream in the wrong container still needs work.
+    assert profile.plan({'acodec': 'mp3', 'ext': 'mka'}) == (TRANSCODE, 'mp3')
+
+
+def test_native_profile_remuxes_aac():
+    profile = PROFILES['native']
+    assert profile.plan({'acodec': 'mp4a.40.2', 'ext': 'm4a'}) == (REMUX, 'm4a')
+    assert profile.plan({'acodec': 'mp3', 'ext': 'mp3'}) == (PASSTHROUGH, 'mp3')
+    assert profile.plan({'acodec': 'opus', 'ext': 'webm'}) == (TRANSCODE, 'mp3')
+    assert profile.plan({}) == (TRANSCODE, 'mp3')
+
+
+def test_passthrough_leaves_the_file_alone(tmp_path, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise AssertionError('ffmpeg must not run for a passthrough')
+
+    monkeypatch.setattr(yt_downloader, 'transcode_to_mp3', fail)
+    monkeypatch.setattr(yt_downloader, 'remux_audio', fail)
+    source = tmp_path / 'abc.mp3'
+    source.write_bytes(b'ID3')
+    before = mode_stats()
+
+    result = asyncio.run(_convert_source(str(source), {'acodec': 'mp3', 'ext': 'mp3'}, PROFILES['mp3_128'], None, None))
+
+    assert result == str(source)
+    assert source.read_bytes() == b'ID3'
+    assert mode_stats()[PASSTHROUGH] == before[PASSTHROUGH] + 1
+
+
+def test_transcode_runs_inside_the_transcode_slot(tmp_path, monkeypatch):
+    events = []
+
+    class Slot:
+        async def __aenter__(self):
+            events.append('enter')
+
+        async def __aexit__(self, *exc):
+            events.append('exit')
+
+    async def transcode(source_path, ffmpeg_path, bitrate):
+        events.append(('transcode', bitrate))
+        return source_path + '.mp3'
+
+    monkeypatch.setattr(yt_downloader, 'transcode_to_mp3', transcode)
+    before = mode_stats()
+
+    result = asyncio.run(_convert_source('a.webm', {'acodec': 'opus', 'ext': 'webm'}, PROFILES['native'], None, Slot))
+
+    assert result == 'a.webm.mp3'
+    assert events == ['enter', ('transcode', '128k'), 'exit']
+    assert mode_stats()[TRANSCODE] == before[TRANSCODE] + 1
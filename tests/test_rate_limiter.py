@@ -0,0 +1,166 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from handlers import downloader, start
+from tests.conftest import FakeClock
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter, RatePolicy
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    return fake
+
+
+def make_limiter(**kwargs) -> RateLimiter:
+    # 3 requests per 15 s: a burst of 3, then one every 5 s.
+    return RateLimiter({'search': RatePolicy.parse('search', '3/15')}, **kwargs)
+
+
+def test_parse():
+    assert RatePolicy.parse('start', '3/15') == RatePolicy('start', 3, 5.0)
+    assert RatePolicy.parse('start', '') is None
+    assert RatePolicy.parse('start', '0/15') is None
+    with pytest.raises(ValueError):
+        RatePolicy.parse('start', 'often')
+
+
+def test_burst_then_one_per_interval(clock):
+    limiter = make_limiter()
+    assert [limiter.check('search', 1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.check('search', 1) == pytest.approx(5.0)
+
+    clock.advance(4)
+    assert limiter.check('search', 1) == pytest.approx(1.0)
+    clock.advance(1)
+    assert limiter.check('search', 1) == 0.0
+    assert limiter.check('search', 1) == pytest.approx(5.0)
+
+    # A full bucket again after burst * interval of silence, but no more than that.
+    clock.advance(15)
+    assert [limiter.check('search', 1) for _ in range(4)] == [0.0, 0.0, 0.0, pytest.approx(5.0)]
+    assert limiter.stats()['allowed'] == 7
+    assert limiter.stats()['rejected'] == 4
+
+
+def test_rejected_requests_do_not_consume_the_bucket(clock):
+    limiter = make_limiter()
+    for _ in range(3):
+        limiter.check('search', 1)
+    for _ in range(10):
+        limiter.check('search', 1)
+    clock.advance(5)
+    assert limiter.check('search', 1) == 0.0
+
+
+def test_keys_and_policies_are_independent(clock):
+    limiter = RateLimiter({'search': RatePolicy.parse('search', '1/10'), 'start': None})
+    assert limiter.check('search', 1) == 0.0
+    assert limiter.check('search', 1) > 0
+    assert limiter.check('search', 2) == 0.0
+    # Disabled and unknown policies never limit.
+    assert all(limiter.check('start', 1) == 0.0 for _ in range(10))
+    assert limiter.check('download', 1) == 0.0
+
+
+def test_sweep_drops_refilled_entries(clock):
+    limiter = make_limiter(sweep_interval=60)
+    limiter.check('search', 1)
+    for _ in range(3):
+        limiter.check('search', 2)
+    assert limiter.stats()['tracked'] == 2
+
+    # User 1's bucket is full after 5 s, user 2's after 15 s.
+    clock.advance(10)
+    limiter._sweep(rate_limiter.time.monotonic())
+    assert limiter.stats()['tracked'] == 1
+    assert limiter.check('search', 2) == 0.0
+
+    # check() sweeps by itself once sweep_interval has passed.
+    clock.advance(60)
+    limiter.check('search', 3)
+    assert limiter.stats()['tracked'] == 1
+
+
+def test_max_entries_forgets_least_recently_seen(clock):
+    limiter = make_limiter(max_entries=2)
+    for key in (1, 2):
+        for _ in range(3):
+            limiter.check('search', key)
+    # Seeing user 1 again makes user 2 the least recent.
+    clock.advance(5)
+    limiter.check('search', 1)
+    limiter.check('search', 3)
+
+    assert limiter.stats()['evictions'] == 1
+    assert limiter.stats()['tracked'] == 2
+    assert limiter.check('search', 1) > 0
+    assert limiter.check('search', 2) == 0.0
+
+
+def test_state_survives_a_restart(clock, monkeypatch, tmp_path):
+    path = str(tmp_path / 'limits.sqlite3')
+    limiter = make_limiter(path=path)
+    for _ in range(3):
+        limiter.check('search', 1)
+    limiter.check('search', 2)
+    limiter.close()
+
+    # The next process has a different monotonic origin, 2 s of wall time later.
+    restarted_clock = FakeClock(monotonic=10.0, wall=clock.time() + 2)
+    monkeypatch.setattr(rate_limiter, 'time', restarted_clock)
+    restored = make_limiter(path=path)
+    restored.load()
+
+    assert restored.stats()['tracked'] == 2
+    assert restored.check('search', 1) == pytest.approx(3.0)
+    assert restored.check('search', 2) == 0.0
+
+    # Entries that refilled while the bot was down are not restored.
+    restored.close()
+    later = FakeClock(monotonic=10.0, wall=restarted_clock.time() + 3600)
+    monkeypatch.setattr(rate_limiter, 'time', later)
+    again = make_limiter(path=path)
+    again.load()
+    assert again.stats()['tracked'] == 0
+
+
+def test_without_path_persistence_is_a_no_op(clock):
+    limiter = make_limiter()
+    limiter.check('search', 1)
+    limiter.load()
+    limiter.close()
+    assert limiter.stats()['tracked'] == 1
+
+
+def test_download_refused_for_concurrency_keeps_its_token(clock, monkeypatch):
+    limiter = RateLimiter({'download': RatePolicy.parse('download', '1/600')})
+    monkeypatch.setattr(start, 'rate_limiter', limiter)
+    monkeypatch.setattr(downloader, 'DOWNLOAD_BACKEND', 'inline')
+
+    async def subscribed(user_id, bot):
+        return True
+
+    monkeypatch.setattr(downloader, 'check_subscription', subscribed)
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=7),
+        message=SimpleNamespace(text='https://youtu.be/abc', reply_text=reply_text),
+    )
+    running = {f"task-{n}": {} for n in range(downloader.MAX_CONCURRENT_DOWNLOADS_PER_USER)}
+    context = SimpleNamespace(bot=None, bot_data={'active_downloads': {7: running}}, user_data={})
+
+    asyncio.run(downloader.smart_message_handler(update, context))
+
+    texts = start.get_user_texts(7)
+    assert replies == [texts['download_in_progress'] + f" (max {downloader.MAX_CONCURRENT_DOWNLOADS_PER_USER})"]
+    assert limiter.allowed == 0 and limiter.rejected == 0
+    assert start.rate_limit_reply(7, 'download') is None
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import settle
+from utils.scheduler import DownloadScheduler, SchedulerQueueFull
+
+
+class Jobs:
+    """Download jobs that hold their slot until released, recording the order they were served in."""
+
+    def __init__(self, scheduler: DownloadScheduler) -> None:
+        self.scheduler = scheduler
+        self.served = []
+        self.release = {}
+
+    def start(self, user_id: int, name: str) -> asyncio.Task:
+        self.release[name] = asyncio.Event()
+
+        async def job() -> None:
+            async with self.scheduler.download_slot(user_id):
+                self.served.append(name)
+                await self.release[name].wait()
+
+        return asyncio.create_task(job())
+
+    async def finish(self, name: str) -> None:
+        self.release[name].set()
+        await settle()
+
+
+def test_one_users_burst_does_not_starve_another():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=1, max_transcodes=1, max_queue=100)
+        jobs = Jobs(scheduler)
+        jobs.start(0, 'running')
+        await settle()
+        for n in range(5):
+            jobs.start(1, f"a{n}")
+        await settle()
+        jobs.start(2, 'b0')
+        await settle()
+
+        for name in ['running', 'a0', 'b0', 'a1', 'a2', 'a3']:
+            await jobs.finish(name)
+        return jobs.served
+
+    assert asyncio.run(scenario()) == ['running', 'a0', 'b0', 'a1', 'a2', 'a3', 'a4']
+
+
+def test_positions_follow_round_robin_order():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=1, max_transcodes=1, max_queue=100)
+        jobs = Jobs(scheduler)
+        jobs.start(0, 'running')
+        await settle()
+        waiters = []
+        for user_id in (1, 1, 1, 2):
+            jobs.start(user_id, f"{user_id}-{len(waiters)}")
+            await settle()
+            waiters.append((user_id, scheduler._queues[user_id][-1]))
+        return [scheduler.position(user_id, waiter) for user_id, waiter in waiters]
+
+    # User 2's only job goes right after user 1's first one.
+    assert asyncio.run(scenario()) == [1, 3, 4, 2]
+
+
+def test_queue_limit_rejects_and_counts():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=1, max_transcodes=1, max_queue=2)
+        jobs = Jobs(scheduler)
+        tasks = [jobs.start(1, f"j{n}") for n in range(4)]
+        await settle()
+        assert isinstance(tasks[3].exception(), SchedulerQueueFull)
+        assert scheduler.stats() == {
+            'active_downloads': 1, 'active_transcodes': 0, 'queued': 2, 'queued_users': 1, 'rejected': 1,
+        }
+        for name in ('j0', 'j1', 'j2'):
+            await jobs.finish(name)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats['active_downloads'], stats['queued'], stats['queued_users']) == (0, 0, 0)
+
+
+def test_cancelled_waiter_frees_its_position():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=1, max_transcodes=1, max_queue=2)
+        jobs = Jobs(scheduler)
+        jobs.start(0, 'running')
+        await settle()
+        cancelled = jobs.start(1, 'cancelled')
+        await settle()
+        jobs.start(2, 'b0')
+        await settle()
+        behind = scheduler._queues[2][0]
+        assert scheduler.position(2, behind) == 2
+
+        cancelled.cancel()
+        await settle()
+        assert scheduler.position(2, behind) == 1
+        assert scheduler.stats()['queued'] == 1
+        # Its place in the bounded queue is free again.
+        jobs.start(3, 'c0')
+        await settle()
+        assert scheduler.rejected == 0
+
+        await jobs.finish('running')
+        await jobs.finish('b0')
+        await jobs.finish('c0')
+        return jobs.served, scheduler.stats()['active_downloads']
+
+    served, active = asyncio.run(scenario())
+    assert served == ['running', 'b0', 'c0']
+    assert active == 0
+
+
+def test_cancelling_a_running_job_returns_its_slot():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=2, max_transcodes=1, max_queue=10)
+        jobs = Jobs(scheduler)
+        first = jobs.start(1, 'a')
+        jobs.start(2, 'b')
+        jobs.start(3, 'c')
+        await settle()
+        assert scheduler.active_downloads == 2 and scheduler.queued == 1
+        first.cancel()
+        await settle()
+        return jobs.served, scheduler.active_downloads, scheduler.queued
+
+    served, active, queued = asyncio.run(scenario())
+    assert served == ['a', 'b', 'c']
+    assert (active, queued) == (2, 0)
+
+
+def test_transcode_slots_are_bounded():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=1, max_transcodes=2, max_queue=0)
+        peak = 0
+        gate = asyncio.Event()
+
+        async def transcode() -> None:
+            nonlocal peak
+            async with scheduler.transcode_slot():
+                peak = max(peak, scheduler.active_transcodes)
+                await gate.wait()
+
+        tasks = [asyncio.create_task(transcode()) for _ in range(5)]
+        await settle()
+        running = scheduler.active_transcodes
+        gate.set()
+        await asyncio.gather(*tasks)
+        return running, peak, scheduler.active_transcodes
+
+    assert asyncio.run(scenario()) == (2, 2, 0)
+
+
+def test_queue_of_zero_rejects_once_slots_are_taken():
+    async def scenario():
+        scheduler = DownloadScheduler(max_downloads=1, max_transcodes=1, max_queue=0)
+        async with scheduler.download_slot(1):
+            with pytest.raises(SchedulerQueueFull):
+                async with scheduler.download_slot(2):
+                    pass
+        return scheduler.active_downloads
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import time
+
+from tests.conftest import settle
+from utils import scratch as scratch_module
+from utils.scratch import MARKER_FILE, ScratchSpace
+
+
+def make_space(tmp_path, **kwargs) -> ScratchSpace:
+    kwargs.setdefault('quota_bytes', 100)
+    kwargs.setdefault('reserve_bytes', 40)
+    kwargs.setdefault('sweep_interval', 0)
+    return ScratchSpace(str(tmp_path / 'disk'), **kwargs)
+
+
+def write_marker(path, **marker) -> None:
+    os.makedirs(path)
+    with open(os.path.join(path, MARKER_FILE), 'w', encoding='utf-8') as fh:
+        json.dump(marker, fh)
+
+
+def test_acquire_waits_for_quota_and_release_frees_it(tmp_path):
+    space = make_space(tmp_path)
+
+    async def scenario():
+        first = await space.acquire('a')
+        await space.acquire('b')
+        third = asyncio.create_task(space.acquire('c'))
+        await settle()
+        assert not third.done()
+        assert space.stats()['waiting_jobs'] == 1
+
+        space.release(first.path)
+        scratch = await asyncio.wait_for(third, 1)
+        assert not os.path.exists(first.path)
+        assert space.stats()['reserved_bytes'] == 80
+        return scratch
+
+    scratch = asyncio.run(scenario())
+    assert os.path.basename(scratch.path) == 'job-c'
+    with open(os.path.join(scratch.path, MARKER_FILE), encoding='utf-8') as fh:
+        assert json.load(fh)['pid'] == os.getpid()
+
+
+def test_single_job_is_admitted_even_above_quota(tmp_path):
+    space = make_space(tmp_path, quota_bytes=10)
+
+    scratch = asyncio.run(space.acquire('big'))
+
+    assert os.path.isdir(scratch.path)
+
+
+def test_tmpfs_is_used_until_its_budget_runs_out(tmp_path):
+    space = make_space(tmp_path, tmpfs_dir=str(tmp_path / 'tmpfs'), tmpfs_bytes=50)
+
+    async def scenario():
+        return await space.acquire('a'), await space.acquire('b')
+
+    first, second = asyncio.run(scenario())
+
+    assert first.on_tmpfs and first.path.startswith(str(tmp_path / 'tmpfs'))
+    assert not second.on_tmpfs and second.path.startswith(str(tmp_path / 'disk'))
+    assert space.stats()['spilled'] == 1
+
+
+def test_janitor_removes_orphans_and_keeps_live_jobs(tmp_path, monkeypatch):
+    space = make_space(tmp_path)
+    disk = tmp_path / 'disk'
+    dead_pid = str(disk / 'job-dead')
+    write_marker(dead_pid, pid=1, created_at=time.time())
+    monkeypatch.setattr(scratch_module, '_pid_alive', lambda pid: pid != 1)
+    # Same pid as this process, but written by an earlier run.
+    previous_run = str(disk / 'job-previous')
+    write_marker(previous_run, pid=os.getpid(), instance='earlier-run', created_at=time.time())
+
+    live = asyncio.run(space.acquire('live'))
+    removed = space.sweep()
+
+    assert removed == 2
+    assert not os.path.exists(dead_pid)
+    assert not os.path.exists(previous_run)
+    assert os.path.isdir(live.path)
+
+
+def test_janitor_detects_a_reused_pid(tmp_path, monkeypatch):
+    space = make_space(tmp_path)
+    reused = str(tmp_path / 'disk' / 'job-reused')
+    write_marker(reused, pid=4242, started='100', created_at=time.time())
+    monkeypatch.setattr(scratch_module, '_pid_alive', lambda pid: True)
+    monkeypatch.setattr(scratch_module, '_process_started', lambda pid: '200')
+
+    assert space.sweep() == 1
+    assert not os.path.exists(reused)
@@ -0,0 +1,105 @@
+import pytest
+
+from tests.conftest import FakeClock
+from utils import search_cache
+from utils.search_cache import SearchCache, approximate_size, compact_entry, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(search_cache, 'time', fake)
+    return fake
+
+
+def results(*ids):
+    return [{'id': i, 'url': f'https://youtu.be/{i}', 'title': f'Song {i}', 'formats': ['dropped']} for i in ids]
+
+
+def make_cache(**kwargs) -> SearchCache:
+    options = {'max_entries': 100, 'ttl': 60, 'negative_ttl': 10, 'stale_ttl': 30}
+    options.update(kwargs)
+    return SearchCache(**options)
+
+
+def test_normalize_query_folds_case_width_and_spaces():
+    assert normalize_query('  Daft   PUNK ') == normalize_query('daft punk') == 'daft punk'
+    assert normalize_query('ＡＢＣ') == 'abc'
+
+
+def test_results_are_compacted():
+    cache = make_cache()
+    cache.put('q', results('a'))
+    cached, stale = cache.get('q')
+    assert cached == [{'id': 'a', 'url': 'https://youtu.be/a', 'title': 'Song a'}]
+    assert not stale
+
+
+def test_fresh_then_stale_then_gone(clock):
+    cache = make_cache()
+    cache.put('q', results('a'))
+    compacted = [compact_entry(r) for r in results('a')]
+
+    clock.advance(59)
+    assert cache.get('q') == (compacted, False)
+    clock.advance(2)
+    assert cache.get('q') == (compacted, True)
+    clock.advance(29)
+    assert cache.get('q') == (None, False)
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['misses'], stats['size']) == (1, 1, 1, 0)
+
+
+def test_empty_results_use_the_negative_ttl_without_a_stale_window(clock):
+    cache = make_cache()
+    cache.put('nothing', [])
+    clock.advance(9)
+    assert cache.get('nothing') == ([], False)
+    clock.advance(2)
+    assert cache.get('nothing') == (None, False)
+
+
+def test_zero_ttl_disables_caching():
+    cache = make_cache(negative_ttl=0)
+    cache.put('nothing', [])
+    assert cache.get('nothing') == (None, False)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.put('a', results('a'))
+    cache.put('b', results('b'))
+    cache.get('a')
+    cache.put('c', results('c'))
+    assert cache.get('b') == (None, False)
+    assert cache.get('a')[0] is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_bounds_entries_with_large_payloads():
+    small = tuple(compact_entry(r) for r in results('a'))
+    budget = 3 * approximate_size('q0', small)
+    cache = make_cache(max_bytes=budget)
+    for n in range(3):
+        cache.put(f'q{n}', results('a'))
+    assert cache.stats()['size'] == 3
+
+    long_titles = [{'id': 'x', 'title': 'x' * budget}]
+    cache.put('big', long_titles)
+    stats = cache.stats()
+    # The oversized newest entry stays; everything older went to make room.
+    assert stats['size'] == 1
+    assert cache.get('big')[0] is not None
+    assert stats['evictions'] == 3
+
+    cache.put('q0', results('a'))
+    assert cache.stats()['size'] == 1
+    assert cache.stats()['bytes'] <= budget
+
+
+def test_replacing_an_entry_does_not_count_its_old_size():
+    cache = make_cache()
+    cache.put('q', results('a'))
+    first = cache.stats()['bytes']
+    cache.put('q', results('a'))
+    assert cache.stats()['bytes'] == first
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from utils.rate_limiter import RatePolicy
+from utils.send_queue import SendQueue, SharedSendBudget
+
+
+def test_shared_budget_is_drawn_on_by_every_process(tmp_path):
+    path = str(tmp_path / 'send.sqlite3')
+    policy = RatePolicy.parse('send_global', '2/60')
+    bot, worker = SharedSendBudget(path), SharedSendBudget(path)
+    try:
+        assert bot.take('global', policy) == 0
+        assert worker.take('global', policy) == 0
+        # Both tokens are gone, whichever process asks; a refused take does not use one up.
+        assert 29 < bot.take('global', policy) <= 30
+        assert 29 < worker.take('global', policy) <= 30
+        assert worker.take('chat:1', policy) == 0
+    finally:
+        bot.close()
+        worker.close()
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Takes tokens from one lane as fast as it can and prints how many it got.
+_TAKER = """
+import sys, time
+from utils.rate_limiter import RatePolicy
+from utils.send_queue import SharedSendBudget
+budget = SharedSendBudget(sys.argv[1])
+policy = RatePolicy.parse('send_global', '40/3600')
+start_at = float(sys.argv[2])
+while time.time() < start_at:
+    time.sleep(0.001)
+taken = 0
+for _ in range(400):
+    if budget.take('global', policy) == 0:
+        taken += 1
+print(taken, budget.contended)
+"""
+
+
+def test_two_processes_share_one_budget(tmp_path):
+    path = str(tmp_path / 'send.sqlite3')
+    start_at = str(time.time() + 1.5)
+    takers = [
+        subprocess.Popen([sys.executable, '-c', _TAKER, path, start_at], cwd=PROJECT_DIR, stdout=subprocess.PIPE, text=True)
+        for _ in range(2)
+    ]
+    results = [tuple(map(int, taker.communicate(timeout=60)[0].split())) for taker in takers]
+
+    assert all(taker.returncode == 0 for taker in takers)
+    # Between them they get the burst exactly once, never twice.
+    assert sum(taken for taken, _ in results) == 40
+
+
+def test_take_does_not_wait_for_a_locked_budget(tmp_path):
+    path = str(tmp_path / 'send.sqlite3')
+    policy = RatePolicy.parse('send_global', '2/60')
+    budget = SharedSendBudget(path, busy_retry=0.01)
+    assert budget.take('global', policy) == 0
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.monotonic()
+        assert budget.take('global', policy) == 0.01
+        assert time.monotonic() - started < 0.5
+        assert budget.contended == 1
+    finally:
+        other.execute('ROLLBACK')
+        other.close()
+    assert budget.take('global', policy) == 0
+    budget.close()
+
+
+def test_send_queues_sharing_a_budget_respect_the_global_limit(tmp_path):
+    path = str(tmp_path / 'send.sqlite3')
+
+    async def scenario():
+        queues = [
+            SendQueue(
+                global_policy=RatePolicy.parse('send_global', '3/60'),
+                private_policy=None,
+                group_policy=None,
+                shared=SharedSendBudget(path),
+            )
+            for _ in range(2)
+        ]
+        sent = []
+
+        async def send(queue, chat_id):
+            async def callback():
+                sent.append(chat_id)
+                return True
+            await queue.process_request(callback, (), {}, 'sendMessage', {'chat_id': chat_id}, None)
+
+        tasks = [asyncio.create_task(send(queues[n % 2], n + 1)) for n in range(4)]
+        await asyncio.sleep(0.2)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in queues:
+            await queue.shutdown()
+        return sent
+
+    assert len(asyncio.run(scenario())) == 3
+
+
+def test_without_a_shared_budget_limits_are_per_process():
+    async def scenario():
+        queue = SendQueue(global_policy=RatePolicy.parse('send_global', '2/60'), private_policy=None, group_policy=None)
+        sent = []
+
+        async def callback():
+            sent.append(1)
+            return True
+
+        tasks = [
+            asyncio.create_task(queue.process_request(callback, (), {}, 'sendMessage', {'chat_id': n}, None))
+            for n in range(1, 4)
+        ]
+        await asyncio.sleep(0.1)
+        stats = queue.stats()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await queue.shutdown()
+        return len(sent), stats['queued']
+
+    assert asyncio.run(scenario()) == (2, 1)
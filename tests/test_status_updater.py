@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+from telegram.error import BadRequest, RetryAfter
+
+from tests.conftest import settle
+from utils.status_updater import StatusUpdater
+
+
+class Message:
+    """Records edits; raises the queued errors first."""
+
+    def __init__(self, *errors) -> None:
+        self.errors = list(errors)
+        self.edits = []
+
+    async def edit(self, text, reply_markup) -> None:
+        if self.errors:
+            raise self.errors.pop(0)
+        self.edits.append(text)
+
+
+def test_bursts_collapse_to_the_latest_text():
+    async def scenario():
+        message = Message()
+        updater = StatusUpdater(message.edit, asyncio.get_running_loop(), interval=0.05)
+        for percent in range(10):
+            updater.set(f'{percent}%')
+            await settle()
+        # The first edit goes out at once, the rest wait for the interval and collapse.
+        assert message.edits == ['0%']
+        await asyncio.sleep(0.1)
+        assert message.edits == ['0%', '9%']
+        assert (updater.requested, updater.edits) == (10, 2)
+
+    asyncio.run(scenario())
+
+
+def test_identical_text_is_not_sent_again():
+    async def scenario():
+        message = Message()
+        updater = StatusUpdater(message.edit, asyncio.get_running_loop(), interval=0.01)
+        updater.set('50%')
+        await asyncio.sleep(0.05)
+        updater.set('50%')
+        await asyncio.sleep(0.05)
+        assert message.edits == ['50%']
+
+    asyncio.run(scenario())
+
+
+def test_set_from_a_worker_thread():
+    async def scenario():
+        message = Message()
+        updater = StatusUpdater(message.edit, asyncio.get_running_loop(), interval=0.01)
+        thread = threading.Thread(target=lambda: [updater.set(f'{n}%') for n in range(100)])
+        thread.start()
+        await asyncio.to_thread(thread.join)
+        await asyncio.sleep(0.05)
+        assert message.edits[-1] == '99%'
+        assert len(message.edits) < 100
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_pauses_edits_and_keeps_the_state():
+    async def scenario():
+        message = Message(RetryAfter(0.1))
+        updater = StatusUpdater(message.edit, asyncio.get_running_loop(), interval=0.01)
+        updater.set('10%')
+        await asyncio.sleep(0.05)
+        assert message.edits == []
+        await asyncio.sleep(0.1)
+        assert message.edits == ['10%']
+
+    asyncio.run(scenario())
+
+
+def test_finish_is_sent_at_once_and_stops_later_updates():
+    async def scenario():
+        message = Message()
+        updater = StatusUpdater(message.edit, asyncio.get_running_loop(), interval=10)
+        updater.set('10%')
+        await settle()
+        updater.set('20%')
+        await updater.finish('Done')
+        updater.set('30%')
+        await asyncio.sleep(0.02)
+        assert message.edits == ['10%', 'Done']
+
+    asyncio.run(scenario())
+
+
+def test_bad_request_counts_as_delivered():
+    async def scenario():
+        message = Message(BadRequest('Message is not modified'))
+        updater = StatusUpdater(message.edit, asyncio.get_running_loop(), interval=0.01)
+        updater.set('10%')
+        await asyncio.sleep(0.03)
+        updater.set('10%')
+        await asyncio.sleep(0.03)
+        assert message.edits == []
+
+    asyncio.run(scenario())
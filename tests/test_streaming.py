@@ -0,0 +1,90 @@
+import asyncio
+import os
+import stat
+import sys
+
+import httpx
+import pytest
+
+from utils import transcode
+from utils.transcode import TranscodeError, stream_to_mp3
+from utils.yt_downloader import _stream_source
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+def fake_ffmpeg(tmp_path, exit_code: int = 0) -> str:
+    """An 'ffmpeg' that copies stdin to its last argument."""
+    script = tmp_path / 'ffmpeg'
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import shutil, sys\n"
+        "with open(sys.argv[-1], 'wb') as out:\n"
+        "    shutil.copyfileobj(sys.stdin.buffer, out)\n"
+        f"sys.exit({exit_code})\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def serve(monkeypatch, handler) -> None:
+    """Route the httpx client stream_to_mp3 creates to handler."""
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(transcode.httpx, 'AsyncClient', lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+
+
+def test_stream_source_accepts_only_single_pipeable_http_formats():
+    base = {'url': 'https://host/a', 'protocol': 'https', 'ext': 'webm'}
+    assert _stream_source(base) is base
+    assert _stream_source(dict(base, ext='m4a', container='m4a_dash')) is not None
+    assert _stream_source(dict(base, ext='m4a')) is None
+    assert _stream_source(dict(base, protocol='m3u8_native')) is None
+    assert _stream_source(dict(base, requested_formats=[{}, {}])) is None
+    assert _stream_source(dict(base, url=None)) is None
+
+
+def test_ranged_stream_is_piped_into_ffmpeg(tmp_path, monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        header = request.headers['Range']
+        seen.append(header)
+        start, end = (int(part) for part in header[len('bytes='):].split('-'))
+        return httpx.Response(206, content=PAYLOAD[start:end + 1])
+
+    serve(monkeypatch, handler)
+    progress = []
+    target = str(tmp_path / 'out.mp3')
+
+    asyncio.run(stream_to_mp3(
+        'https://host/a', {}, target, fake_ffmpeg(tmp_path),
+        total_size=len(PAYLOAD), chunk_size=4096, progress=lambda done, total, speed: progress.append(done),
+    ))
+
+    with open(target, 'rb') as fh:
+        assert fh.read() == PAYLOAD
+    assert seen == ['bytes=0-4095', 'bytes=4096-8191', 'bytes=8192-10239']
+    assert progress[-1] == len(PAYLOAD)
+
+
+def test_server_ignoring_range_gets_one_plain_request(tmp_path, monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get('Range'))
+        return httpx.Response(200, content=PAYLOAD)
+
+    serve(monkeypatch, handler)
+    target = str(tmp_path / 'out.mp3')
+
+    asyncio.run(stream_to_mp3('https://host/a', {}, target, fake_ffmpeg(tmp_path), total_size=len(PAYLOAD), chunk_size=4096))
+
+    assert os.path.getsize(target) == len(PAYLOAD)
+    assert seen == ['bytes=0-4095']
+
+
+def test_ffmpeg_failure_raises(tmp_path, monkeypatch):
+    serve(monkeypatch, lambda request: httpx.Response(200, content=PAYLOAD))
+
+    with pytest.raises(TranscodeError):
+        asyncio.run(stream_to_mp3('https://host/a', {}, str(tmp_path / 'out.mp3'), fake_ffmpeg(tmp_path, exit_code=1)))
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import FakeClock, settle
+from utils import subscription_cache
+from utils.subscription_cache import SubscriptionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(subscription_cache, 'time', fake)
+    return fake
+
+
+class Bot:
+    """get_chat_member answering from a status table, counting calls; None raises."""
+
+    def __init__(self, status='member') -> None:
+        self.status = status
+        self.calls = 0
+        self.gate = None
+
+    async def get_chat_member(self, channel, user_id):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.status is None:
+            raise RuntimeError('api down')
+        return SimpleNamespace(status=self.status)
+
+
+def make_cache(fail_open=False) -> SubscriptionCache:
+    return SubscriptionCache(['@Channel'], positive_ttl=60, negative_ttl=5, fail_open=fail_open)
+
+
+def test_positive_answer_is_cached_then_refreshed_in_the_background(clock):
+    async def scenario():
+        cache, bot = make_cache(), Bot()
+        assert await cache.is_subscribed(1, bot)
+        clock.advance(59)
+        assert await cache.is_subscribed(1, bot)
+        assert bot.calls == 1
+
+        # Past the TTL the old answer is still used while one refresh runs.
+        clock.advance(2)
+        bot.status = 'left'
+        assert await cache.is_subscribed(1, bot)
+        await settle()
+        assert bot.calls == 2
+        assert not await cache.is_subscribed(1, bot)
+
+    asyncio.run(scenario())
+
+
+def test_negative_answer_expires_quickly(clock):
+    async def scenario():
+        cache, bot = make_cache(), Bot('left')
+        assert not await cache.is_subscribed(1, bot)
+        bot.status = 'member'
+        assert not await cache.is_subscribed(1, bot)
+        clock.advance(6)
+        assert await cache.is_subscribed(1, bot)
+        assert bot.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_checks_share_one_api_call(clock):
+    async def scenario():
+        cache, bot = make_cache(), Bot()
+        bot.gate = asyncio.Event()
+        checks = [asyncio.create_task(cache.is_subscribed(1, bot)) for _ in range(5)]
+        await settle()
+        bot.gate.set()
+        assert await asyncio.gather(*checks) == [True] * 5
+        assert bot.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_api_errors_fall_back_to_the_cached_answer_or_the_policy(clock):
+    async def scenario():
+        bot = Bot(None)
+        assert not await make_cache(fail_open=False).is_subscribed(1, bot)
+        assert await make_cache(fail_open=True).is_subscribed(1, bot)
+
+        cache = make_cache(fail_open=False)
+        bot.status = 'member'
+        await cache.is_subscribed(1, bot)
+        clock.advance(200)
+        bot.status = None
+        assert await cache.is_subscribed(1, bot)
+
+    asyncio.run(scenario())
+
+
+def test_member_updates_replace_cached_answers(clock):
+    async def scenario():
+        cache, bot = make_cache(), Bot('left')
+        assert not await cache.is_subscribed(1, bot)
+        cache.apply_member_update(1, 'channel', 'member')
+        assert await cache.is_subscribed(1, bot)
+        cache.apply_member_update(1, '@CHANNEL', 'kicked')
+        assert not await cache.is_subscribed(1, bot)
+        # Channels that are not required are ignored.
+        cache.apply_member_update(2, 'other', 'member')
+        assert cache.stats()['size'] == 1
+        assert bot.calls == 1
+
+    asyncio.run(scenario())
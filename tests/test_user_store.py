@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.user_store import SQLiteUserStore, UserPreferenceStore
+
+
+def test_legacy_json_is_imported_once_and_left_in_place(tmp_path):
+    legacy = tmp_path / 'user_languages.json'
+    legacy.write_text(json.dumps({'1': 'ru', '2': 'es'}), encoding='utf-8')
+    store = SQLiteUserStore(str(tmp_path / 'prefs.sqlite3'))
+    store.set(2, 'en')
+
+    assert store.migrate_from_json(str(legacy)) == 2
+    assert legacy.exists()
+    # Rows written before the migration are newer than the legacy file.
+    assert (store.get(1), store.get(2)) == ('ru', 'en')
+
+    store.set(1, 'ar')
+    store.close()
+    reopened = SQLiteUserStore(str(tmp_path / 'prefs.sqlite3'))
+    assert reopened.migrate_from_json(str(legacy)) == 0
+    assert reopened.get(1) == 'ar'
+    reopened.close()
+
+
+def test_missing_or_unreadable_legacy_file_is_not_recorded(tmp_path):
+    legacy = tmp_path / 'user_languages.json'
+    store = SQLiteUserStore(str(tmp_path / 'prefs.sqlite3'))
+    assert store.migrate_from_json(str(legacy)) == 0
+    legacy.write_text('{not json', encoding='utf-8')
+    assert store.migrate_from_json(str(legacy)) == 0
+    legacy.write_text(json.dumps({'5': 'es'}), encoding='utf-8')
+    assert store.migrate_from_json(str(legacy)) == 1
+    assert store.get(5) == 'es'
+    store.close()
+
+
+def test_lookups_do_not_wait_for_a_batch_write(tmp_path):
+    path = str(tmp_path / 'prefs.sqlite3')
+    store = SQLiteUserStore(path)
+    store.set(1, 'de')
+    store.close()
+
+    reopened = SQLiteUserStore(path)
+    # A batch write in progress holds the lock; reads are answered from memory meanwhile.
+    with reopened._lock:
+        assert reopened.get(1) == 'de'
+        assert reopened.get(2) is None
+    reopened.close()
+
+
+def test_batched_writes_are_flushed(tmp_path):
+    async def scenario(store):
+        store.set(1, 'fr')
+        store.set(2, 'ja')
+        assert store.get(1) == 'fr'
+        await store.flush()
+
+    path = str(tmp_path / 'prefs.sqlite3')
+    store = SQLiteUserStore(path, flush_interval=60)
+    asyncio.run(scenario(store))
+    assert store.count() == 2
+    store.close()
+
+
+def test_preference_store_is_abstract():
+    with pytest.raises(TypeError):
+        UserPreferenceStore()
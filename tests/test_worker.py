@@ -0,0 +1,45 @@
+import asyncio
+
+from tests.conftest import settle
+from worker import acquire_slot
+
+
+def test_acquire_slot_returns_once_a_slot_frees_up():
+    async def scenario():
+        slots = asyncio.Semaphore(1)
+        await slots.acquire()
+        waiter = asyncio.create_task(acquire_slot(slots, asyncio.Event()))
+        await settle()
+        assert not waiter.done()
+        slots.release()
+        assert await asyncio.wait_for(waiter, 1) is True
+        assert slots.locked()
+
+    asyncio.run(scenario())
+
+
+def test_stop_interrupts_a_worker_waiting_for_a_slot():
+    async def scenario():
+        slots = asyncio.Semaphore(1)
+        stop = asyncio.Event()
+        await slots.acquire()
+        waiter = asyncio.create_task(acquire_slot(slots, stop))
+        await settle()
+        stop.set()
+        assert await asyncio.wait_for(waiter, 1) is False
+        # The busy slot is still the only one taken.
+        slots.release()
+        assert not slots.locked()
+
+    asyncio.run(scenario())
+
+
+def test_stop_wins_over_a_free_slot():
+    async def scenario():
+        slots = asyncio.Semaphore(1)
+        stop = asyncio.Event()
+        stop.set()
+        assert await acquire_slot(slots, stop) is False
+        assert not slots.locked()
+
+    asyncio.run(scenario())
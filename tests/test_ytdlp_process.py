@@ -0,0 +1,54 @@
+import asyncio
+import socket
+
+from utils.ytdlp_process import YtDlpProcessPool
+
+
+def test_session_runs_in_a_warm_worker_and_returns_it():
+    async def scenario():
+        pool = YtDlpProcessPool(1)
+        await pool.start()
+        try:
+            async with pool.session({'quiet': True}):
+                assert pool.stats()['idle'] == 0
+            assert pool.stats() == {'workers': 1, 'idle': 1, 'sessions': 1, 'replaced': 0}
+        finally:
+            await pool.close()
+        assert pool.stats()['workers'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_job_kills_and_replaces_its_worker():
+    # Accepts connections and never answers, so extraction hangs.
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    url = f"http://127.0.0.1:{server.getsockname()[1]}/track"
+
+    async def scenario():
+        pool = YtDlpProcessPool(1)
+        await pool.start()
+        try:
+            async def job():
+                async with pool.session({'quiet': True, 'socket_timeout': 60}) as session:
+                    await session.extract(url)
+
+            task = asyncio.create_task(job())
+            await asyncio.sleep(1)
+            victim = pool._workers[0]
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+            assert victim.process.poll() is not None
+            assert pool.stats()['replaced'] == 1
+            async with pool.session({'quiet': True}):
+                pass
+            assert pool.stats()['workers'] == 1
+        finally:
+            await pool.close()
+
+    try:
+        asyncio.run(asyncio.wait_for(scenario(), 60))
+    finally:
+        server.close()
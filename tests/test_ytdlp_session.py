@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+from tests.conftest import settle
+from utils import ytdlp_session
+from utils.ydl_pool import YoutubeDLPool
+from utils.ytdlp_session import YtDlpSession, thread_session
+
+
+def test_session_interface_is_abstract():
+    with pytest.raises(TypeError):
+        YtDlpSession()
+
+
+def test_pooled_session_returns_its_instance_for_the_next_job(monkeypatch):
+    monkeypatch.setattr(ytdlp_session, 'blocking_extract_info', lambda ydl, url: {'id': url})
+    pool = YoutubeDLPool()
+
+    async def job(url):
+        async with thread_session({'quiet': True}, pool=pool) as session:
+            return await session.extract(url)
+
+    async def scenario():
+        assert await job('a') == {'id': 'a'}
+        assert await job('b') == {'id': 'b'}
+
+    asyncio.run(scenario())
+    assert pool.stats() == {'idle': 1, 'created': 1, 'reused': 1, 'recycled': 0}
+    pool.close()
+
+
+def test_cancelled_job_retires_the_instance_only_after_its_thread_is_done(monkeypatch):
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow_extract(ydl, url):
+        started.set()
+        finish.wait(5)
+        return {'id': url}
+
+    monkeypatch.setattr(ytdlp_session, 'blocking_extract_info', slow_extract)
+    pool = YoutubeDLPool()
+
+    async def job():
+        async with thread_session({'quiet': True}, pool=pool) as session:
+            await session.extract('a')
+
+    async def scenario():
+        task = asyncio.create_task(job())
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The thread still holds the instance: nothing is released or closed yet.
+        assert pool.stats()['recycled'] == 0
+        cleanup = next(iter(ytdlp_session._cleanups))
+        finish.set()
+        await asyncio.wait_for(cleanup, 5)
+        await settle()
+
+    asyncio.run(scenario())
+    assert pool.stats() == {'idle': 0, 'created': 1, 'reused': 0, 'recycled': 1}
+    assert not ytdlp_session._cleanups
@@ -0,0 +1,171 @@
+"""Asynchronous cover-art fetching and processing with memory and disk caches."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import httpx
+
+from utils.executor import BoundedExecutor, ExecutorBusy
+from utils.logger import get_logger
+from utils.yt_downloader import compress_image, pull_thumbnail
+
+logger = get_logger(__name__)
+
+
+class CoverArtPipeline:
+    """Fetch thumbnails over a pooled HTTP client and encode them on a worker pool.
+
+    Processed JPEGs are kept in an in-memory LRU bounded by bytes and in a
+    directory on disk, and concurrent requests for the same key share one fetch.
+    """
+
+    def __init__(self, cache_dir: Optional[str], memory_bytes: int, workers: int, timeout: float = 15.0, disk_max_files: int = 20_000) -> None:
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+        self.disk_max_files = disk_max_files
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_used = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._executor = BoundedExecutor('cover-art', max_workers=workers, max_queue=workers * 16)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.failures = 0
+        # Created on the first write, so importing the handlers leaves no directory behind.
+        self._cache_dir_ready = False
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            )
+        return self._client
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.jpg")
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= len(previous)
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _read_disk(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, path: str, data: bytes) -> None:
+        if not self._cache_dir_ready:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._cache_dir_ready = True
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+        self._disk_writes += 1
+        if self.disk_max_files and self._disk_writes % 200 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.jpg')]
+        except OSError:
+            return
+        overflow = len(entries) - self.disk_max_files
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:overflow]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    async def _load(self, key: str, thumbnail_url: str, max_size: int) -> Optional[bytes]:
+        disk_path = self._disk_path(key)
+        if disk_path:
+            cached = await asyncio.to_thread(self._read_disk, disk_path)
+            if cached:
+                self.disk_hits += 1
+                self._remember(key, cached)
+                return cached
+
+        self.misses += 1
+        try:
+            response = await self._http().get(thumbnail_url)
+            response.raise_for_status()
+            jpeg_data = await self._executor.run(compress_image, response.content, max_size)
+        except (httpx.HTTPError, ExecutorBusy, asyncio.TimeoutError) as exc:
+            self.failures += 1
+            logger.debug("Failed to fetch remote thumbnail %s: %s", thumbnail_url, exc)
+            return None
+        except Exception as exc:
+            self.failures += 1
+            logger.debug("Failed to process remote thumbnail %s: %s", thumbnail_url, exc)
+            return None
+
+        self._remember(key, jpeg_data)
+        if disk_path:
+            try:
+                await asyncio.to_thread(self._write_disk, disk_path, jpeg_data)
+            except OSError as exc:
+                logger.debug("Could not write cover cache %s: %s", disk_path, exc)
+        return jpeg_data
+
+    async def get(self, info: Dict, max_size: int = 200_000) -> Optional[bytes]:
+        """Return processed JPEG cover art for info, or None when unavailable."""
+        thumbnail_url = pull_thumbnail(info)
+        if not thumbnail_url:
+            return None
+        # Keyed by URL: tracks of one album (playlist siblings) share their artwork URL.
+        key = f"{max_size}:{thumbnail_url}"
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, thumbnail_url, max_size))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _task: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_used,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'failures': self.failures,
+        }
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._executor.shutdown()
@@ -0,0 +1,99 @@
+"""Bounded thread pool with an asyncio front end for blocking library calls."""
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ExecutorBusy(Exception):
+    """Raised when the executor queue is full and a job is rejected."""
+
+
+class BoundedExecutor:
+    """Run blocking callables on a dedicated pool with a queue limit and timeouts.
+
+    A job counts against the queue until its worker thread actually finishes, so
+    jobs that timed out on the asyncio side still hold their slot and a slow
+    upstream cannot make the pool grow an unbounded backlog.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> None:
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_depth_seen = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs accepted but not yet picked up by a worker thread."""
+        with self._lock:
+            return self._pending - self._running
+
+    def _wrap(self, func: Callable[..., Any], args: tuple) -> Callable[[], Any]:
+        def runner() -> Any:
+            with self._lock:
+                self._running += 1
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+        return runner
+
+    def _release(self, _future: Any) -> None:
+        # Fires on completion and on cancellation of a job that never started.
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Execute func(*args) on the pool; raise ExecutorBusy or asyncio.TimeoutError."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy(f"{self.name} executor queue is full")
+            self._pending += 1
+            self.submitted += 1
+            depth = self._pending - self._running
+            if depth > self.max_depth_seen:
+                self.max_depth_seen = depth
+
+        concurrent_future = self._pool.submit(self._wrap(func, args))
+        concurrent_future.add_done_callback(self._release)
+        future = asyncio.wrap_future(concurrent_future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("%s job timed out after %ss.", self.name, timeout)
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'running': self._running,
+                'queue_depth': self._pending - self._running,
+                'max_queue_depth': self.max_depth_seen,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,159 @@
+"""Persistent cache of Telegram file_ids for already uploaded tracks."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_ids (
+    track_key TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    file_unique_id TEXT,
+    title TEXT,
+    performer TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (track_key, profile)
+)
+"""
+
+# Keys under this prefix (static media assets) are never evicted and do not count towards max_entries.
+PINNED_PREFIX = 'asset:'
+
+
+@dataclass
+class CachedFile:
+    file_id: str
+    title: str
+    performer: str
+
+
+class FileIdCache:
+    """SQLite-backed mapping of (track key, output profile) to a Telegram file_id.
+
+    Lookups and writes are single-row statements on a WAL database, but they
+    still wait for the connection lock and for other writers, so handlers call
+    them through asyncio.to_thread rather than on the event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int = 0) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _lookup(self, track_key: str, profile: str) -> Optional[CachedFile]:
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    'SELECT file_id, title, performer FROM file_ids WHERE track_key = ? AND profile = ?',
+                    (track_key, profile),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        'UPDATE file_ids SET last_used = ?, hits = hits + 1 WHERE track_key = ? AND profile = ?',
+                        (time.time(), track_key, profile),
+                    )
+        except sqlite3.Error as exc:
+            logger.error("file_id cache lookup failed for %s: %s", track_key, exc)
+            row = None
+        if not row:
+            return None
+        return CachedFile(file_id=row[0], title=row[1] or '', performer=row[2] or '')
+
+    def get(self, track_key: str, profile: str) -> Optional[CachedFile]:
+        """Return the cached upload for a track or None, updating hit/miss counters."""
+        cached = self._lookup(track_key, profile)
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    def peek(self, track_key: str, profile: str) -> Optional[CachedFile]:
+        """Like get, but leaves the hit/miss counters alone; for re-checks of a request already counted."""
+        return self._lookup(track_key, profile)
+
+    def put(self, track_key: str, profile: str, file_id: str, title: str = '', performer: str = '', file_unique_id: Optional[str] = None) -> None:
+        """Record the file_id returned by Telegram for an uploaded track."""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    'INSERT OR REPLACE INTO file_ids '
+                    '(track_key, profile, file_id, file_unique_id, title, performer, created_at, last_used, hits) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)',
+                    (track_key, profile, file_id, file_unique_id, title, performer, now, now),
+                )
+                self.stores += 1
+                if self.max_entries and self.stores % 100 == 0:
+                    self._evict_locked(conn)
+        except sqlite3.Error as exc:
+            logger.error("file_id cache store failed for %s: %s", track_key, exc)
+
+    def invalidate(self, track_key: str, profile: str) -> None:
+        """Drop an entry, e.g. after Telegram rejected its file_id."""
+        try:
+            with self._lock:
+                self._connect().execute(
+                    'DELETE FROM file_ids WHERE track_key = ? AND profile = ?',
+                    (track_key, profile),
+                )
+            self.invalidations += 1
+        except sqlite3.Error as exc:
+            logger.error("file_id cache invalidation failed for %s: %s", track_key, exc)
+
+    def _evict_locked(self, conn: sqlite3.Connection) -> None:
+        pattern = PINNED_PREFIX + '%'
+        count = conn.execute('SELECT COUNT(*) FROM file_ids WHERE track_key NOT LIKE ?', (pattern,)).fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        conn.execute(
+            'DELETE FROM file_ids WHERE rowid IN '
+            '(SELECT rowid FROM file_ids WHERE track_key NOT LIKE ? ORDER BY last_used LIMIT ?)',
+            (pattern, overflow),
+        )
+        self.evictions += overflow
+        logger.info("Evicted %s least recently used entries from file_id cache.", overflow)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for logging or metrics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,119 @@
+"""Deduplication of identical in-flight jobs shared by several waiters."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+ProgressListener = Callable[[Dict], None]
+
+
+class Flight(Generic[T]):
+    """One shared job, the waiters attached to it and the progress listeners they registered."""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.listeners: List[ProgressListener] = []
+        # Serialises the follow-up work (e.g. uploads) so later waiters can reuse the first result.
+        self.lock = asyncio.Lock()
+
+    def broadcast(self, data: Dict) -> None:
+        """Progress hook for the shared job; safe to call from worker threads."""
+        for listener in tuple(self.listeners):
+            try:
+                listener(data)
+            except Exception as exc:
+                logger.debug("Progress listener for %s failed: %s", self.key, exc)
+
+    @property
+    def result(self) -> T:
+        assert self.task is not None
+        return self.task.result()
+
+
+class InflightCoalescer(Generic[T]):
+    """Run at most one job per key and fan its result out to every concurrent waiter.
+
+    The job runs in its own task; a waiter that is cancelled only detaches.
+    The job is cancelled once the last waiter has left, and ``on_release`` is
+    called with the result when nobody needs it any more.
+    """
+
+    def __init__(self, on_release: Optional[Callable[[T], None]] = None) -> None:
+        self._flights: Dict[str, Flight[T]] = {}
+        self._on_release = on_release
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _finish(self, flight: Flight[T], task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is not None:
+            # Failed jobs are not reusable; the next request starts fresh.
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            return
+        if flight.waiters == 0:
+            self._release(flight)
+
+    def _release(self, flight: Flight[T]) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        if self._on_release and flight.task is not None and flight.task.done() and not flight.task.cancelled() and flight.task.exception() is None:
+            try:
+                self._on_release(flight.task.result())
+            except Exception as exc:
+                logger.debug("Release callback for %s failed: %s", flight.key, exc)
+
+    @asynccontextmanager
+    async def join(
+        self,
+        key: str,
+        factory: Callable[[ProgressListener], Awaitable[T]],
+        listener: Optional[ProgressListener] = None,
+    ) -> AsyncIterator[Flight[T]]:
+        """Attach to the job for key, starting factory(progress_hook) if none is running."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(key)
+            flight.task = asyncio.create_task(factory(flight.broadcast))
+            flight.task.add_done_callback(lambda task, current=flight: self._finish(current, task))
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info("Joining in-flight job %s (%s waiting).", key, flight.waiters)
+
+        flight.waiters += 1
+        if listener:
+            flight.listeners.append(listener)
+        try:
+            await asyncio.shield(flight.task)
+            yield flight
+        finally:
+            flight.waiters -= 1
+            if listener in flight.listeners:
+                flight.listeners.remove(listener)
+            if flight.waiters == 0:
+                if not flight.task.done():
+                    logger.info("Last waiter left job %s, cancelling it.", key)
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                    flight.task.cancel()
+                else:
+                    self._release(flight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': len(self._flights),
+            'started': self.started,
+            'coalesced': self.coalesced,
+        }
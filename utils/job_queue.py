@@ -0,0 +1,267 @@
+"""Download job queue shared between the bot front end and worker processes."""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_until REAL,
+    progress TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)',
+    'CREATE INDEX IF NOT EXISTS jobs_user_status ON jobs (user_id, status)',
+)
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: int
+    payload: Dict
+    status: str
+    attempts: int = 0
+    worker_id: Optional[str] = None
+    progress: Optional[str] = None
+    error: Optional[str] = None
+
+
+class JobQueue(ABC):
+    """Interface for job queue backends.
+
+    Jobs are claimed with a lease that the worker renews through ``heartbeat``;
+    a job whose lease runs out (the worker died) is handed to another worker
+    until ``max_attempts`` is reached. Cancellation is cooperative: ``cancel``
+    marks the job and the worker sees it on its next heartbeat. A Redis-like
+    backend maps this onto a list per state plus a hash per job.
+    """
+
+    @abstractmethod
+    def enqueue(self, user_id: int, payload: Dict, job_id: Optional[str] = None) -> Job:
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float, progress: Optional[str] = None) -> str:
+        """Extend the lease and return the job's current status."""
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str) -> None:
+        ...
+
+    @abstractmethod
+    def cancel(self, job_id: str, user_id: int) -> Optional[str]:
+        """Cancel a queued or running job of user_id; return its previous status, or None."""
+        ...
+
+    @abstractmethod
+    def active_count(self, user_id: int) -> int:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a WAL-mode SQLite file, usable by any process on the same host."""
+
+    def __init__(self, path: str, max_attempts: int = 2, retention: float = 24 * 3600) -> None:
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.retention = retention
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Several processes write here; wait for the write lock instead of failing.
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+            for statement in _INDEXES:
+                conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        job_id, user_id, payload, status, attempts, worker_id, progress, error = row
+        return Job(
+            id=job_id,
+            user_id=user_id,
+            payload=json.loads(payload),
+            status=status,
+            attempts=attempts,
+            worker_id=worker_id,
+            progress=progress,
+            error=error,
+        )
+
+    def enqueue(self, user_id: int, payload: Dict, job_id: Optional[str] = None) -> Job:
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                'INSERT INTO jobs (id, user_id, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, user_id, json.dumps(payload), QUEUED, now, now),
+            )
+        return Job(id=job_id, user_id=user_id, payload=payload, status=QUEUED)
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Jobs of dead workers that used up their attempts are given up on.
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, updated_at = ? '
+                    'WHERE status = ? AND lease_until < ? AND attempts >= ?',
+                    (FAILED, 'worker lease expired', now, RUNNING, now, self.max_attempts),
+                )
+                row = conn.execute(
+                    'SELECT id, user_id, payload, status, attempts, worker_id, progress, error FROM jobs '
+                    'WHERE status = ? OR (status = ? AND lease_until < ?) '
+                    'ORDER BY created_at LIMIT 1',
+                    (QUEUED, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                job = self._row_to_job(row)
+                if job.status == RUNNING:
+                    logger.warning("Reclaiming job %s from worker %s after its lease expired.", job.id, job.worker_id)
+                conn.execute(
+                    'UPDATE jobs SET status = ?, worker_id = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                    (RUNNING, worker_id, now + lease_seconds, now, job.id),
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            self._claims += 1
+            if self.retention and self._claims % 500 == 0:
+                self._purge(now)
+        job.status = RUNNING
+        job.worker_id = worker_id
+        job.attempts += 1
+        return job
+
+    def _purge(self, now: float) -> None:
+        self._connect().execute(
+            'DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?',
+            (DONE, FAILED, CANCELLED, now - self.retention),
+        )
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float, progress: Optional[str] = None) -> str:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                'UPDATE jobs SET lease_until = ?, progress = COALESCE(?, progress), updated_at = ? '
+                'WHERE id = ? AND worker_id = ? AND status = ?',
+                (now + lease_seconds, progress, now, job_id, worker_id, RUNNING),
+            )
+            row = conn.execute('SELECT status, worker_id FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return CANCELLED
+        status, owner = row
+        if status == RUNNING and owner != worker_id:
+            # Another worker reclaimed the job; this one must stop.
+            return CANCELLED
+        return status
+
+    def _finish(self, job_id: str, worker_id: str, status: str, error: Optional[str]) -> None:
+        with self._lock:
+            self._connect().execute(
+                'UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? '
+                'WHERE id = ? AND worker_id = ? AND status = ?',
+                (status, error, time.time(), job_id, worker_id, RUNNING),
+            )
+
+    def complete(self, job_id: str, worker_id: str) -> None:
+        self._finish(job_id, worker_id, DONE, None)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> None:
+        self._finish(job_id, worker_id, FAILED, error[:1000])
+
+    def cancel(self, job_id: str, user_id: int) -> Optional[str]:
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT status FROM jobs WHERE id = ? AND user_id = ?', (job_id, user_id)).fetchone()
+                if row is None or row[0] not in (QUEUED, RUNNING):
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute('UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?', (CANCELLED, time.time(), job_id))
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+        return row[0]
+
+    def active_count(self, user_id: int) -> int:
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN (?, ?)',
+                (user_id, QUEUED, RUNNING),
+            ).fetchone()
+        return row[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,73 @@
+"""Per-language message bundles built once from the LANGUAGES table."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Sequence
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+@dataclass(frozen=True)
+class LanguageBundle:
+    """Everything a handler needs to answer in one language, safe to share between updates."""
+
+    code: str
+    texts: Mapping[str, str]
+    start_caption: str
+    language_keyboard: InlineKeyboardMarkup
+
+
+class Localization:
+    """Build every language's bundle up front and hand out the same read-only object afterwards.
+
+    Missing keys fall back to ``fallback`` (English), unknown or unset
+    languages get ``default``. The language keyboard is identical for every
+    language, so it is built once and shared. A dozen small dicts cost less
+    than a millisecond, so nothing is left for the first update to build.
+    """
+
+    def __init__(
+        self,
+        languages: Mapping[str, Mapping[str, str]],
+        extra_links: Mapping[str, str],
+        language_buttons: Sequence[InlineKeyboardButton],
+        default: str = 'ru',
+        fallback: str = 'en',
+        buttons_per_row: int = 2,
+    ) -> None:
+        self._languages = languages
+        self._extra_links = extra_links
+        self.default = default
+        self.fallback = fallback
+        self._keyboard = self._language_keyboard(language_buttons, buttons_per_row)
+        self._bundles: Dict[str, LanguageBundle] = {code: self._build(code) for code in languages}
+
+    def resolve(self, lang: str) -> str:
+        return lang if lang in self._languages else self.default
+
+    @staticmethod
+    def _language_keyboard(language_buttons: Sequence[InlineKeyboardButton], buttons_per_row: int) -> InlineKeyboardMarkup:
+        buttons = list(language_buttons)
+        rows: List[List[InlineKeyboardButton]] = [
+            buttons[index:index + buttons_per_row]
+            for index in range(0, len(buttons), buttons_per_row)
+        ]
+        return InlineKeyboardMarkup(rows)
+
+    def _build(self, code: str) -> LanguageBundle:
+        texts = dict(self._languages.get(self.fallback, {}))
+        texts.update(self._languages[code])
+        extra = self._extra_links.get(code, self._extra_links.get(self.fallback, ''))
+        return LanguageBundle(
+            code=code,
+            texts=MappingProxyType(texts),
+            start_caption=f"{texts.get('start', '')}\n\n{extra}",
+            language_keyboard=self._keyboard,
+        )
+
+    def bundle(self, lang: str) -> LanguageBundle:
+        return self._bundles[self.resolve(lang)]
+
+    def texts(self, lang: str) -> Mapping[str, str]:
+        return self.bundle(lang).texts
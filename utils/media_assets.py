@@ -0,0 +1,119 @@
+"""Static media the bot sends repeatedly (e.g. the /start animation), uploaded once and reused by file_id."""
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+from telegram import Message
+from telegram.error import BadRequest
+
+from utils.file_id_cache import PINNED_PREFIX, FileIdCache
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bot method suffix (send_<kind>) and the Message attribute holding the uploaded file.
+_KINDS = ('animation', 'audio', 'document', 'photo', 'video')
+
+
+@dataclass(frozen=True)
+class MediaAsset:
+    name: str
+    kind: str
+    path: str
+    # Size and mtime of the file; a replaced file gets a new upload instead of the old file_id.
+    version: str
+
+
+def _sent_file(message: Message, kind: str):
+    if kind == 'photo':
+        return message.photo[-1] if message.photo else None
+    return getattr(message, kind, None) or message.document
+
+
+class MediaAssetRegistry:
+    """Resolve asset files once, upload each on first use and send it by cached file_id afterwards.
+
+    file_ids are stored in a FileIdCache under ``asset:<name>`` with the file's
+    version as profile, so they survive restarts; the cache never evicts these
+    keys, however many tracks share the database. When Telegram rejects a
+    cached id the entry is dropped and the file is uploaded again. Concurrent
+    first sends of one asset wait for a single upload.
+    """
+
+    def __init__(self, cache: FileIdCache) -> None:
+        self.cache = cache
+        self._assets: Dict[str, MediaAsset] = {}
+        self._upload_locks: Dict[str, asyncio.Lock] = {}
+        self.uploads = 0
+        self.cached_sends = 0
+
+    def register(self, name: str, kind: str, candidates: Sequence[str]) -> Optional[MediaAsset]:
+        """Record the first existing path of candidates as asset name; return None when none exists."""
+        if kind not in _KINDS:
+            raise ValueError(f"Unsupported media kind {kind!r}")
+        for candidate in candidates:
+            path = os.path.abspath(candidate)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            asset = MediaAsset(name=name, kind=kind, path=path, version=f"{stat.st_size}:{stat.st_mtime_ns}")
+            self._assets[name] = asset
+            logger.info("Media asset %s resolved to %s.", name, path)
+            return asset
+        self._assets.pop(name, None)
+        logger.warning("Media asset %s not found in any of %s.", name, list(candidates))
+        return None
+
+    def get(self, name: str) -> Optional[MediaAsset]:
+        return self._assets.get(name)
+
+    def _cache_key(self, asset: MediaAsset) -> str:
+        return f"{PINNED_PREFIX}{asset.name}"
+
+    async def _send_cached(self, bot, chat_id: int, asset: MediaAsset, kwargs: Dict) -> Optional[Message]:
+        cached = await asyncio.to_thread(self.cache.get, self._cache_key(asset), asset.version)
+        if cached is None:
+            return None
+        try:
+            message = await getattr(bot, f'send_{asset.kind}')(chat_id=chat_id, **{asset.kind: cached.file_id}, **kwargs)
+        except BadRequest as exc:
+            logger.warning("Cached file_id for media asset %s was rejected, uploading again: %s", asset.name, exc)
+            await asyncio.to_thread(self.cache.invalidate, self._cache_key(asset), asset.version)
+            return None
+        self.cached_sends += 1
+        return message
+
+    async def send(self, bot, chat_id: int, name: str, **kwargs) -> Optional[Message]:
+        """Send asset name to chat_id; kwargs go to the matching send_* method. Return None if unknown."""
+        asset = self._assets.get(name)
+        if asset is None:
+            return None
+        message = await self._send_cached(bot, chat_id, asset, kwargs)
+        if message is not None:
+            return message
+
+        lock = self._upload_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            # Another send may have finished the upload while this one waited.
+            message = await self._send_cached(bot, chat_id, asset, kwargs)
+            if message is not None:
+                return message
+            with open(asset.path, 'rb') as fh:
+                message = await getattr(bot, f'send_{asset.kind}')(chat_id=chat_id, **{asset.kind: fh}, **kwargs)
+            self.uploads += 1
+            sent = _sent_file(message, asset.kind)
+            if sent is not None:
+                await asyncio.to_thread(
+                    self.cache.put, self._cache_key(asset), asset.version, sent.file_id, file_unique_id=sent.file_unique_id,
+                )
+        return message
+
+    def stats(self) -> Dict[str, int]:
+        return {'assets': len(self._assets), 'uploads': self.uploads, 'cached_sends': self.cached_sends}
+
+    def close(self) -> None:
+        self.cache.close()
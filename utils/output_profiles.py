@@ -0,0 +1,74 @@
+"""Output profiles: which source formats are acceptable as-is and how everything else is converted."""
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+PASSTHROUGH = 'passthrough'
+REMUX = 'remux'
+TRANSCODE = 'transcode'
+
+
+@dataclass(frozen=True)
+class OutputProfile:
+    name: str
+    # yt-dlp format selector; list acceptable codecs first so conversion is rarely needed.
+    format: str
+    # Source codecs (acodec prefixes) whose files are sent unchanged, keyed to the extension they must carry.
+    passthrough: Tuple[Tuple[str, str], ...] = ()
+    # Source codecs that only need a container change, keyed to the target extension.
+    remux: Tuple[Tuple[str, str], ...] = ()
+    bitrate: str = '128k'
+
+    def plan(self, info: Dict) -> Tuple[str, str]:
+        """Return (mode, target extension) for the downloaded format described by info."""
+        acodec = str(info.get('acodec') or '').lower()
+        ext = str(info.get('ext') or '').lower()
+        for codec, target_ext in self.passthrough:
+            if acodec.startswith(codec) and ext == target_ext:
+                return PASSTHROUGH, target_ext
+        for codec, target_ext in self.remux:
+            if acodec.startswith(codec):
+                return REMUX, target_ext
+        return TRANSCODE, 'mp3'
+
+
+PROFILES: Dict[str, OutputProfile] = {
+    # Everything becomes a 128 kbps MP3; MP3 sources (e.g. SoundCloud) are kept as they are.
+    'mp3_128': OutputProfile(
+        name='mp3_128',
+        format='bestaudio/best',
+        passthrough=(('mp3', 'mp3'),),
+    ),
+    # Prefer formats Telegram plays natively: AAC is remuxed into .m4a, MP3 is passed through,
+    # and only other codecs (Opus, Vorbis...) are transcoded to MP3.
+    'native': OutputProfile(
+        name='native',
+        format='bestaudio[acodec^=mp4a]/bestaudio[acodec=mp3]/bestaudio/best',
+        passthrough=(('mp3', 'mp3'),),
+        # YouTube serves AAC as fragmented DASH MP4; a stream-copy remux gives a regular .m4a.
+        remux=(('mp4a', 'm4a'),),
+    ),
+}
+
+DEFAULT_PROFILE = PROFILES['mp3_128']
+
+_mode_counts: Counter = Counter()
+
+
+def get_profile(name: str) -> OutputProfile:
+    """Look up a profile by name; unknown names are a configuration error, not a silent fallback."""
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown OUTPUT_PROFILE {name!r}; expected one of: {', '.join(PROFILES)}") from None
+
+
+def record_mode(mode: str) -> None:
+    _mode_counts[mode] += 1
+
+
+def mode_stats() -> Dict[str, int]:
+    """How many files were passed through, remuxed or transcoded since start."""
+    return {mode: _mode_counts[mode] for mode in (PASSTHROUGH, REMUX, TRANSCODE)}
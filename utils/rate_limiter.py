@@ -0,0 +1,164 @@
+"""Per-user rate limiting with bounded memory and optional persistence."""
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    policy TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    free_at REAL NOT NULL,
+    PRIMARY KEY (policy, key)
+)
+"""
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """Allow ``burst`` requests at once, then one more every ``interval`` seconds."""
+
+    name: str
+    burst: int
+    interval: float
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> Optional['RatePolicy']:
+        """Parse "N/S" (N requests per S seconds); an empty spec or N of 0 disables the policy."""
+        spec = (spec or '').strip()
+        if not spec:
+            return None
+        try:
+            count, seconds = spec.split('/', 1)
+            burst, period = int(count), float(seconds)
+        except ValueError:
+            raise ValueError(f"Rate limit {name!r} must look like '10/60', got {spec!r}") from None
+        if burst <= 0 or period <= 0:
+            return None
+        return cls(name=name, burst=burst, interval=period / burst)
+
+
+class RateLimiter:
+    """Token buckets stored as one timestamp per user and policy (GCRA).
+
+    For each key only the moment its bucket will be full again is kept; a
+    request is allowed while that moment is less than ``burst`` intervals
+    ahead. Entries whose bucket has refilled carry no information and are
+    swept away, and each policy keeps at most ``max_entries`` keys (least
+    recently seen ones are forgotten first). With a ``path`` the state is
+    loaded on ``load`` and written back on ``close``, so limits survive a
+    restart.
+    """
+
+    def __init__(
+        self,
+        policies: Mapping[str, Optional[RatePolicy]],
+        max_entries: int = 100_000,
+        path: Optional[str] = None,
+        sweep_interval: float = 60.0,
+    ) -> None:
+        self.policies: Dict[str, RatePolicy] = {name: policy for name, policy in policies.items() if policy is not None}
+        self.max_entries = max(1, max_entries)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._free_at: Dict[str, 'OrderedDict[int, float]'] = {name: OrderedDict() for name in self.policies}
+        self._last_sweep = time.monotonic()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def check(self, policy_name: str, key: int) -> float:
+        """Take one request from key's bucket. Return 0 if allowed, else the seconds until it would be."""
+        policy = self.policies.get(policy_name)
+        if policy is None:
+            return 0.0
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+        entries = self._free_at[policy_name]
+        free_at = max(entries.get(key, now), now)
+        new_free_at = free_at + policy.interval
+        # The bucket holds `burst` requests, i.e. it may run at most burst intervals ahead of now.
+        retry_after = new_free_at - now - policy.burst * policy.interval
+        if retry_after > 0:
+            self.rejected += 1
+            return retry_after
+        entries[key] = new_free_at
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        self.allowed += 1
+        return 0.0
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        for entries in self._free_at.values():
+            idle = [key for key, free_at in entries.items() if free_at <= now]
+            for key in idle:
+                del entries[key]
+
+    def load(self) -> None:
+        """Restore limits saved by a previous process."""
+        if not self.path:
+            return
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute(_SCHEMA)
+                rows = conn.execute('SELECT policy, key, free_at FROM rate_limits WHERE free_at > ?', (time.time(),)).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            logger.error("Could not load rate limits from %s: %s", self.path, exc)
+            return
+        # Saved as wall-clock time; the buckets run on the monotonic clock.
+        offset = time.monotonic() - time.time()
+        restored = 0
+        for policy_name, key, free_at in sorted(rows, key=lambda row: row[2]):
+            entries = self._free_at.get(policy_name)
+            if entries is not None and len(entries) < self.max_entries:
+                entries[key] = free_at + offset
+                restored += 1
+        logger.info("Restored %s rate limit entries.", restored)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        now = time.monotonic()
+        offset = time.time() - now
+        rows = [
+            (policy_name, key, free_at + offset)
+            for policy_name, entries in self._free_at.items()
+            for key, free_at in entries.items()
+            if free_at > now
+        ]
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute(_SCHEMA)
+                with conn:
+                    conn.execute('DELETE FROM rate_limits')
+                    conn.executemany('INSERT INTO rate_limits (policy, key, free_at) VALUES (?, ?, ?)', rows)
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            logger.error("Could not save rate limits to %s: %s", self.path, exc)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'tracked': sum(len(entries) for entries in self._free_at.values()),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+            'evictions': self.evictions,
+        }
+
+    def close(self) -> None:
+        self.save()
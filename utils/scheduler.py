@@ -0,0 +1,151 @@
+"""Global download scheduler with per-user round-robin fairness."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class SchedulerQueueFull(Exception):
+    """Raised when the download queue cannot accept another job."""
+
+
+class DownloadScheduler:
+    """Own the global download and transcode concurrency limits.
+
+    Download slots are handed out round-robin across users, so one user
+    queueing many links cannot starve everybody else. Transcode slots are a
+    plain semaphore because a job only asks for one after its download is done.
+    """
+
+    def __init__(self, max_downloads: int, max_transcodes: int, max_queue: int, position_interval: float = 5.0) -> None:
+        self.max_downloads = max(1, max_downloads)
+        self.max_transcodes = max(1, max_transcodes)
+        self.max_queue = max(0, max_queue)
+        self.position_interval = position_interval
+        self._queues: 'OrderedDict[int, Deque[asyncio.Future]]' = OrderedDict()
+        self._queued = 0
+        self._active_downloads = 0
+        self._active_transcodes = 0
+        self._transcode_semaphore = asyncio.Semaphore(self.max_transcodes)
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def active_downloads(self) -> int:
+        return self._active_downloads
+
+    @property
+    def active_transcodes(self) -> int:
+        return self._active_transcodes
+
+    def position(self, user_id: int, waiter: asyncio.Future) -> int:
+        """1-based place of waiter in the round-robin service order."""
+        queue = self._queues.get(user_id)
+        if not queue or waiter not in queue:
+            return 0
+        index = queue.index(waiter)
+        ahead = 0
+        before_user = True
+        for uid, other in self._queues.items():
+            if uid == user_id:
+                before_user = False
+                ahead += index
+                continue
+            ahead += min(len(other), index)
+            if before_user and len(other) > index:
+                ahead += 1
+        return ahead + 1
+
+    def _dispatch(self) -> None:
+        while self._active_downloads < self.max_downloads and self._queues:
+            user_id, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues[user_id] = queue
+            if waiter.done():
+                continue
+            self._active_downloads += 1
+            waiter.set_result(None)
+
+    def _remove_waiter(self, user_id: int, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(user_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[user_id]
+
+    async def _acquire(self, user_id: int, on_position: Optional[PositionCallback]) -> None:
+        if self._active_downloads < self.max_downloads and not self._queues:
+            self._active_downloads += 1
+            return
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            logger.warning("Download queue full (%s queued), rejecting job for user %s.", self._queued, user_id)
+            raise SchedulerQueueFull()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_id, deque()).append(waiter)
+        self._queued += 1
+        last_position = 0
+        try:
+            while not waiter.done():
+                current = self.position(user_id, waiter)
+                if on_position and current and current != last_position:
+                    last_position = current
+                    try:
+                        await on_position(current)
+                    except Exception as exc:
+                        logger.debug("Queue position callback failed: %s", exc)
+                await asyncio.wait({waiter}, timeout=self.position_interval)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_download()
+            else:
+                waiter.cancel()
+                self._remove_waiter(user_id, waiter)
+            raise
+
+    def _release_download(self) -> None:
+        self._active_downloads -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def download_slot(self, user_id: int, on_position: Optional[PositionCallback] = None) -> AsyncIterator[None]:
+        """Wait for a fair-share network download slot; raise SchedulerQueueFull if the queue is full."""
+        await self._acquire(user_id, on_position)
+        try:
+            yield
+        finally:
+            self._release_download()
+
+    @asynccontextmanager
+    async def transcode_slot(self) -> AsyncIterator[None]:
+        """Wait for one of the CPU-bound transcode slots."""
+        async with self._transcode_semaphore:
+            self._active_transcodes += 1
+            try:
+                yield
+            finally:
+                self._active_transcodes -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'active_downloads': self._active_downloads,
+            'active_transcodes': self._active_transcodes,
+            'queued': self._queued,
+            'queued_users': len(self._queues),
+            'rejected': self.rejected,
+        }
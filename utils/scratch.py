@@ -0,0 +1,270 @@
+"""Managed scratch directories for download jobs: tmpfs placement, byte quota and an orphan janitor."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JOB_DIR_PREFIX = 'job-'
+MARKER_FILE = '.job.json'
+# Tells this run apart from an earlier one that had the same pid, as in a container restarted as pid 1.
+_INSTANCE_TOKEN = uuid.uuid4().hex
+
+
+@dataclass
+class ScratchDir:
+    job_id: str
+    path: str
+    reserved: int
+    on_tmpfs: bool
+    created_at: float
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _process_started(pid: int) -> Optional[str]:
+    """Start time of pid in clock ticks since boot, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", 'r', encoding='utf-8') as fh:
+            # The command name may contain spaces; fields after it are fixed.
+            fields = fh.read().rsplit(')', 1)[1].split()
+        return fields[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+class ScratchSpace:
+    """Hand out per-job directories under a global byte quota.
+
+    Each job reserves reserve_bytes up front. Directories go to tmpfs_dir while
+    the tmpfs budget allows and spill to disk_dir afterwards; when the quota is
+    exhausted, acquire waits until another job releases its directory. Every
+    directory is named after its job and carries a marker with the owning pid,
+    a per-run token and the process start time, so the janitor can remove
+    directories left behind by killed processes even when their pid was reused.
+    """
+
+    def __init__(
+        self,
+        disk_dir: str,
+        quota_bytes: int,
+        reserve_bytes: int,
+        tmpfs_dir: Optional[str] = None,
+        tmpfs_bytes: int = 0,
+        stale_after: float = 3 * 3600,
+        sweep_interval: float = 600,
+    ) -> None:
+        self.disk_dir = disk_dir
+        self.tmpfs_dir = tmpfs_dir if tmpfs_dir and tmpfs_bytes > 0 else None
+        self.tmpfs_bytes = tmpfs_bytes if self.tmpfs_dir else 0
+        self.quota_bytes = max(0, quota_bytes)
+        self.reserve_bytes = max(0, reserve_bytes)
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        self._active: Dict[str, ScratchDir] = {}
+        self._reserved = 0
+        self._tmpfs_reserved = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._janitor: Optional[asyncio.Task] = None
+        self._waiting = 0
+        self.used_bytes = 0
+        self.swept = 0
+        self.spilled = 0
+
+    def _cond(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _fits(self, size: int) -> bool:
+        # A single job is always admitted so an undersized quota cannot wedge the bot.
+        return not self.quota_bytes or not self._active or self._reserved + size <= self.quota_bytes
+
+    def _create(self, job_id: str, size: int) -> ScratchDir:
+        on_tmpfs = bool(self.tmpfs_dir) and self._tmpfs_reserved + size <= self.tmpfs_bytes
+        if self.tmpfs_dir and not on_tmpfs:
+            self.spilled += 1
+        root = self.tmpfs_dir if on_tmpfs else self.disk_dir
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, f"{JOB_DIR_PREFIX}{job_id}")
+        suffix = 0
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(root, f"{JOB_DIR_PREFIX}{job_id}.{suffix}")
+        os.makedirs(path)
+        created_at = time.time()
+        with open(os.path.join(path, MARKER_FILE), 'w', encoding='utf-8') as fh:
+            json.dump({
+                'job_id': job_id,
+                'pid': os.getpid(),
+                'instance': _INSTANCE_TOKEN,
+                'started': _process_started(os.getpid()),
+                'created_at': created_at,
+            }, fh)
+        return ScratchDir(job_id=job_id, path=path, reserved=size, on_tmpfs=on_tmpfs, created_at=created_at)
+
+    async def acquire(self, job_id: str) -> ScratchDir:
+        """Wait for quota, then create and return the tagged directory for job_id."""
+        size = self.reserve_bytes
+        condition = self._cond()
+        async with condition:
+            self._waiting += 1
+            try:
+                await condition.wait_for(lambda: self._fits(size))
+            finally:
+                self._waiting -= 1
+            scratch = self._create(job_id, size)
+            self._active[scratch.path] = scratch
+            self._reserved += size
+            if scratch.on_tmpfs:
+                self._tmpfs_reserved += size
+        logger.debug("Scratch directory %s acquired for job %s.", scratch.path, job_id)
+        return scratch
+
+    def release(self, path: Optional[str]) -> None:
+        """Remove a job directory and return its reservation to the quota."""
+        if not path:
+            return
+        shutil.rmtree(path, ignore_errors=True)
+        scratch = self._active.pop(path, None)
+        if scratch is None:
+            return
+        self._reserved -= scratch.reserved
+        if scratch.on_tmpfs:
+            self._tmpfs_reserved -= scratch.reserved
+        if self._condition is not None:
+            asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self) -> None:
+        condition = self._cond()
+        async with condition:
+            condition.notify_all()
+
+    def _is_orphan(self, path: str, now: float) -> bool:
+        try:
+            with open(os.path.join(path, MARKER_FILE), 'r', encoding='utf-8') as fh:
+                marker = json.load(fh)
+            pid = int(marker.get('pid') or 0)
+            created_at = float(marker.get('created_at') or 0)
+            instance = marker.get('instance')
+            started = marker.get('started')
+        except (OSError, ValueError, TypeError, AttributeError):
+            # No readable marker: fall back to the directory age.
+            try:
+                created_at = os.stat(path).st_mtime
+            except OSError:
+                return False
+            return now - created_at > self.stale_after
+        if pid == os.getpid():
+            if instance != _INSTANCE_TOKEN:
+                # Left by an earlier run that was given the same pid.
+                return True
+            return path not in self._active and now - created_at > self.stale_after
+        if not _pid_alive(pid):
+            return True
+        if started is not None and _process_started(pid) not in (None, started):
+            # The pid now belongs to a different process.
+            return True
+        return now - created_at > self.stale_after
+
+    def sweep(self) -> int:
+        """Delete orphaned job directories and refresh the measured disk usage."""
+        now = time.time()
+        removed = 0
+        used = 0
+        for root in filter(None, {self.disk_dir, self.tmpfs_dir}):
+            try:
+                entries: List[os.DirEntry] = [
+                    entry for entry in os.scandir(root)
+                    if entry.name.startswith(JOB_DIR_PREFIX) and entry.is_dir(follow_symlinks=False)
+                ]
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.path not in self._active and self._is_orphan(entry.path, now):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+                    continue
+                used += _tree_size(entry.path)
+        self.used_bytes = used
+        self.swept += removed
+        if removed:
+            logger.info("Scratch janitor removed %s orphaned job directories.", removed)
+        if self.quota_bytes and used > self.quota_bytes:
+            logger.warning("Scratch usage %s bytes exceeds the %s byte quota.", used, self.quota_bytes)
+        return removed
+
+    async def _janitor_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+                logger.info("Scratch space stats: %s", self.stats())
+            except Exception as exc:
+                logger.error("Scratch janitor failed: %s", exc)
+
+    async def start(self) -> None:
+        """Sweep leftovers from previous runs and start the periodic janitor."""
+        await asyncio.to_thread(self.sweep)
+        if self.sweep_interval > 0 and (self._janitor is None or self._janitor.done()):
+            self._janitor = asyncio.create_task(self._janitor_loop())
+
+    async def close(self) -> None:
+        if self._janitor is not None:
+            self._janitor.cancel()
+            self._janitor = None
+        for path in list(self._active):
+            self.release(path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'active_jobs': len(self._active),
+            'waiting_jobs': self._waiting,
+            'reserved_bytes': self._reserved,
+            'tmpfs_reserved_bytes': self._tmpfs_reserved,
+            'used_bytes': self.used_bytes,
+            'quota_bytes': self.quota_bytes,
+            'spilled': self.spilled,
+            'swept': self.swept,
+        }
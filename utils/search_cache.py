@@ -0,0 +1,117 @@
+"""In-memory TTL/LRU cache for search results."""
+from __future__ import annotations
+
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Only the fields the handlers read when rendering and resolving a result are kept.
+_COMPACT_FIELDS = ('id', 'url', 'webpage_url', 'title', 'artist', 'uploader', 'channel', 'duration')
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, unicode compatibility forms and whitespace so equivalent queries share a key."""
+    folded = unicodedata.normalize('NFKC', query).casefold()
+    return ' '.join(folded.split())
+
+
+def compact_entry(entry: Dict) -> Dict:
+    return {key: entry[key] for key in _COMPACT_FIELDS if entry.get(key) is not None}
+
+
+def approximate_size(key: str, results: Tuple[Dict, ...]) -> int:
+    """Rough memory footprint of a cache entry in bytes: string lengths plus a fixed cost per object."""
+    size = 200 + len(key)
+    for item in results:
+        size += 250 + sum(60 + len(str(value)) for value in item.values())
+    return size
+
+
+@dataclass
+class _CacheEntry:
+    results: Tuple[Dict, ...]
+    fresh_until: float
+    stale_until: float
+    size: int
+
+
+class SearchCache:
+    """Bounded LRU of search results with TTLs, negative caching and a stale window.
+
+    Entries past their TTL are still returned (flagged as stale) until
+    ``stale_ttl`` more seconds pass, so callers can answer immediately and
+    refresh in the background.
+
+    The cache is bounded both by entry count and by ``max_bytes`` of
+    approximate entry size (0 disables the byte bound), so a run of queries
+    with unusually long titles cannot grow it past its budget.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float, stale_ttl: float, max_bytes: int = 0) -> None:
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._entries: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[Optional[List[Dict]], bool]:
+        """Return (results, is_stale); results is None on a miss."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry.stale_until <= now:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(key)
+        if entry.fresh_until <= now:
+            self.stale_hits += 1
+            return list(entry.results), True
+        self.hits += 1
+        return list(entry.results), False
+
+    def put(self, key: str, results: List[Dict]) -> None:
+        ttl = self.ttl if results else self.negative_ttl
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        compacted = tuple(compact_entry(item) for item in results)
+        if key in self._entries:
+            self._drop(key)
+        entry = _CacheEntry(
+            results=compacted,
+            fresh_until=now + ttl,
+            stale_until=now + ttl + (self.stale_ttl if results else 0),
+            size=approximate_size(key, compacted),
+        )
+        self._entries[key] = entry
+        self._bytes += entry.size
+        # The newest entry is kept even if it alone exceeds max_bytes.
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,335 @@
+"""Outbound Bot API dispatcher that respects Telegram's flood limits and prioritises results."""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from utils.logger import get_logger
+from utils.rate_limiter import RatePolicy
+from utils.status_updater import retry_after_seconds
+
+logger = get_logger(__name__)
+
+# Lower numbers are sent first when requests have to wait. Pass one as rate_limiter_args to override.
+PRIORITY_RESULT = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_PROGRESS = 2
+_RESULT_ENDPOINTS = frozenset({'sendAudio', 'sendDocument', 'sendAnimation', 'sendVideo', 'sendPhoto', 'sendVoice'})
+_EDIT_ENDPOINTS = frozenset({'editMessageText', 'editMessageCaption', 'editMessageReplyMarkup'})
+# Only requests that put something into a chat count towards the flood limits.
+_LIMITED_PREFIXES = ('send', 'edit', 'copyMessage', 'forwardMessage')
+_SUPERSEDED = object()
+_SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS send_lanes (
+    lane TEXT PRIMARY KEY,
+    free_at REAL NOT NULL
+)
+"""
+
+JSONResult = Union[bool, Dict[str, Any], List[Dict[str, Any]]]
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'future', 'enqueued_at')
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class SharedSendBudget:
+    """Lane state in a SQLite file, so the bot and its workers draw on the same flood limits.
+
+    Holds one GCRA timestamp per lane (wall clock, since it crosses
+    processes). A token is only taken when it is available, so a process
+    that has to wait keeps its requests in its own priority queue and asks
+    again later.
+
+    ``take`` runs on the event loop, so it never waits for the database
+    lock: while another process holds it, the caller is told to ask again
+    after ``busy_retry`` seconds.
+    """
+
+    def __init__(self, path: str, sweep_every: int = 1000, busy_retry: float = 0.005) -> None:
+        self.path = path
+        self.sweep_every = sweep_every
+        self.busy_retry = busy_retry
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._takes = 0
+        self.contended = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Rate state only: losing the last writes in a crash just loosens the limits for a moment.
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(_SHARED_SCHEMA)
+            # Setup may wait once for another process's schema setup; takes never wait.
+            conn.execute('PRAGMA busy_timeout=0')
+            self._conn = conn
+        return self._conn
+
+    def take(self, lane: str, policy: RatePolicy) -> float:
+        """Take a token of lane if one is free and return 0, else return the seconds until one is."""
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+            except sqlite3.OperationalError as exc:
+                if exc.sqlite_errorcode != sqlite3.SQLITE_BUSY:
+                    raise
+                # Another process is taking a token right now; its transaction lasts microseconds.
+                self.contended += 1
+                return self.busy_retry
+            try:
+                row = conn.execute('SELECT free_at FROM send_lanes WHERE lane = ?', (lane,)).fetchone()
+                free_at = max(row[0] if row else now, now)
+                wait = free_at + policy.interval - now - policy.burst * policy.interval
+                if wait <= 0:
+                    conn.execute('INSERT OR REPLACE INTO send_lanes (lane, free_at) VALUES (?, ?)', (lane, free_at + policy.interval))
+                self._takes += 1
+                if self._takes % self.sweep_every == 0:
+                    # Lanes whose bucket refilled carry no information.
+                    conn.execute('DELETE FROM send_lanes WHERE free_at < ?', (now,))
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+        return max(wait, 0.0)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Lane:
+    """A token bucket (one timestamp, as in RateLimiter) with a priority queue of waiting requests.
+
+    Without a policy the lane only enforces RetryAfter pauses. With a shared
+    budget the bucket lives there under ``key`` instead of in ``free_at``.
+    """
+
+    def __init__(self, policy: Optional[RatePolicy], shared: Optional[SharedSendBudget] = None, key: str = '') -> None:
+        self.policy = policy
+        self.shared = shared if policy is not None else None
+        self.key = key
+        self.free_at = 0.0
+        self.blocked_until = 0.0
+        self.waiters: List[_Waiter] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def _local_delay(self, now: float) -> float:
+        free_at = max(self.free_at, now)
+        return free_at + self.policy.interval - now - self.policy.burst * self.policy.interval
+
+    def take(self, now: float) -> float:
+        """Take a token and return 0, or return the seconds until the next request may go out."""
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.policy is None:
+            return 0.0
+        if self.shared is not None:
+            try:
+                return self.shared.take(self.key, self.policy)
+            except sqlite3.Error as exc:
+                logger.error("Shared send budget unavailable, limiting %s in this process only: %s", self.key, exc)
+        delay = self._local_delay(now)
+        if delay > 0:
+            return delay
+        self.free_at = max(self.free_at, now) + self.policy.interval
+        return 0.0
+
+    def idle(self, now: float) -> bool:
+        return not self.waiters and self.free_at <= now and self.blocked_until <= now
+
+
+class SendQueue(BaseRateLimiter[int]):
+    """Rate limiter for ExtBot that queues requests instead of letting Telegram answer 429.
+
+    Every message-posting request passes a per-chat lane (``private`` or
+    ``group`` policy by chat type) and then the bot-wide ``global`` lane.
+    Waiting requests leave in priority order: uploaded results, then
+    replies, then status edits. A newer edit of a message replaces an older
+    one that is still waiting (the older call returns True without being
+    sent). ``RetryAfter`` pauses the affected lane for the advised delay and
+    the request is retried up to ``max_retries`` times.
+
+    The limits apply to this process only, unless a ``shared`` budget is
+    given: then every process using the same file draws on one set of lanes.
+    """
+
+    def __init__(
+        self,
+        global_policy: Optional[RatePolicy],
+        private_policy: Optional[RatePolicy],
+        group_policy: Optional[RatePolicy],
+        max_retries: int = 3,
+        sweep_interval: float = 60.0,
+        shared: Optional[SharedSendBudget] = None,
+    ) -> None:
+        self.shared = shared
+        self.private_policy = private_policy
+        self.group_policy = group_policy
+        self.max_retries = max_retries
+        self.sweep_interval = sweep_interval
+        self._global = _Lane(global_policy, shared, 'global')
+        self._chats: Dict[Union[int, str], _Lane] = {}
+        self._edits: Dict[Tuple[Any, Any], _Waiter] = {}
+        self._seq = itertools.count()
+        self._last_sweep = time.monotonic()
+        self.sent = 0
+        self.superseded = 0
+        self.retries = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        for lane in [self._global, *self._chats.values()]:
+            if lane.timer is not None:
+                lane.timer.cancel()
+                lane.timer = None
+        if self.shared is not None:
+            self.shared.close()
+
+    def _chat_lane(self, chat_id: Union[int, str]) -> _Lane:
+        lane = self._chats.get(chat_id)
+        if lane is None:
+            # Private chats have positive ids; groups, supergroups and @channel names use the group limit.
+            private = isinstance(chat_id, int) and chat_id > 0
+            lane = self._chats[chat_id] = _Lane(self.private_policy if private else self.group_policy, self.shared, f"chat:{chat_id}")
+        return lane
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        for chat_id in [chat_id for chat_id, lane in self._chats.items() if lane.idle(now)]:
+            del self._chats[chat_id]
+
+    def _dispatch(self, lane: _Lane) -> None:
+        lane.timer = None
+        now = time.monotonic()
+        while lane.waiters:
+            waiter = lane.waiters[0]
+            if waiter.future.done():
+                heapq.heappop(lane.waiters)
+                continue
+            delay = lane.take(now)
+            if delay > 0:
+                lane.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, lane)
+                return
+            heapq.heappop(lane.waiters)
+            waiter.future.set_result(True)
+
+    async def _acquire(self, lane: _Lane, priority: int, edit_key: Optional[Tuple[Any, Any]] = None) -> bool:
+        """Wait for a token of lane; return False if a newer edit of the same message replaced this one."""
+        now = time.monotonic()
+        if not lane.waiters and lane.take(now) == 0:
+            return True
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        if edit_key is not None:
+            previous = self._edits.get(edit_key)
+            if previous is not None and not previous.future.done():
+                previous.future.set_result(_SUPERSEDED)
+            self._edits[edit_key] = waiter
+        heapq.heappush(lane.waiters, waiter)
+        if lane.timer is None:
+            self._dispatch(lane)
+        try:
+            outcome = await waiter.future
+        finally:
+            if edit_key is not None and self._edits.get(edit_key) is waiter:
+                del self._edits[edit_key]
+        waited = time.monotonic() - waiter.enqueued_at
+        self.waited += 1
+        self.wait_seconds += waited
+        self.max_wait = max(self.max_wait, waited)
+        return outcome is not _SUPERSEDED
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> JSONResult:
+        chat_id = data.get('chat_id')
+        if not endpoint.startswith(_LIMITED_PREFIXES):
+            chat_id = None
+        if rate_limit_args is not None:
+            priority = rate_limit_args
+        elif endpoint in _RESULT_ENDPOINTS:
+            priority = PRIORITY_RESULT
+        elif endpoint in _EDIT_ENDPOINTS:
+            priority = PRIORITY_PROGRESS
+        else:
+            priority = PRIORITY_INTERACTIVE
+        edit_key = (chat_id, data.get('message_id')) if endpoint in _EDIT_ENDPOINTS and chat_id is not None else None
+
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+        attempt = 0
+        while True:
+            chat_lane = self._chat_lane(chat_id) if chat_id is not None else None
+            if chat_lane is not None:
+                if not await self._acquire(chat_lane, priority, edit_key):
+                    self.superseded += 1
+                    return True
+                await self._acquire(self._global, priority)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                wait = retry_after_seconds(exc)
+                self.retries += 1
+                logger.warning("Telegram asked to slow down %s in chat %s for %ss (attempt %s).", endpoint, chat_id, wait, attempt)
+                lane = chat_lane or self._global
+                lane.blocked_until = max(lane.blocked_until, time.monotonic() + wait)
+                if chat_lane is None:
+                    await asyncio.sleep(wait)
+                # A retry goes ahead of everything else waiting in its lane.
+                priority = PRIORITY_RESULT - 1
+                continue
+            self.sent += 1
+            return result
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        waiting = sum(1 for waiter in self._global.waiters if not waiter.future.done())
+        waiting += sum(1 for lane in self._chats.values() for waiter in lane.waiters if not waiter.future.done())
+        return {
+            'queued': waiting,
+            'chats': len(self._chats),
+            'sent': self.sent,
+            'superseded': self.superseded,
+            'retries': self.retries,
+            'waited': self.waited,
+            'wait_seconds_total': round(self.wait_seconds, 3),
+            'wait_seconds_max': round(self.max_wait, 3),
+        }
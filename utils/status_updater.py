@@ -0,0 +1,121 @@
+"""Rate-limited, coalescing editor for a single Telegram status message."""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from telegram.error import BadRequest, RetryAfter
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+EditCallable = Callable[[str, Any], Awaitable[Any]]
+
+
+def retry_after_seconds(exc: RetryAfter) -> float:
+    """Return RetryAfter.retry_after as seconds regardless of the library version."""
+    value = exc.retry_after
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class StatusUpdater:
+    """Keep only the latest requested text for a message and edit it at a bounded rate.
+
+    ``set`` may be called from any thread (yt-dlp progress hooks run in worker
+    threads); it only stores the state and wakes the flusher task on the event
+    loop. Identical texts are never sent twice and ``RetryAfter`` pauses edits
+    for the advised delay.
+    """
+
+    def __init__(self, edit: EditCallable, loop: asyncio.AbstractEventLoop, interval: float) -> None:
+        self._edit = edit
+        self._loop = loop
+        self.interval = interval
+        self._pending: Optional[Tuple[str, Any]] = None
+        self._sent: Optional[Tuple[str, Any]] = None
+        self._next_allowed = 0.0
+        self._retry_until = 0.0
+        self._flusher: Optional[asyncio.Task] = None
+        self._wake_scheduled = False
+        self._closed = False
+        self.requested = 0
+        self.edits = 0
+
+    def set(self, text: str, reply_markup: Any = None) -> None:
+        """Record the latest desired state; thread-safe and non-blocking."""
+        if self._closed:
+            return
+        self.requested += 1
+        self._pending = (text, reply_markup)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wake()
+        elif not self._wake_scheduled:
+            # Progress hooks can fire hundreds of times a second; wake the loop once per burst.
+            self._wake_scheduled = True
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        self._wake_scheduled = False
+        if self._closed or (self._flusher and not self._flusher.done()):
+            return
+        self._flusher = self._loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._pending is not None and not self._closed:
+            delay = self._next_allowed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._send_pending()
+
+    async def _send_pending(self) -> None:
+        state, self._pending = self._pending, None
+        if state is None or state == self._sent:
+            return
+        text, reply_markup = state
+        try:
+            await self._edit(text, reply_markup)
+            self._sent = state
+            self.edits += 1
+            self._next_allowed = time.monotonic() + self.interval
+        except RetryAfter as exc:
+            wait = retry_after_seconds(exc)
+            logger.debug("Status edit throttled by Telegram for %ss.", wait)
+            self._retry_until = time.monotonic() + wait
+            self._next_allowed = max(self._next_allowed, self._retry_until)
+            if self._pending is None:
+                self._pending = state
+        except BadRequest as exc:
+            # "Message is not modified" and friends: treat as delivered.
+            self._sent = state
+            self._next_allowed = time.monotonic() + self.interval
+            logger.debug("Could not edit status message: %s", exc)
+        except Exception as exc:
+            self._next_allowed = time.monotonic() + self.interval
+            logger.debug("Could not edit status message: %s", exc)
+
+    async def finish(self, text: str, reply_markup: Any = None) -> None:
+        """Send a final state right away (after any RetryAfter pause) and stop further edits."""
+        self._closed = True
+        if self._flusher and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        self._pending = (text, reply_markup)
+        for _ in range(3):
+            delay = self._retry_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._send_pending()
+            if self._pending is None:
+                break
@@ -0,0 +1,112 @@
+"""Cached channel-subscription checks for the required-channels gate."""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SUBSCRIBED_STATUSES = frozenset({"member", "administrator", "creator"})
+
+_Key = Tuple[int, str]
+
+
+def _normalize_channel(channel: str) -> str:
+    return str(channel).lstrip('@').lower()
+
+
+class SubscriptionCache:
+    """Remember get_chat_member results per (user, channel) with separate TTLs.
+
+    Positive entries past their TTL are still honoured for one more TTL while
+    a background refresh runs, so subscribed users never wait on the Bot API.
+    Negative entries are short-lived and are cleared by chat_member updates.
+    """
+
+    def __init__(self, channels: Sequence[str], positive_ttl: float, negative_ttl: float, fail_open: bool, max_entries: int = 100_000) -> None:
+        self.channels = list(channels)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.fail_open = fail_open
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[_Key, Tuple[bool, float]]' = OrderedDict()
+        self._refreshing: Dict[_Key, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _store(self, key: _Key, subscribed: bool) -> None:
+        self._entries[key] = (subscribed, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _fetch(self, user_id: int, channel: str, bot) -> Optional[bool]:
+        key = (user_id, _normalize_channel(channel))
+        try:
+            member = await bot.get_chat_member(channel, user_id)
+        except Exception as exc:
+            self.errors += 1
+            logger.error("Error checking subscription for user %s in %s: %s", user_id, channel, exc)
+            return None
+        subscribed = member.status in SUBSCRIBED_STATUSES
+        self._store(key, subscribed)
+        if not subscribed:
+            logger.info("User %s is not subscribed to %s", user_id, channel)
+        return subscribed
+
+    def _fetch_shared(self, user_id: int, channel: str, bot) -> asyncio.Task:
+        key = (user_id, _normalize_channel(channel))
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(user_id, channel, bot))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _task: self._refreshing.pop(key, None))
+        return task
+
+    async def _check_channel(self, user_id: int, channel: str, bot) -> bool:
+        key = (user_id, _normalize_channel(channel))
+        entry = self._entries.get(key)
+        if entry is not None:
+            subscribed, checked_at = entry
+            age = time.monotonic() - checked_at
+            ttl = self.positive_ttl if subscribed else self.negative_ttl
+            if age < ttl:
+                self.hits += 1
+                return subscribed
+            if subscribed and age < 2 * ttl:
+                self.hits += 1
+                self._fetch_shared(user_id, channel, bot)
+                return True
+
+        self.misses += 1
+        result = await asyncio.shield(self._fetch_shared(user_id, channel, bot))
+        if result is None:
+            if entry is not None:
+                return entry[0]
+            return self.fail_open
+        return result
+
+    async def is_subscribed(self, user_id: int, bot) -> bool:
+        for channel in self.channels:
+            if not await self._check_channel(user_id, channel, bot):
+                return False
+        return True
+
+    def apply_member_update(self, user_id: int, channel: str, status: str) -> None:
+        """Record a membership change pushed by a chat_member update."""
+        key = (user_id, _normalize_channel(channel))
+        if not any(_normalize_channel(required) == key[1] for required in self.channels):
+            return
+        self._store(key, status in SUBSCRIBED_STATUSES)
+
+    def invalidate(self, user_id: int) -> None:
+        for channel in self.channels:
+            self._entries.pop((user_id, _normalize_channel(channel)), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
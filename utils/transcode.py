@@ -0,0 +1,137 @@
+"""Asynchronous ffmpeg helpers for converting downloaded audio."""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranscodeError(Exception):
+    """Raised when ffmpeg exits with a non-zero status."""
+
+
+async def run_ffmpeg(args: List[str], ffmpeg_path: Optional[str]) -> None:
+    """Run ffmpeg with args, killing the child process if the calling task is cancelled."""
+    cmd = [ffmpeg_path or 'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', *args]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        message = (stderr or b'').decode('utf-8', errors='replace').strip()[-500:]
+        raise TranscodeError(f"ffmpeg exited with {process.returncode}: {message}")
+
+
+async def transcode_to_mp3(source_path: str, ffmpeg_path: Optional[str], bitrate: str = '128k') -> str:
+    """Encode source_path to an MP3 next to it, remove the source and return the new path."""
+    stem, ext = os.path.splitext(source_path)
+    target_path = f"{stem}.mp3"
+    if ext.lower() == '.mp3':
+        target_path = f"{stem}.transcoded.mp3"
+    await run_ffmpeg(['-i', source_path, '-vn', '-c:a', 'libmp3lame', '-b:a', bitrate, target_path], ffmpeg_path)
+    try:
+        os.remove(source_path)
+    except OSError as exc:
+        logger.debug("Could not remove transcode source %s: %s", source_path, exc)
+    return target_path
+
+
+async def remux_audio(source_path: str, target_ext: str, ffmpeg_path: Optional[str]) -> str:
+    """Copy the audio stream of source_path into a new container without re-encoding."""
+    stem, ext = os.path.splitext(source_path)
+    target_path = f"{stem}.{target_ext}"
+    if ext.lower() == f".{target_ext}":
+        target_path = f"{stem}.remuxed.{target_ext}"
+    await run_ffmpeg(['-i', source_path, '-vn', '-c:a', 'copy', '-movflags', '+faststart', target_path], ffmpeg_path)
+    try:
+        os.remove(source_path)
+    except OSError as exc:
+        logger.debug("Could not remove remux source %s: %s", source_path, exc)
+    return target_path
+
+
+StreamProgress = Callable[[int, Optional[int], float], None]
+
+
+async def _feed(process: asyncio.subprocess.Process, client: httpx.AsyncClient, url: str, headers: Dict[str, str], total_size: Optional[int], chunk_size: Optional[int], progress: Optional[StreamProgress]) -> None:
+    assert process.stdin is not None
+    downloaded = 0
+    started = time.monotonic()
+    # Large ranged requests avoid the per-connection throttling some hosts apply to open-ended GETs.
+    ranged = bool(total_size and chunk_size)
+    while True:
+        request_headers = dict(headers)
+        if ranged:
+            end = min(downloaded + chunk_size, total_size) - 1
+            request_headers['Range'] = f'bytes={downloaded}-{end}'
+        async with client.stream('GET', url, headers=request_headers) as response:
+            response.raise_for_status()
+            if ranged and response.status_code != 206:
+                if downloaded:
+                    raise httpx.HTTPError(f"server ignored Range request at byte {downloaded}")
+                ranged = False
+            async for chunk in response.aiter_bytes():
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+                downloaded += len(chunk)
+                if progress:
+                    elapsed = time.monotonic() - started
+                    progress(downloaded, total_size, downloaded / elapsed if elapsed > 0 else 0.0)
+        if not ranged or downloaded >= total_size:
+            break
+    process.stdin.close()
+
+
+async def stream_to_mp3(
+    url: str,
+    headers: Dict[str, str],
+    target_path: str,
+    ffmpeg_path: Optional[str],
+    total_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    progress: Optional[StreamProgress] = None,
+    bitrate: str = '128k',
+) -> None:
+    """Download url and pipe it straight into an ffmpeg MP3 encoder, overlapping network and CPU work."""
+    cmd = [ffmpeg_path or 'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', 'pipe:0', '-vn', '-c:a', 'libmp3lame', '-b:a', bitrate, target_path]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_task = asyncio.create_task(process.stderr.read())
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0), follow_redirects=True) as client:
+            feeder = asyncio.create_task(_feed(process, client, url, headers, total_size, chunk_size, progress))
+            try:
+                await feeder
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg gave up on the input; its exit status below carries the reason.
+                pass
+            stderr = await stderr_task
+            await process.wait()
+    except BaseException:
+        stderr_task.cancel()
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        message = (stderr or b'').decode('utf-8', errors='replace').strip()[-500:]
+        raise TranscodeError(f"ffmpeg exited with {process.returncode}: {message}")
@@ -0,0 +1,154 @@
+"""Persistent per-user preferences (currently the interface language)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class UserPreferenceStore(ABC):
+    """Interface for preference backends.
+
+    ``get`` and ``set`` run on the event loop, so they must be O(1) and must
+    not touch disk; durability is provided by ``flush``, which implementations
+    run in the background and on ``close``.
+    """
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, user_id: int, lang: str) -> None:
+        ...
+
+    @abstractmethod
+    async def flush(self) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class SQLiteUserStore(UserPreferenceStore):
+    """WAL-mode SQLite table of user_id -> language with batched, off-loop writes.
+
+    Every row is loaded into memory when the store opens, so lookups never wait
+    for the database lock held by a batch write. One entry per user who ever
+    picked a language is small next to the rest of the process.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS user_prefs ('
+            'user_id INTEGER PRIMARY KEY, lang TEXT NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, migrated_at REAL NOT NULL)')
+        self._lock = threading.Lock()
+        self._langs: Dict[int, str] = dict(self._conn.execute('SELECT user_id, lang FROM user_prefs'))
+        self._dirty: Dict[int, str] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def get(self, user_id: int) -> Optional[str]:
+        return self._langs.get(user_id)
+
+    def set(self, user_id: int, lang: str) -> None:
+        self._langs[user_id] = lang
+        self._dirty[user_id] = lang
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_dirty()
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        # Batch every change made within one interval into a single transaction.
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _write_dirty(self) -> None:
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute('BEGIN')
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO user_prefs (user_id, lang, updated_at) VALUES (?, ?, ?)',
+                    [(user_id, lang, now) for user_id, lang in batch.items()],
+                )
+                self._conn.execute('COMMIT')
+        except sqlite3.Error as exc:
+            logger.error("Failed to persist %s user preferences: %s", len(batch), exc)
+            with self._lock:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+            for user_id, lang in batch.items():
+                self._dirty.setdefault(user_id, lang)
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._write_dirty)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM user_prefs').fetchone()[0]
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """Import a legacy user_languages.json once; the import is recorded here and the file left alone."""
+        name = f"json:{os.path.basename(json_path)}"
+        with self._lock:
+            done = self._conn.execute('SELECT 1 FROM migrations WHERE name = ?', (name,)).fetchone()
+        if done or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as fh:
+                loaded = json.load(fh)
+        except (OSError, json.JSONDecodeError) as exc:
+            logger.warning("Could not read legacy %s for migration: %s", json_path, exc)
+            return 0
+        rows = []
+        if isinstance(loaded, dict):
+            now = time.time()
+            rows = [(int(user_id), str(lang), now) for user_id, lang in loaded.items()]
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                # Existing rows are newer than the legacy file, so they win.
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO user_prefs (user_id, lang, updated_at) VALUES (?, ?, ?)',
+                    rows,
+                )
+                self._conn.execute('INSERT INTO migrations (name, migrated_at) VALUES (?, ?)', (name, time.time()))
+                self._conn.execute('COMMIT')
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+        for user_id, lang, _ in rows:
+            self._langs.setdefault(user_id, lang)
+        logger.info("Migrated %s user language entries from %s.", len(rows), json_path)
+        return len(rows)
+
+    def close(self) -> None:
+        if self._flusher and not self._flusher.done():
+            self._flusher.cancel()
+        self._write_dirty()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,146 @@
+"""Pool of warm, preconfigured YoutubeDL instances shared by searches and downloads."""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, DefaultDict, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+logger = get_logger(__name__)
+
+ProgressHook = Callable[[Dict], None]
+# Options that are rebound for every checkout rather than fixed per instance.
+_PER_JOB_OPTIONS = ('paths', 'progress_hooks')
+
+
+def _fingerprint(opts: Dict) -> str:
+    return repr(sorted((key, repr(value)) for key, value in opts.items() if key not in _PER_JOB_OPTIONS))
+
+
+class PooledYoutubeDL:
+    """A YoutubeDL plus the bookkeeping needed to bind it to one job at a time."""
+
+    def __init__(self, key: Tuple[str, str], ydl: yt_dlp.YoutubeDL) -> None:
+        self.key = key
+        self.ydl = ydl
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.hook: Optional[ProgressHook] = None
+        # One permanent hook that forwards to whichever job holds the instance.
+        ydl.add_progress_hook(self._dispatch)
+
+    def _dispatch(self, data: Dict) -> None:
+        hook = self.hook
+        if hook is not None:
+            hook(data)
+
+
+class YoutubeDLPool:
+    """Check out YoutubeDL instances per option profile instead of building one per call.
+
+    Building a YoutubeDL processes every option, loads the cookie file and
+    starts with no extractor instances; a pooled one has all of that done.
+    Instances are keyed by profile name and option fingerprint, are used by
+    one job at a time, get that job's output directory and progress hook on
+    checkout, and are closed (saving cookies) after max_uses jobs or max_age
+    seconds.
+    """
+
+    def __init__(self, max_idle_per_key: int = 4, max_uses: int = 200, max_age: float = 3600.0) -> None:
+        self.max_idle_per_key = max(0, max_idle_per_key)
+        self.max_uses = max(1, max_uses)
+        self.max_age = max_age
+        self._idle: DefaultDict[Tuple[str, str], List[PooledYoutubeDL]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+
+    def _expired(self, pooled: PooledYoutubeDL) -> bool:
+        return pooled.uses >= self.max_uses or time.monotonic() - pooled.created_at > self.max_age
+
+    def _close(self, pooled: PooledYoutubeDL) -> None:
+        try:
+            pooled.ydl.close()
+        except Exception as exc:
+            logger.debug("Closing pooled YoutubeDL failed: %s", exc)
+
+    def acquire(self, profile: str, opts: Dict, progress_hook: Optional[ProgressHook] = None) -> PooledYoutubeDL:
+        """Take an idle instance configured with opts (or build one) and bind it to the calling job."""
+        key = (profile, _fingerprint(opts))
+        stale: List[PooledYoutubeDL] = []
+        pooled: Optional[PooledYoutubeDL] = None
+        with self._lock:
+            idle = self._idle[key]
+            while idle:
+                candidate = idle.pop()
+                if self._expired(candidate):
+                    stale.append(candidate)
+                    continue
+                pooled = candidate
+                break
+        for candidate in stale:
+            self.recycled += 1
+            self._close(candidate)
+        if pooled is None:
+            import yt_dlp
+
+            base_opts = {k: v for k, v in opts.items() if k != 'progress_hooks'}
+            pooled = PooledYoutubeDL(key, yt_dlp.YoutubeDL(base_opts))
+            self.created += 1
+        else:
+            self.reused += 1
+        # 'paths' is read on every download, so one instance can serve jobs with different directories.
+        pooled.ydl.params['paths'] = dict(opts.get('paths') or {})
+        pooled.hook = progress_hook
+        return pooled
+
+    def release(self, pooled: PooledYoutubeDL, reusable: bool = True) -> None:
+        pooled.hook = None
+        pooled.uses += 1
+        if reusable and not self._expired(pooled):
+            with self._lock:
+                idle = self._idle[pooled.key]
+                if len(idle) < self.max_idle_per_key:
+                    idle.append(pooled)
+                    return
+        else:
+            self.recycled += 1
+        self._close(pooled)
+
+    @contextmanager
+    def checkout(self, profile: str, opts: Dict, progress_hook: Optional[ProgressHook] = None) -> Iterator[yt_dlp.YoutubeDL]:
+        """Borrow an instance for the duration of a with block."""
+        from yt_dlp.utils import YoutubeDLError
+
+        pooled = self.acquire(profile, opts, progress_hook)
+        reusable = False
+        try:
+            yield pooled.ydl
+            reusable = True
+        except YoutubeDLError:
+            # Extraction and download errors leave the instance usable.
+            reusable = True
+            raise
+        finally:
+            # Anything else may have left half-finished state behind; do not hand the instance on.
+            self.release(pooled, reusable)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            idle = sum(len(instances) for instances in self._idle.values())
+        return {'idle': idle, 'created': self.created, 'reused': self.reused, 'recycled': self.recycled}
+
+    def close(self) -> None:
+        with self._lock:
+            instances = [pooled for idle in self._idle.values() for pooled in idle]
+            self._idle.clear()
+        for pooled in instances:
+            self._close(pooled)
+
@@ -2,29 +2,51 @@
 from __future__ import annotations
 
 import asyncio
+import importlib
 import io
-import logging
 import os
+import time
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, AsyncContextManager, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from urllib.parse import parse_qs, urlparse
-from urllib.request import urlopen
 
-import yt_dlp
-from PIL import Image
-from mutagen.id3 import APIC, ID3, ID3NoHeaderError, TALB, TDRC, TIT2, TPE1
-from yt_dlp.utils import sanitize_filename
+import httpx
 
 from utils.logger import get_logger
+from utils.metrics import REGISTRY
+from utils.output_profiles import DEFAULT_PROFILE, PASSTHROUGH, REMUX, TRANSCODE, OutputProfile, record_mode
+from utils.transcode import TranscodeError, remux_audio, stream_to_mp3, transcode_to_mp3
+from utils.ytdlp_session import SessionFactory, YtDlpSession, thread_session
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from utils.cover_art import CoverArtPipeline
 
 logger = get_logger(__name__)
 
+SlotFactory = Callable[[], AsyncContextManager]
+WorkspaceFactory = Callable[[], Awaitable[str]]
+# yt-dlp, Pillow and mutagen are imported where they are used so that starting the bot stays fast.
+_HEAVY_MODULES = ('yt_dlp', 'PIL.Image', 'mutagen.id3', 'mutagen.mp4')
+
+# Stages: slot_wait, extract, stream, download, transcode, cover_art, tagging here; upload and total in handlers.downloader.
+stage_seconds = REGISTRY.histogram('musicbot_download_stage_seconds', 'Time spent in each stage of a download job', ('stage',))
+
+
+def preload_dependencies() -> None:
+    """Import the heavy dependencies ahead of the first job; meant to run in a worker thread after start-up."""
+    for name in _HEAVY_MODULES:
+        importlib.import_module(name)
+
 
 @dataclass
 class DownloadResult:
     files: List[Tuple[str, str]]
     artist: str
     info: Dict
+    temp_dir: Optional[str] = None
 
 
 def convert_to_ytmusic(original_url: str) -> str:
@@ -48,54 +70,95 @@ def convert_to_ytmusic(original_url: str) -> str:
         return original_url
 
 
-def blocking_yt_dlp_download(ydl_opts: Dict, url_to_download: str) -> None:
-    """Perform a blocking yt-dlp download respecting the provided options."""
-    yt_logger = logging.getLogger('yt_dlp')
-    yt_logger.setLevel(logging.WARNING)
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url_to_download])
+def canonical_track_key(url: str) -> str:
+    """Return a stable cache key for a track URL (video id for YouTube, bare URL otherwise)."""
+    normalized = convert_to_ytmusic(url)
+    try:
+        parsed = urlparse(normalized.strip())
+        if 'youtube.com' in parsed.netloc:
+            video = parse_qs(parsed.query).get('v')
+            if video and video[0]:
+                return f'youtube:{video[0]}'
+        host = parsed.netloc.lower()
+        if host.startswith(('www.', 'm.')):
+            host = host.split('.', 1)[1]
+        if host:
+            return f"{host}{parsed.path.rstrip('/')}"
+    except Exception:
+        pass
+    return normalized.strip()
+
+
+COVER_MAX_DIMENSION = 800  # Longest side of embedded cover art; players rarely show more
+_MIN_QUALITY = 20
+_MAX_QUALITY = 95
 
 
-def compress_image(image_path, max_size: int = 204_800) -> bytes:
-    """Compress an image (bytes or path) to stay below max_size bytes."""
+def _encode_jpeg(img: Image.Image, quality: int, optimize: bool = False) -> bytes:
+    output = io.BytesIO()
+    img.save(output, 'JPEG', quality=quality, optimize=optimize, progressive=optimize)
+    return output.getvalue()
+
+
+def _fit_quality(img: Image.Image, max_size: int) -> Optional[Tuple[int, bytes]]:
+    """Binary-search the highest JPEG quality whose output fits max_size."""
+    data = _encode_jpeg(img, _MAX_QUALITY)
+    if len(data) <= max_size:
+        return _MAX_QUALITY, data
+    low, high = _MIN_QUALITY, _MAX_QUALITY - 1
+    best: Optional[Tuple[int, bytes]] = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode_jpeg(img, quality)
+        if len(data) <= max_size:
+            best, low = (quality, data), quality + 1
+        else:
+            high = quality - 1
+    return best
+
+
+def compress_image(image_path, max_size: int = 204_800, max_dimension: int = COVER_MAX_DIMENSION) -> bytes:
+    """Compress an image (bytes or path) to a JPEG no larger than max_dimension and max_size bytes."""
+    from PIL import Image
+
     if isinstance(image_path, (bytes, bytearray)):
         img = Image.open(io.BytesIO(image_path))
     else:
         img = Image.open(image_path)
 
     try:
-        if img.mode in ('RGBA', 'LA'):
+        # For JPEG sources let the decoder do DCT-domain downscaling instead of decoding full size.
+        if img.format == 'JPEG':
+            img.draft('RGB', (max_dimension, max_dimension))
+
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
             background = Image.new('RGB', img.size, (255, 255, 255))
             background.paste(img, mask=img.split()[-1])
             img = background
         elif img.mode != 'RGB':
             img = img.convert('RGB')
 
-        output = io.BytesIO()
-        quality = 95
+        if max(img.size) > max_dimension:
+            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=3.0)
+
         while True:
-            output.seek(0)
-            output.truncate(0)
-            img.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
-            size = output.tell()
-            if size <= max_size or quality <= 20:
+            fitted = _fit_quality(img, max_size)
+            if fitted is not None:
+                quality, data = fitted
                 break
-            quality -= 5
-
-        if output.tell() > max_size:
             width, height = img.size
-            while output.tell() > max_size and (width > 200 or height > 200):
-                width = int(width * 0.9)
-                height = int(height * 0.9)
-                resized = img.resize((width, height), Image.LANCZOS)
-                output.seek(0)
-                output.truncate(0)
-                resized.save(output, 'JPEG', quality=max(20, quality - 5), optimize=True, progressive=True)
-                if output.tell() <= max_size:
-                    break
-                img = resized
-
-        return output.getvalue()
+            lowest = _encode_jpeg(img, _MIN_QUALITY)
+            if width <= 200 and height <= 200:
+                quality, data = _MIN_QUALITY, lowest
+                break
+            # Encoded size scales roughly with area; aim a little under the budget in one step.
+            factor = max(0.5, min(0.9, (max_size / len(lowest)) ** 0.5 * 0.95))
+            img = img.resize((max(1, int(width * factor)), max(1, int(height * factor))), Image.LANCZOS)
+
+        # One optimized pass at the chosen quality; keep it only if it is actually smaller.
+        optimized = _encode_jpeg(img, quality, optimize=True)
+        return optimized if len(optimized) <= len(data) else data
     finally:
         try:
             img.close()
@@ -130,23 +193,34 @@ def _extract_title_and_artist(info: Dict) -> Tuple[str, str]:
     return title, artist
 
 
-def _pull_thumbnail(info: Dict) -> Optional[str]:
+def pull_thumbnail(info: Dict, min_width: int = COVER_MAX_DIMENSION) -> Optional[str]:
+    """Pick the smallest thumbnail at least min_width wide, else the largest one available."""
     thumbnail_url = None
     try:
-        thumb = info.get('thumbnail')
-        if isinstance(thumb, str) and thumb:
-            thumbnail_url = thumb
-        elif info.get('thumbnails'):
-            thumbs = info['thumbnails']
-            if isinstance(thumbs, list) and thumbs:
-                thumbs_sorted = sorted(thumbs, key=lambda x: int(x.get('width') or 0), reverse=True)
-                thumbnail_url = thumbs_sorted[0].get('url')
+        thumbs = info.get('thumbnails')
+        sized = []
+        if isinstance(thumbs, list):
+            sized = [t for t in thumbs if isinstance(t, dict) and t.get('url') and t.get('width')]
+        if sized:
+            large_enough = [t for t in sized if int(t['width']) >= min_width]
+            if large_enough:
+                thumbnail_url = min(large_enough, key=lambda x: int(x['width']))['url']
+            else:
+                thumbnail_url = max(sized, key=lambda x: int(x['width']))['url']
+        else:
+            thumb = info.get('thumbnail')
+            if isinstance(thumb, str) and thumb:
+                thumbnail_url = thumb
+            elif isinstance(thumbs, list) and thumbs:
+                thumbnail_url = thumbs[-1].get('url')
     except Exception:
         thumbnail_url = None
     return thumbnail_url
 
 
 def _embed_metadata(audio_path: str, title: str, artist: str, info: Dict, jpeg_data: Optional[bytes]) -> None:
+    from mutagen.id3 import APIC, ID3, ID3NoHeaderError, TALB, TDRC, TIT2, TPE1
+
     try:
         try:
             id3 = ID3(audio_path)
@@ -187,24 +261,41 @@ def _embed_metadata(audio_path: str, title: str, artist: str, info: Dict, jpeg_d
         logger.error("Error embedding metadata for %s: %s", audio_path, exc)
 
 
-def _prepare_downloaded_files(temp_dir: str, info: Dict, artist: str, title: str, max_thumb_size: int = 200_000) -> List[Tuple[str, str]]:
-    audio_files = [f for f in os.listdir(temp_dir) if f.endswith('.mp3')]
+def _embed_mp4_metadata(audio_path: str, title: str, artist: str, info: Dict, jpeg_data: Optional[bytes]) -> None:
+    from mutagen.mp4 import MP4, MP4Cover
+
+    try:
+        tags = MP4(audio_path)
+        tags['\xa9nam'] = [title]
+        tag_artist = artist or info.get('album_artist') or info.get('uploader')
+        if tag_artist:
+            tags['\xa9ART'] = [str(tag_artist)]
+        if info.get('album'):
+            tags['\xa9alb'] = [str(info.get('album'))]
+        release = info.get('release_year') or info.get('release_date')
+        if release:
+            tags['\xa9day'] = [str(release)]
+        if jpeg_data:
+            tags['covr'] = [MP4Cover(jpeg_data, imageformat=MP4Cover.FORMAT_JPEG)]
+        tags.save()
+    except Exception as exc:
+        logger.error("Error embedding metadata for %s: %s", audio_path, exc)
+
+
+_AUDIO_EXTS = ('.mp3', '.m4a')
+
+
+def _prepare_downloaded_files(temp_dir: str, info: Dict, artist: str, title: str, max_thumb_size: int = 200_000, jpeg_data: Optional[bytes] = None) -> List[Tuple[str, str]]:
+    """Tag and rename the audio files in temp_dir; jpeg_data is cover art prepared by the caller."""
+    from yt_dlp.utils import sanitize_filename
+
+    audio_files = [f for f in os.listdir(temp_dir) if f.lower().endswith(_AUDIO_EXTS)]
     thumbnail_files = [f for f in os.listdir(temp_dir) if f.lower().endswith(('.jpg', '.jpeg', '.webp'))]
 
     if not audio_files:
         return []
 
     downloaded: List[Tuple[str, str]] = []
-    thumbnail_url = _pull_thumbnail(info)
-
-    jpeg_data: Optional[bytes] = None
-    if thumbnail_url:
-        try:
-            with urlopen(thumbnail_url, timeout=15) as response:
-                raw = response.read()
-            jpeg_data = compress_image(raw, max_size=max_thumb_size)
-        except Exception as exc:
-            logger.debug("Failed to fetch remote thumbnail %s: %s", thumbnail_url, exc)
 
     if not jpeg_data and thumbnail_files:
         thumbnail_path = os.path.join(temp_dir, thumbnail_files[0])
@@ -220,9 +311,13 @@ def _prepare_downloaded_files(temp_dir: str, info: Dict, artist: str, title: str
 
     for audio_file in audio_files:
         audio_path = os.path.join(temp_dir, audio_file)
-        _embed_metadata(audio_path, title, artist, info, jpeg_data)
+        ext = os.path.splitext(audio_file)[1].lower()
+        if ext == '.m4a':
+            _embed_mp4_metadata(audio_path, title, artist, info, jpeg_data)
+        else:
+            _embed_metadata(audio_path, title, artist, info, jpeg_data)
 
-        new_filename = sanitize_filename(f"{artist} - {title}.mp3" if artist else f"{title}.mp3")
+        new_filename = sanitize_filename(f"{artist} - {title}{ext}" if artist else f"{title}{ext}")
         new_path = os.path.join(temp_dir, new_filename)
         try:
             os.rename(audio_path, new_path)
@@ -233,10 +328,12 @@ def _prepare_downloaded_files(temp_dir: str, info: Dict, artist: str, title: str
     return downloaded
 
 
-def create_ydl_opts(temp_dir: str, cookies_path: Optional[str], ffmpeg_path: Optional[str], progress_hook: Optional[Callable[[Dict], None]] = None) -> Dict:
+def create_ydl_opts(temp_dir: str, cookies_path: Optional[str], ffmpeg_path: Optional[str], progress_hook: Optional[Callable[[Dict], None]] = None, write_thumbnail: bool = True, format_selector: str = 'bestaudio/best') -> Dict:
     opts: Dict = {
-        'outtmpl': os.path.join(temp_dir, '%(id)s.%(ext)s'),
-        'format': 'bestaudio/best',
+        # Relative template under 'paths' so pooled YoutubeDL instances can be pointed at each job's directory.
+        'paths': {'home': temp_dir},
+        'outtmpl': '%(id)s.%(ext)s',
+        'format': format_selector,
         'cookiefile': cookies_path if cookies_path and os.path.exists(cookies_path) else None,
         'progress_hooks': [progress_hook] if progress_hook else None,
         'nocheckcertificate': True,
@@ -248,31 +345,200 @@ def create_ydl_opts(temp_dir: str, cookies_path: Optional[str], ffmpeg_path: Opt
         'no_warnings': True,
         'ffmpeg_location': ffmpeg_path if ffmpeg_path else None,
         'noplaylist': True,
-        'writethumbnail': True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '128',
-        }],
+        'writethumbnail': write_thumbnail,
+        # Conversion is done by download_audio itself according to the output profile.
         'verbose': True,
     }
     return {k: v for k, v in opts.items() if v is not None}
 
 
-async def download_audio(url: str, temp_dir: str, cookies_path: Optional[str], ffmpeg_path: Optional[str], progress_hook: Optional[Callable[[Dict], None]] = None) -> DownloadResult:
-    ydl_opts = create_ydl_opts(temp_dir, cookies_path, ffmpeg_path, progress_hook)
+def _downloaded_sources(temp_dir: str, info: Dict) -> List[Tuple[str, Dict]]:
+    """Return (path, format info) for every media file yt-dlp wrote into temp_dir."""
+    sources = [
+        (entry['filepath'], entry)
+        for entry in info.get('requested_downloads') or []
+        if isinstance(entry, dict) and entry.get('filepath') and os.path.exists(entry['filepath'])
+    ]
+    if sources:
+        return sources
+    return [
+        (os.path.join(temp_dir, name), info)
+        for name in os.listdir(temp_dir)
+        if not name.lower().endswith(('.jpg', '.jpeg', '.webp', '.png', '.part', '.ytdl'))
+    ]
+
+
+async def _convert_source(source_path: str, source_info: Dict, profile: OutputProfile, ffmpeg_path: Optional[str], transcode_slot: Optional[SlotFactory]) -> str:
+    mode, target_ext = profile.plan(source_info)
+    record_mode(mode)
+    if mode == PASSTHROUGH:
+        return source_path
+    if mode == REMUX:
+        return await remux_audio(source_path, target_ext, ffmpeg_path)
+    async with (transcode_slot() if transcode_slot else nullcontext()):
+        return await transcode_to_mp3(source_path, ffmpeg_path, bitrate=profile.bitrate)
+
+
+# Containers ffmpeg can decode from a pipe without seeking back (no trailing moov atom).
+_STREAMABLE_EXTS = ('webm', 'weba', 'opus', 'ogg', 'mp3', 'aac')
+
+
+def _stream_source(info: Dict) -> Optional[Dict]:
+    """Return the selected format if it is a single plain-HTTP stream ffmpeg can read from a pipe."""
+    if info.get('requested_formats') or not info.get('url'):
+        return None
+    if info.get('protocol') not in ('http', 'https'):
+        return None
+    container = str(info.get('container') or '')
+    if info.get('ext') not in _STREAMABLE_EXTS and not container.endswith('_dash'):
+        return None
+    return info
+
+
+def _stream_progress_hook(progress_hook: Callable[[Dict], None]) -> Callable[[int, Optional[int], float], None]:
+    """Adapt stream_to_mp3 progress callbacks to the yt-dlp progress_hooks dict format."""
+    from yt_dlp.utils import format_bytes, formatSeconds
+
+    def report(downloaded: int, total: Optional[int], speed: float) -> None:
+        percent = f"{downloaded * 100 / total:.1f}%" if total else 'N/A'
+        eta = formatSeconds((total - downloaded) / speed) if total and speed else 'N/A'
+        progress_hook({
+            'status': 'downloading',
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': speed,
+            '_percent_str': percent,
+            '_speed_str': f"{format_bytes(speed)}/s",
+            '_eta_str': eta,
+        })
+    return report
+
+
+async def _try_streaming(session: YtDlpSession, temp_dir: str, ffmpeg_path: Optional[str], progress_hook: Optional[Callable[[Dict], None]], transcode_slot: Optional[SlotFactory], profile: OutputProfile) -> Optional[Dict]:
+    """Stream the selected format into ffmpeg; return the processed info, or None to use the file-based path."""
+    info, cookie_header = await session.resolve()
+    source = _stream_source(info or {})
+    # Only transcodes benefit; passthrough and remux are cheaper from a file.
+    if source is None or profile.plan(source)[0] != TRANSCODE:
+        return None
+    headers = dict(source.get('http_headers') or {})
+    if cookie_header:
+        headers['Cookie'] = cookie_header
+    chunk_size = (source.get('downloader_options') or {}).get('http_chunk_size')
+    target_path = os.path.join(temp_dir, f"{info.get('id') or 'audio'}.mp3")
+    try:
+        async with (transcode_slot() if transcode_slot else nullcontext()):
+            await stream_to_mp3(
+                source['url'],
+                headers,
+                target_path,
+                ffmpeg_path,
+                total_size=source.get('filesize'),
+                chunk_size=chunk_size,
+                progress=_stream_progress_hook(progress_hook) if progress_hook else None,
+                bitrate=profile.bitrate,
+            )
+    except (httpx.HTTPError, TranscodeError, OSError) as exc:
+        logger.warning("Streaming transcode failed for %s, falling back to download: %s", info.get('id'), exc)
+        try:
+            os.remove(target_path)
+        except OSError:
+            pass
+        return None
+    record_mode(TRANSCODE)
+    return info
+
+
+async def download_audio(
+    url: str,
+    temp_dir: Union[str, WorkspaceFactory],
+    cookies_path: Optional[str],
+    ffmpeg_path: Optional[str],
+    progress_hook: Optional[Callable[[Dict], None]] = None,
+    download_slot: Optional[SlotFactory] = None,
+    transcode_slot: Optional[SlotFactory] = None,
+    cover_art: Optional[CoverArtPipeline] = None,
+    stream: bool = False,
+    profile: OutputProfile = DEFAULT_PROFILE,
+    session_factory: SessionFactory = thread_session,
+) -> DownloadResult:
+    """Download url into temp_dir as tagged audio files in the given output profile.
+
+    download_slot and transcode_slot are optional factories of async context
+    managers that gate the network and ffmpeg stages respectively. With a
+    cover_art pipeline the artwork is fetched while the audio downloads;
+    otherwise the thumbnail written by yt-dlp is used. With stream=True,
+    single-file HTTP formats are piped into ffmpeg while they download and
+    everything else takes the download-then-transcode path. temp_dir may be
+    a coroutine function returning the directory; it is then called once the
+    download slot is held, so queued jobs do not occupy scratch space.
+    session_factory decides where the yt-dlp steps run (a thread by default,
+    or a worker process from YtDlpProcessPool.session).
+    """
+    cover_task: Optional[asyncio.Task] = None
+    streamed_info: Optional[Dict] = None
     url_to_use = convert_to_ytmusic(url)
-    logger.info("Starting download for %s (using %s)", url, url_to_use)
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url_to_use, download=False)
+    waiting_since = time.perf_counter()
+    async with (download_slot() if download_slot else nullcontext()):
+        stage_seconds.observe(time.perf_counter() - waiting_since, stage='slot_wait')
+        if callable(temp_dir):
+            temp_dir = await temp_dir()
+        ydl_opts = create_ydl_opts(
+            temp_dir,
+            cookies_path,
+            ffmpeg_path,
+            write_thumbnail=cover_art is None,
+            format_selector=profile.format,
+        )
+        logger.info("Starting download for %s (using %s)", url, url_to_use)
+        # One YoutubeDL and one extraction per job; no blocking step runs on the event loop.
+        try:
+            async with session_factory(ydl_opts, progress_hook) as session:
+                with stage_seconds.time(stage='extract'):
+                    raw_info = await session.extract(url_to_use)
+                if cover_art is not None:
+                    cover_task = asyncio.create_task(cover_art.get(raw_info))
+                if stream:
+                    streaming_since = time.perf_counter()
+                    streamed_info = await _try_streaming(session, temp_dir, ffmpeg_path, progress_hook, transcode_slot, profile)
+                    if streamed_info is not None:
+                        # Download and transcode in one step, so it gets its own stage.
+                        stage_seconds.observe(time.perf_counter() - streaming_since, stage='stream')
+                if streamed_info is not None:
+                    info = streamed_info
+                else:
+                    with stage_seconds.time(stage='download'):
+                        info = await session.download()
+        except BaseException:
+            if cover_task is not None:
+                cover_task.cancel()
+            raise
+
+    try:
+        if streamed_info is None:
+            for source_path, source_info in _downloaded_sources(temp_dir, info):
+                with stage_seconds.time(stage='transcode'):
+                    await _convert_source(source_path, source_info, profile, ffmpeg_path, transcode_slot)
+    except BaseException:
+        if cover_task is not None:
+            cover_task.cancel()
+        raise
 
     title, artist = _extract_title_and_artist(info)
 
-    await asyncio.to_thread(blocking_yt_dlp_download, ydl_opts, url_to_use)
+    jpeg_data: Optional[bytes] = None
+    if cover_task is not None:
+        try:
+            # Only the time the cover is still outstanding once the audio is ready.
+            with stage_seconds.time(stage='cover_art'):
+                jpeg_data = await cover_task
+        except Exception as exc:
+            logger.debug("Cover art pipeline failed for %s: %s", url_to_use, exc)
 
-    files = _prepare_downloaded_files(temp_dir, info, artist, title)
+    with stage_seconds.time(stage='tagging'):
+        files = await asyncio.to_thread(_prepare_downloaded_files, temp_dir, info, artist, title, jpeg_data=jpeg_data)
     if not files:
         raise FileNotFoundError('audio file not found')
 
-    return DownloadResult(files=files, artist=artist, info=info)
+    return DownloadResult(files=files, artist=artist, info=info, temp_dir=temp_dir)
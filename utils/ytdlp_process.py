@@ -0,0 +1,314 @@
+"""Pool of pre-warmed worker processes that run yt-dlp sessions outside the bot's GIL."""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from utils.logger import get_logger
+from utils.ytdlp_session import ProgressHook, YtDlpSession
+
+logger = get_logger(__name__)
+
+# Workers run as `python -m utils.ytdlp_worker FD MAX_USES MAX_AGE` from the directory holding the utils package.
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROGRESS_KEYS = (
+    'status', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate', 'speed', 'eta',
+    'elapsed', 'filename', 'fragment_index', 'fragment_count',
+    '_percent_str', '_speed_str', '_eta_str', '_total_bytes_str', '_downloaded_bytes_str',
+)
+_PROGRESS_INTERVAL = 0.2
+
+
+class WorkerCrashed(Exception):
+    """Raised when a yt-dlp worker process exits while running a request."""
+
+
+def _plain_info(ydl, info: Optional[Dict], drop_entries: bool = False) -> Optional[Dict]:
+    if info is None:
+        return None
+    info = dict(info)
+    if drop_entries:
+        # Unprocessed playlist entries are lazy generators; the worker keeps the real object.
+        info.pop('entries', None)
+    return ydl.sanitize_info(info)
+
+
+def worker_main(conn, max_uses: int, max_age: float) -> None:
+    """Entry point of a worker process: warm up, then serve one session at a time over conn."""
+    # Own process group, so killing the worker also kills ffmpeg children started by yt-dlp.
+    os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import yt_dlp
+    from yt_dlp.extractor import gen_extractor_classes
+
+    from utils.ydl_pool import PooledYoutubeDL, YoutubeDLPool
+    from utils.ytdlp_session import DOWNLOAD_PROFILE, blocking_extract_info, blocking_resolve, blocking_yt_dlp_download
+
+    # Import every extractor module now rather than during the first job.
+    list(gen_extractor_classes())
+    conn.send(('ready', os.getpid()))
+
+    # Sessions run one after another, so a single idle instance per option set is enough.
+    pool = YoutubeDLPool(max_idle_per_key=1, max_uses=max_uses, max_age=max_age)
+    pooled: Optional[PooledYoutubeDL] = None
+    ydl: Optional[yt_dlp.YoutubeDL] = None
+    reusable = True
+    raw_info: Optional[Dict] = None
+    last_progress = [0.0, None]
+
+    def forward_progress(data: Dict) -> None:
+        status = data.get('status')
+        now = time.monotonic()
+        if status == last_progress[1] and status == 'downloading' and now - last_progress[0] < _PROGRESS_INTERVAL:
+            return
+        last_progress[0], last_progress[1] = now, status
+        conn.send(('progress', {key: data[key] for key in _PROGRESS_KEYS if key in data}))
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if op == 'open':
+                opts, with_progress = args
+                pooled = pool.acquire(DOWNLOAD_PROFILE, opts, forward_progress if with_progress else None)
+                ydl, reusable, raw_info = pooled.ydl, True, None
+                result: Any = None
+            elif op == 'extract':
+                raw_info = blocking_extract_info(ydl, args[0])
+                result = _plain_info(ydl, raw_info, drop_entries=True)
+            elif op == 'resolve':
+                processed, cookie_header = blocking_resolve(ydl, raw_info)
+                result = (_plain_info(ydl, processed), cookie_header)
+            elif op == 'download':
+                result = _plain_info(ydl, blocking_yt_dlp_download(ydl, raw_info) or raw_info)
+            elif op == 'close':
+                if pooled is not None:
+                    pool.release(pooled, reusable)
+                pooled, ydl, raw_info, result = None, None, None, None
+            else:
+                raise ValueError(f"unknown operation {op!r}")
+        except Exception as exc:
+            if not isinstance(exc, yt_dlp.utils.YoutubeDLError):
+                reusable = False
+            # Exception objects from yt-dlp carry tracebacks that do not pickle.
+            conn.send(('error', (type(exc).__name__, str(exc))))
+            continue
+        conn.send(('result', result))
+
+
+def _rebuild_error(name: str, message: str) -> Exception:
+    import yt_dlp
+
+    error_class = getattr(yt_dlp.utils, name, None)
+    if isinstance(error_class, type) and issubclass(error_class, yt_dlp.utils.YoutubeDLError):
+        try:
+            return error_class(message)
+        except Exception:
+            pass
+    return RuntimeError(f"{name}: {message}")
+
+
+class _Worker:
+    """Parent-side handle of one worker process and the thread reading its replies."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_uses: int, max_age: float) -> None:
+        self._loop = loop
+        parent_conn, child_conn = multiprocessing.Pipe()
+        # A fresh interpreter rather than fork (unsafe next to an event loop and threads) or
+        # multiprocessing's spawn (which would re-import bot.py or worker.py in every child).
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'utils.ytdlp_worker', str(child_conn.fileno()), str(max_uses), str(max_age)],
+            cwd=_PROJECT_DIR,
+            pass_fds=(child_conn.fileno(),),
+            stdin=subprocess.DEVNULL,
+        )
+        child_conn.close()
+        self.conn = parent_conn
+        self.ready = threading.Event()
+        self.alive = True
+        self.progress: Optional[ProgressHook] = None
+        self._pending: Optional[asyncio.Future] = None
+        self._reader = threading.Thread(target=self._read_loop, name=f'yt-dlp-worker-{self.process.pid}', daemon=True)
+        self._reader.start()
+
+    def _resolve(self, future: asyncio.Future, kind: str, payload: Any) -> None:
+        if future.done():
+            return
+        if kind == 'result':
+            future.set_result(payload)
+        elif kind == 'error':
+            future.set_exception(_rebuild_error(*payload))
+        else:
+            future.set_exception(WorkerCrashed(f"yt-dlp worker {self.process.pid} exited"))
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                kind, payload = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == 'progress':
+                hook = self.progress
+                if hook is not None:
+                    try:
+                        hook(payload)
+                    except Exception as exc:
+                        logger.debug("Progress hook failed: %s", exc)
+            elif kind == 'ready':
+                self.ready.set()
+            elif self._pending is not None:
+                self._loop.call_soon_threadsafe(self._resolve, self._pending, kind, payload)
+        self.alive = False
+        if self._pending is not None:
+            self._loop.call_soon_threadsafe(self._resolve, self._pending, 'crashed', None)
+
+    async def call(self, op: str, *args: Any) -> Any:
+        if not self.alive:
+            raise WorkerCrashed(f"yt-dlp worker {self.process.pid} is not running")
+        future = self._loop.create_future()
+        self._pending = future
+        try:
+            self.conn.send((op, args))
+            return await future
+        except asyncio.CancelledError:
+            # The request cannot be interrupted inside yt-dlp; the process and its children go.
+            # The pool reaps the process off the loop when it replaces this worker.
+            self.kill()
+            raise
+        finally:
+            self._pending = None
+
+    def kill(self) -> None:
+        """Kill the worker's process group without waiting for it to exit."""
+        self.alive = False
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                self.process.kill()
+
+    def _reap(self) -> None:
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            logger.warning("yt-dlp worker %s did not exit after SIGKILL.", self.process.pid)
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+    async def stop(self) -> None:
+        """Kill the worker and wait for it in a thread, keeping the event loop free."""
+        self.kill()
+        await asyncio.to_thread(self._reap)
+
+
+class ProcessSession(YtDlpSession):
+    def __init__(self, worker: _Worker) -> None:
+        self._worker = worker
+
+    async def extract(self, url: str) -> Dict:
+        return await self._worker.call('extract', url)
+
+    async def resolve(self) -> Tuple[Dict, Optional[str]]:
+        processed, cookie_header = await self._worker.call('resolve')
+        return processed or {}, cookie_header
+
+    async def download(self) -> Dict:
+        return await self._worker.call('download')
+
+
+class YtDlpProcessPool:
+    """Fixed set of warm yt-dlp worker processes, each serving one job session at a time.
+
+    Workers import yt-dlp and all extractor modules at start-up and keep
+    their YoutubeDL instances in a YoutubeDLPool between jobs. Progress
+    events are forwarded through the worker's pipe to the job's progress hook.
+    Cancelling a job kills its worker's process group (including any ffmpeg
+    child) and a fresh worker takes its place.
+    """
+
+    def __init__(self, workers: int, ydl_max_uses: int = 200, ydl_max_age: float = 3600.0) -> None:
+        self.size = max(1, workers)
+        self.ydl_max_uses = ydl_max_uses
+        self.ydl_max_age = ydl_max_age
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+        self._closed = False
+        self.sessions = 0
+        self.replaced = 0
+
+    async def _spawn(self) -> _Worker:
+        worker = await asyncio.to_thread(_Worker, asyncio.get_running_loop(), self.ydl_max_uses, self.ydl_max_age)
+        self._workers.append(worker)
+        return worker
+
+    async def start(self) -> None:
+        """Start the workers so they are warm before the first job arrives."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._spawn())
+        logger.info("Started %s yt-dlp worker processes.", self.size)
+
+    async def _replace(self, worker: _Worker) -> None:
+        await worker.stop()
+        if worker in self._workers:
+            self._workers.remove(worker)
+        self.replaced += 1
+        if not self._closed:
+            self._idle.put_nowait(await self._spawn())
+
+    @asynccontextmanager
+    async def session(self, opts: Dict, progress_hook: Optional[ProgressHook] = None) -> AsyncIterator[YtDlpSession]:
+        await self.start()
+        worker: _Worker = await self._idle.get()
+        for _ in range(self.size):
+            if worker.alive:
+                break
+            # Died while idle (e.g. OOM killer); swap it for a fresh one.
+            await self._replace(worker)
+            worker = await self._idle.get()
+        self.sessions += 1
+        try:
+            worker.progress = progress_hook
+            # Callables (hooks, loggers) cannot cross the process boundary; the worker installs its own hook.
+            plain_opts = {key: value for key, value in opts.items() if key not in ('progress_hooks', 'logger')}
+            await worker.call('open', plain_opts, progress_hook is not None)
+            yield ProcessSession(worker)
+        finally:
+            worker.progress = None
+            if worker.alive:
+                try:
+                    await worker.call('close')
+                except Exception as exc:
+                    logger.debug("Closing yt-dlp session failed: %s", exc)
+            if worker.alive:
+                self._idle.put_nowait(worker)
+            else:
+                await asyncio.shield(self._replace(worker))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': len(self._workers),
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'sessions': self.sessions,
+            'replaced': self.replaced,
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        await asyncio.gather(*(worker.stop() for worker in self._workers))
+        self._workers.clear()
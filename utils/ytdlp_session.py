@@ -0,0 +1,150 @@
+"""The yt-dlp steps of one download job, behind an interface that can run them in a thread or another process."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncContextManager, AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+from utils.ydl_pool import ProgressHook, YoutubeDLPool
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+SEARCH_PROFILE = 'search'
+DOWNLOAD_PROFILE = 'download'
+
+
+def blocking_extract_info(ydl: yt_dlp.YoutubeDL, url: str) -> Dict:
+    """Extract metadata for url without resolving formats or downloading anything."""
+    logging.getLogger('yt_dlp').setLevel(logging.WARNING)
+    return ydl.extract_info(url, download=False, process=False)
+
+
+def blocking_yt_dlp_download(ydl: yt_dlp.YoutubeDL, info: Dict) -> Dict:
+    """Download from an already extracted info dict and return the processed info."""
+    logging.getLogger('yt_dlp').setLevel(logging.WARNING)
+    return ydl.process_ie_result(info, download=True)
+
+
+def blocking_resolve(ydl: yt_dlp.YoutubeDL, info: Dict) -> Tuple[Dict, Optional[str]]:
+    """Select formats for an extracted info dict and return it with the Cookie header for the chosen URL."""
+    processed = ydl.process_ie_result(dict(info), download=False) or {}
+    cookie_header = None
+    if processed.get('url'):
+        try:
+            cookie_header = ydl.cookiejar.get_cookie_header(processed['url'])
+        except Exception:
+            cookie_header = None
+    return processed, cookie_header
+
+
+class YtDlpSession(ABC):
+    """One YoutubeDL bound to one job: extract once, then resolve and/or download that extraction."""
+
+    @abstractmethod
+    async def extract(self, url: str) -> Dict:
+        ...
+
+    @abstractmethod
+    async def resolve(self) -> Tuple[Dict, Optional[str]]:
+        """Select formats without downloading; return the processed info and its Cookie header."""
+        ...
+
+    @abstractmethod
+    async def download(self) -> Dict:
+        ...
+
+
+SessionFactory = Callable[[Dict, Optional[ProgressHook]], AsyncContextManager[YtDlpSession]]
+
+
+class ThreadSession(YtDlpSession):
+    """Run every blocking step in a worker thread of this process."""
+
+    def __init__(self, ydl: yt_dlp.YoutubeDL) -> None:
+        self.ydl = ydl
+        self._raw_info: Optional[Dict] = None
+        self._step: Optional[asyncio.Future] = None
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        # Shielded: cancelling the job cannot stop the thread, so the session keeps track of it.
+        self._step = asyncio.ensure_future(asyncio.to_thread(func, self.ydl, *args))
+        return await asyncio.shield(self._step)
+
+    def running_step(self) -> Optional[asyncio.Future]:
+        """The step whose thread is still using self.ydl after its caller was cancelled, if any."""
+        if self._step is not None and not self._step.done():
+            return self._step
+        return None
+
+    async def extract(self, url: str) -> Dict:
+        self._raw_info = await self._run(blocking_extract_info, url)
+        return self._raw_info
+
+    async def resolve(self) -> Tuple[Dict, Optional[str]]:
+        assert self._raw_info is not None
+        return await self._run(blocking_resolve, self._raw_info)
+
+    async def download(self) -> Dict:
+        assert self._raw_info is not None
+        return await self._run(blocking_yt_dlp_download, self._raw_info) or self._raw_info
+
+
+_cleanups: Set[asyncio.Task] = set()
+
+
+async def _cleanup_after(step: asyncio.Future, cleanup: Callable[..., Any], *args: Any) -> None:
+    await asyncio.wait({step})
+    if not step.cancelled():
+        # Mark the result retrieved; the job that started the step has already been cancelled.
+        step.exception()
+    await asyncio.to_thread(cleanup, *args)
+
+
+async def _cleanup_when_idle(session: ThreadSession, cleanup: Callable[..., Any], *args: Any) -> None:
+    """Run cleanup in a thread now, or in the background once the session's running step has finished."""
+    step = session.running_step()
+    if step is None:
+        await asyncio.to_thread(cleanup, *args)
+        return
+    task = asyncio.ensure_future(_cleanup_after(step, cleanup, *args))
+    _cleanups.add(task)
+    task.add_done_callback(_cleanups.discard)
+
+
+@asynccontextmanager
+async def thread_session(opts: Dict, progress_hook: Optional[ProgressHook] = None, pool: Optional[YoutubeDLPool] = None) -> AsyncIterator[YtDlpSession]:
+    """Session in worker threads, on a YoutubeDL from pool when one is given."""
+    # Imported here so that loading the bot does not pull in yt-dlp; preload_dependencies warms it.
+    import yt_dlp
+
+    if pool is None:
+        opts = dict(opts)
+        if progress_hook:
+            opts['progress_hooks'] = [progress_hook]
+        ydl = await asyncio.to_thread(yt_dlp.YoutubeDL, opts)
+        session = ThreadSession(ydl)
+        try:
+            yield session
+        finally:
+            await _cleanup_when_idle(session, ydl.close)
+        return
+
+    pooled = await asyncio.to_thread(pool.acquire, DOWNLOAD_PROFILE, opts, progress_hook)
+    session = ThreadSession(pooled.ydl)
+    reusable = False
+    try:
+        yield session
+        reusable = True
+    except yt_dlp.utils.YoutubeDLError:
+        reusable = True
+        raise
+    finally:
+        if session.running_step() is not None:
+            # Cancelled mid-step: the thread still drives this instance, so it is retired once
+            # the thread is done rather than handed to the next job, and stops reporting progress now.
+            pooled.hook = None
+            reusable = False
+        await _cleanup_when_idle(session, pool.release, pooled, reusable)
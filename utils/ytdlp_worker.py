@@ -0,0 +1,14 @@
+"""Entry point of the yt-dlp worker processes started by utils.ytdlp_process.
+
+YtDlpProcessPool runs ``python -m utils.ytdlp_worker FD MAX_USES MAX_AGE``,
+FD being the child end of the worker's pipe, so a worker loads only this
+module, utils.ytdlp_process and yt-dlp rather than bot.py or worker.py and the
+handler stack they import.
+"""
+import sys
+from multiprocessing.connection import Connection
+
+from utils.ytdlp_process import worker_main
+
+if __name__ == '__main__':
+    worker_main(Connection(int(sys.argv[1])), int(sys.argv[2]), float(sys.argv[3]))
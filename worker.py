@@ -0,0 +1,195 @@
+"""Download worker: claims jobs queued by the bot, runs them and uploads the results.
+
+Start the bot with DOWNLOAD_BACKEND=queue and run one or more of these next to
+it (one per core is a good start). Workers on the same host share the SQLite
+queue at JOB_QUEUE_PATH, and the Telegram send limits with the bot through
+SEND_LIMIT_SHARED_PATH.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from typing import Dict, Set
+
+from telegram import Bot
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+
+from config import (
+    JOB_LEASE_SECONDS,
+    JOB_POLL_INTERVAL,
+    METRICS_HOST,
+    METRICS_SAMPLE_INTERVAL,
+    TELEGRAM_BASE_URL,
+    TOKEN,
+    WORKER_CONCURRENCY,
+    WORKER_METRICS_PORT,
+)
+from handlers import downloader
+from handlers.start import localization
+from utils.job_queue import CANCELLED, Job
+from utils.logger import get_logger, setup_logging
+from utils.metrics import REGISTRY, MetricsServer
+from utils.yt_downloader import preload_dependencies
+
+logger = get_logger(__name__)
+
+
+async def run_job(bot: Bot, job: Job, worker_id: str) -> None:
+    """Run one claimed job, renewing its lease and watching for cancellation."""
+    payload = job.payload
+    texts = localization.texts(payload.get('lang') or '')
+    last_progress: Dict[str, str] = {}
+
+    def remember_progress(data: Dict) -> None:
+        if data.get('status') == 'downloading':
+            last_progress['text'] = data.get('_percent_str', '').strip()
+        elif data.get('status') == 'queued':
+            last_progress['text'] = f"queued #{data.get('position')}"
+
+    task = asyncio.create_task(downloader.process_download(
+        bot,
+        payload['chat_id'],
+        job.user_id,
+        payload['url'],
+        texts,
+        payload['status_message_id'],
+        downloader._cancel_keyboard(texts, job.user_id, job.id),
+        progress_listener=remember_progress,
+    ))
+    logger.info("Worker %s started job %s (attempt %s) for user %s.", worker_id, job.id, job.attempts, job.user_id)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=JOB_LEASE_SECONDS / 3)
+            if task.done():
+                break
+            status = await asyncio.to_thread(
+                downloader.job_queue.heartbeat, job.id, worker_id, JOB_LEASE_SECONDS, last_progress.get('text'),
+            )
+            if status == CANCELLED:
+                logger.info("Job %s was cancelled, stopping it.", job.id)
+                task.cancel()
+                await asyncio.wait({task})
+                return
+    except asyncio.CancelledError:
+        task.cancel()
+        await asyncio.wait({task})
+        raise
+
+    try:
+        delivered = task.result()
+    except BaseException as exc:
+        delivered = False
+        logger.error("Job %s crashed: %s", job.id, exc, exc_info=True)
+    if delivered:
+        await asyncio.to_thread(downloader.job_queue.complete, job.id, worker_id)
+    else:
+        await asyncio.to_thread(downloader.job_queue.fail, job.id, worker_id, 'download failed')
+
+
+async def acquire_slot(slots: asyncio.Semaphore, stop: asyncio.Event) -> bool:
+    """Wait for a free job slot; return False without holding one if stop is set first."""
+    acquire = asyncio.ensure_future(slots.acquire())
+    stopping = asyncio.ensure_future(stop.wait())
+    try:
+        await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopping.cancel()
+        acquire.cancel()
+    await asyncio.wait({acquire})
+    if acquire.cancelled():
+        return False
+    if stop.is_set():
+        slots.release()
+        return False
+    return True
+
+
+async def run_worker(worker_id: str, concurrency: int, metrics_port: int = 0) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    base_urls = {'base_url': f"{TELEGRAM_BASE_URL}/bot", 'base_file_url': f"{TELEGRAM_BASE_URL}/file/bot"} if TELEGRAM_BASE_URL else {}
+    bot = ExtBot(
+        TOKEN,
+        request=HTTPXRequest(connection_pool_size=concurrency * 2 + 4),
+        rate_limiter=downloader.send_queue,
+        **base_urls,
+    )
+    metrics_server = MetricsServer(REGISTRY, METRICS_HOST, metrics_port, sample_interval=METRICS_SAMPLE_INTERVAL)
+    slots = asyncio.Semaphore(concurrency)
+    running: Set[asyncio.Task] = set()
+
+    def job_done(task: asyncio.Task) -> None:
+        running.discard(task)
+        slots.release()
+
+    async with bot:
+        preload = asyncio.create_task(asyncio.to_thread(preload_dependencies))
+        await downloader.scratch_space.start()
+        if downloader.ytdlp_pool is not None:
+            await downloader.ytdlp_pool.start()
+        await metrics_server.start()
+        logger.info("Worker %s polling for jobs with concurrency %s.", worker_id, concurrency)
+        try:
+            # With every slot busy, a SIGTERM must not wait for a job to finish before it is seen.
+            while await acquire_slot(slots, stop):
+                try:
+                    job = await asyncio.to_thread(downloader.job_queue.claim, worker_id, JOB_LEASE_SECONDS)
+                except Exception as exc:
+                    logger.error("Could not claim a job: %s", exc)
+                    job = None
+                if job is None:
+                    slots.release()
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=JOB_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                task = asyncio.create_task(run_job(bot, job, worker_id))
+                running.add(task)
+                task.add_done_callback(job_done)
+        finally:
+            if running:
+                # Let claimed jobs finish; their users are already waiting on them.
+                logger.info("Worker %s finishing %s running jobs before exit.", worker_id, len(running))
+                await asyncio.wait(set(running))
+            await preload
+            await metrics_server.close()
+            await downloader.cover_art.close()
+            await downloader.scratch_space.close()
+            downloader.job_queue.close()
+            downloader.ydl_pool.close()
+            if downloader.ytdlp_pool is not None:
+                await downloader.ytdlp_pool.close()
+    logger.info("Worker %s stopped.", worker_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run download jobs queued by the bot.')
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY, help='jobs run at the same time (default: %(default)s)')
+    # Workers on one host each need their own port; the bot uses METRICS_PORT.
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=WORKER_METRICS_PORT,
+        help='serve Prometheus metrics on this port; the download stage histograms are only recorded here, '
+             'so 0 (disabled) leaves them out (default: WORKER_METRICS_PORT, %(default)s)',
+    )
+    parser.add_argument('--id', default=f"{socket.gethostname()}:{os.getpid()}", help='worker name recorded on claimed jobs')
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(run_worker(args.id, max(1, args.concurrency), args.metrics_port))
+
+
+if __name__ == '__main__':
+    main()